@@ -1,13 +1,87 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+import uuid
 import streamlit as st
-from transformers import AutoTokenizer, AutoModelForSequenceClassification, pipeline
-import plotly.graph_objects as go
-from datetime import datetime
+from datetime import datetime, timezone
+from batching import BatchingEngine
+from bucketing import BucketedClassifier
+from bulk import BUCKET_READ_FACTOR, classify_file, detect_format
+from calibration import load_calibration
+from explain import ExplanationCache, explain, render_highlights, top_drivers
+from gauge import confidence_gauge_svg, create_confidence_gauge
+from inference import MODEL_PATH, apply_temperature, decide, extract_probabilities, model_revision
+from jobs import JobManager
+from metrics import (
+    ERRORS, STAGE_LATENCY, RequestTrace, TraceLog, record_cache, record_decision, record_input,
+    start_metrics_server
+)
+from neardup import NearDuplicateIndex
+from prediction_cache import PredictionCache, cache_key
+from preprocessing import PREPROCESS_STEPS, Preprocessor
+from registry import HotSwapClassifier, ModelRegistry, pinned, prediction_version
+from startup import StartupTimer, load_classifier, resolve_model_path, warmup
+from windowing import AGGREGATION_STRATEGIES, classify_windows, encode_document, needs_windows
+
+# Heavy libraries (torch, transformers, plotly) are imported on first use,
+# not here, so the app shell comes up before the model is loaded.
 
 # ==============================================
 # CONFIGURATION
 # ==============================================
-CONFIDENCE_THRESHOLD = 0.8
-MODEL_PATH = "AhmadDS04/arabert-fake-news"
+MODEL_SNAPSHOT_DIR = "models/arabert-snapshot"  # written by `python startup.py snapshot`; hub is used when absent
+WARMUP_ON_START = True
+INFERENCE_BACKEND = "torch"  # "torch" or "onnxruntime"
+ONNX_MODEL_PATH = "models/arabert-onnx"  # written by `python onnx_backend.py export`
+INFERENCE_MODE = "fp32"  # "fp32", "bf16" (half-size weights) or "int8" (dynamic INT8 quantization for CPU nodes)
+MMAP_WEIGHTS = True  # map safetensors weights from disk instead of copying them into process memory
+QUANTIZED_MODEL_PATH = None  # saved INT8 artifact; MODEL_PATH is quantized at load time when None
+INFERENCE_WORKERS = 1  # >1 runs the fp32/bf16 torch backend in that many processes sharing one copy of the weights
+STUDENT_MODEL_PATH = None  # written by `python distillation.py distill`; confident student answers skip AraBERT
+CASCADE_MARGIN = 0.1  # the student answers only when its confidence is at least the threshold + this
+TEXT_PREPROCESSING = PREPROCESS_STEPS  # cleaning run before cache lookup and tokenization; () only collapses whitespace
+MODEL_REGISTRY_DIR = "models/registry"  # versions managed by `python registry.py`; MODEL_PATH serves until one is promoted, None disables
+REGISTRY_POLL_SECONDS = 10  # how often a running app checks for a promoted or rolled-back version to hot-swap to
+ENSEMBLE_MODEL_PATHS = ()  # extra models whose logits are averaged with MODEL_PATH's in one batched step (torch backend)
+SHADOW_MODEL_PATHS = ()  # candidate models scored against live traffic in the background; never change the answer
+SHADOW_LOG_PATH = None  # e.g. "shadow.jsonl" for one line per shadow-scored text
+SHADOW_OVERHEAD_BUDGET = 0.05  # shadow sampling backs off when it raises mean primary latency by more than this
+EARLY_EXIT_PATH = None  # written by `python early_exit.py train`; confident texts stop at an intermediate layer (torch fp32/bf16, base model)
+CALIBRATION_PATH = "models/calibration.json"  # written by `python calibration.py fit`; default threshold when absent
+MAX_BATCH_SIZE = 16
+MAX_BATCH_WAIT_MS = 10
+CACHE_MAX_ENTRIES = 10000
+CACHE_TTL_SECONDS = 7 * 24 * 3600
+CACHE_DB_PATH = None  # e.g. "prediction_cache.sqlite3" to keep predictions across restarts
+NEARDUP_THRESHOLD = 0.85  # reuse the verdict of a prior text this similar (MinHash Jaccard); None disables
+NEARDUP_DB_PATH = None  # e.g. "near_duplicates.sqlite3" to keep the index across restarts
+NEARDUP_MAX_ENTRIES = 10000
+NEARDUP_TTL_SECONDS = 7 * 24 * 3600
+EXPLAIN_BUDGET = 64  # perturbed copies scored per word-level explanation
+ANALYSIS_WORKERS = 4  # background analysis/explanation jobs running at once across sessions
+GAUGE_RENDERER = "svg"  # "svg" (static inline gauge, no chart payload) or "plotly" (interactive figure)
+POLL_INTERVAL_SECONDS = 0.25  # how often a pending analysis/explanation is checked; polling stops once both are done
+METRICS_PORT = 9108  # Prometheus scrape endpoint at :9108/metrics; None disables it
+TRACE_LOG_PATH = None  # e.g. "traces.jsonl" for one JSON line of stage timings per analysis
+MONITOR_STATE_PATH = None  # e.g. "monitor_state.json" written by `python monitor.py --state`; shows the Feed Monitor section
+MONITOR_REFRESH_SECONDS = 5
+
+# Identity of the served weights in cache and index keys
+SERVED_MODEL_ID = (
+    f"{MODEL_PATH}@{INFERENCE_BACKEND}-{INFERENCE_MODE}"
+    + ("+ensemble" if ENSEMBLE_MODEL_PATHS else "")
+    + ("+early-exit" if EARLY_EXIT_PATH else "")
+    + ("+cascade" if STUDENT_MODEL_PATH else "")
+)
+WORKER_POOL_ENABLED = (
+    INFERENCE_WORKERS > 1 and INFERENCE_BACKEND == "torch" and INFERENCE_MODE != "int8"
+    and not ENSEMBLE_MODEL_PATHS and not EARLY_EXIT_PATH
+)
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 
 st.set_page_config(
     page_title="Arabic Fake News Detection System",
@@ -439,123 +513,666 @@ st.markdown("""
 # ==============================================
 # MODEL LOADING (CACHED)
 # ==============================================
+def build_model(version_dir=None, timer=None):
+    """
+    Load one model version for the configured backend and warm it up.
+    version_dir is a model registry version; None loads the configured
+    base model (local snapshot when present). Also used for hot-swaps.
+    """
+    timer = timer or StartupTimer()
+    if INFERENCE_BACKEND == "onnxruntime":
+        with timer.phase("imports"):
+            from onnx_backend import build_onnx_classifier
+        with timer.phase("model"):
+            classifier = build_onnx_classifier(version_dir or ONNX_MODEL_PATH)
+    elif INFERENCE_MODE == "int8":
+        with timer.phase("imports"):
+            from quantization import build_quantized_classifier
+        with timer.phase("model"):
+            model_path, _ = resolve_model_path(MODEL_PATH, MODEL_SNAPSHOT_DIR)
+            classifier = build_quantized_classifier(version_dir or QUANTIZED_MODEL_PATH or model_path)
+    else:
+        classifier = load_classifier(
+            version_dir or MODEL_PATH,
+            snapshot_dir=None if version_dir else MODEL_SNAPSHOT_DIR,
+            timer=timer,
+            mmap=MMAP_WEIGHTS,
+            dtype="bf16" if INFERENCE_MODE == "bf16" else None
+        )
+        if ENSEMBLE_MODEL_PATHS:
+            from shadow import EnsembleClassifier
+            members = [classifier] + [
+                load_classifier(path, timer=timer, mmap=MMAP_WEIGHTS,
+                                dtype="bf16" if INFERENCE_MODE == "bf16" else None)
+                for path in ENSEMBLE_MODEL_PATHS
+            ]
+            classifier = EnsembleClassifier(members)
+        elif EARLY_EXIT_PATH and version_dir is None:
+            # Exit heads are distilled from one model; registry versions run every layer
+            from early_exit import EarlyExitClassifier
+            with timer.phase("exit heads"):
+                classifier = EarlyExitClassifier.load(classifier, EARLY_EXIT_PATH)
+    
+    # Pay one-off first-call costs before the first real request
+    if WARMUP_ON_START:
+        warmup(classifier, batch_sizes=(1, MAX_BATCH_SIZE), timer=timer)
+    
+    if WORKER_POOL_ENABLED:
+        from workerpool import WorkerPool
+        with timer.phase("workers"):
+            classifier = WorkerPool(classifier, workers=INFERENCE_WORKERS)
+    return classifier
+
 @st.cache_resource(show_spinner=False)
 def load_model():
     """
     Load the pre-trained AraBERT model and create a classification pipeline.
     Cached to prevent reloading on every interaction.
+    Serves the model registry's active version when one is promoted and
+    hot-swaps in the background whenever the active version changes.
+    Logs a per-phase startup timing breakdown.
     """
+    timer = StartupTimer()
     try:
-        tokenizer = AutoTokenizer.from_pretrained(MODEL_PATH)
-        model = AutoModelForSequenceClassification.from_pretrained(MODEL_PATH)
-
-        # Configure label mapping
-        model.config.id2label = {0: "Real", 1: "Fake"}
-        model.config.label2id = {"Real": 0, "Fake": 1}
-
-        # Create classification pipeline
-        classifier = pipeline(
-            "text-classification",
-            model=model,
-            tokenizer=tokenizer,
-            return_all_scores=True
-        )
+        if MODEL_REGISTRY_DIR is None:
+            classifier = build_model(timer=timer)
+        else:
+            registry = ModelRegistry(MODEL_REGISTRY_DIR)
+            version = registry.active()
+            classifier = HotSwapClassifier(
+                build_model,
+                registry,
+                version=version,
+                classifier=build_model(registry.path(version) if version else None, timer)
+            )
+            classifier.follow(REGISTRY_POLL_SECONDS)
         
+        summary = timer.log_summary()
+        STAGE_LATENCY.observe(summary["total"] / 1000.0, stage="load_model")
         return classifier
     except Exception as e:
+        ERRORS.inc(stage="load_model")
         st.error(f"❌ Failed to load model: {str(e)}")
         return None
 
+@st.cache_resource(show_spinner=False)
+def load_decision_calibration():
+    """
+    Temperature and confidence threshold chosen with calibration.py.
+    Falls back to unscaled scores and CONFIDENCE_THRESHOLD.
+    """
+    return load_calibration(CALIBRATION_PATH)
+
+@st.cache_resource(show_spinner=False)
+def load_engine():
+    """
+    Wrap the cached classifier in a micro-batching engine shared by all sessions.
+    Concurrent analyses are grouped into a single padded forward pass.
+    With INFERENCE_WORKERS > 1 batches run in parallel worker processes.
+    With STUDENT_MODEL_PATH set, a distilled student answers confident texts first.
+    """
+    classifier = load_model()
+    if classifier is None:
+        return None
+    
+    concurrency = INFERENCE_WORKERS if WORKER_POOL_ENABLED else 1
+    
+    if STUDENT_MODEL_PATH:
+        from distillation import build_cascade
+        calibration = load_decision_calibration()
+        classifier = build_cascade(
+            classifier, STUDENT_MODEL_PATH,
+            threshold=calibration["threshold"], margin=CASCADE_MARGIN,
+            temperature=calibration["temperature"]
+        )
+    
+    return BatchingEngine(
+        classifier,
+        max_batch_size=MAX_BATCH_SIZE,
+        max_wait_ms=MAX_BATCH_WAIT_MS,
+        concurrency=concurrency
+    )
+
+@st.cache_resource(show_spinner=False)
+def load_shadow():
+    """
+    Candidate models scored in shadow mode against the served model.
+    Returns None when SHADOW_MODEL_PATHS is empty or a candidate fails to load.
+    """
+    if not SHADOW_MODEL_PATHS:
+        return None
+    engine = load_engine()
+    if engine is None:
+        return None
+    try:
+        from inference import build_classifier
+        from shadow import ShadowEvaluator
+        candidates = {path: build_classifier(path) for path in SHADOW_MODEL_PATHS}
+    except Exception as e:
+        logging.getLogger("shadow").warning("Shadow mode disabled: %s", e)
+        return None
+    calibration = load_decision_calibration()
+    return ShadowEvaluator(
+        engine.classifier.tokenizer,
+        candidates,
+        threshold=calibration["threshold"],
+        temperature=calibration["temperature"],
+        overhead_budget=SHADOW_OVERHEAD_BUDGET,
+        log=TraceLog(SHADOW_LOG_PATH) if SHADOW_LOG_PATH else None
+    )
+
+@st.cache_resource(show_spinner=False)
+def load_prediction_cache():
+    """
+    Shared prediction cache keyed on normalized text and model revision.
+    Repeated articles skip the transformer entirely.
+    """
+    return PredictionCache(
+        max_entries=CACHE_MAX_ENTRIES,
+        ttl_seconds=CACHE_TTL_SECONDS,
+        db_path=CACHE_DB_PATH
+    )
+
+@st.cache_resource(show_spinner=False)
+def load_neardup_index(model_id):
+    """
+    Shared MinHash/LSH index of classified texts for the given model identity.
+    Lightly edited variants of a known story reuse its stored verdict.
+    """
+    return NearDuplicateIndex(
+        model_id,
+        threshold=NEARDUP_THRESHOLD,
+        db_path=NEARDUP_DB_PATH,
+        max_entries=NEARDUP_MAX_ENTRIES,
+        ttl_seconds=NEARDUP_TTL_SECONDS
+    )
+
+@st.cache_resource(show_spinner=False)
+def load_explanation_cache():
+    """
+    Shared cache of word-level explanations keyed like the prediction cache.
+    """
+    return ExplanationCache()
+
+@st.cache_resource(show_spinner=False)
+def start_metrics():
+    """
+    Start the /metrics endpoint once per process and open the trace log.
+    Returns the shared TraceLog, or None when tracing is disabled.
+    """
+    if METRICS_PORT is not None:
+        try:
+            start_metrics_server(METRICS_PORT)
+        except OSError as e:
+            logging.getLogger("metrics").warning("Metrics endpoint not started: %s", e)
+    return TraceLog(TRACE_LOG_PATH) if TRACE_LOG_PATH else None
+
+@st.cache_resource(show_spinner=False)
+def load_job_manager():
+    """
+    Shared background job runner for analyses and explanations.
+    Slow requests run off the session's script thread and are polled.
+    """
+    return JobManager(max_workers=ANALYSIS_WORKERS)
+
+def get_session_id():
+    """Stable id of the browser session, used to scope its jobs."""
+    if "session_id" not in st.session_state:
+        st.session_state["session_id"] = uuid.uuid4().hex
+    return st.session_state["session_id"]
+
 # ==============================================
-# CONFIDENCE GAUGE VISUALIZATION
+# BACKGROUND ANALYSIS
 # ==============================================
-def create_confidence_gauge(confidence_score, decision_type):
+def score_text(engine, news_text, aggregation_strategy, prediction_cache, neardup_index, trace_log, calibration,
+               shadow=None):
     """
-    Create an elegant, professional confidence gauge using Plotly.
-    
-    Args:
-        confidence_score: Float between 0 and 1
-        decision_type: 'real', 'fake', or 'uncertain'
+    Score one text for the UI. Runs on a job thread, so no Streamlit calls.
     
     Returns:
-        Plotly figure object
+        Dict with the probabilities, decision and how they were obtained
     """
-    # Color mapping based on decision type
-    color_map = {
-        'real': '#10b981',
-        'fake': '#ef4444',
-        'uncertain': '#f59e0b'
-    }
-    
-    gauge_color = color_map.get(decision_type, '#6366f1')
-    confidence_percent = confidence_score * 100
-    
-    fig = go.Figure(go.Indicator(
-        mode="gauge+number",
-        value=confidence_percent,
-        domain={'x': [0, 1], 'y': [0, 1]},
-        number={
-            'suffix': "%",
-            'font': {
-                'size': 56,
-                'color': gauge_color,
-                'family': 'Inter, sans-serif',
-                'weight': 900
-            },
-            'valueformat': '.1f'
-        },
-        gauge={
-            'axis': {
-                'range': [0, 100],
-                'tickwidth': 2,
-                'tickcolor': '#374151',
-                'tickfont': {'size': 13, 'color': '#9ca3af', 'family': 'Inter'}
-            },
-            'bar': {
-                'color': gauge_color,
-                'thickness': 0.75,
-                'line': {'width': 0}
-            },
-            'bgcolor': '#1f2937',
-            'borderwidth': 3,
-            'bordercolor': '#374151',
-            'steps': [
-                {'range': [0, 50], 'color': 'rgba(239, 68, 68, 0.1)'},
-                {'range': [50, 80], 'color': 'rgba(245, 158, 11, 0.1)'},
-                {'range': [80, 100], 'color': 'rgba(16, 185, 129, 0.1)'}
-            ],
-            'threshold': {
-                'line': {'color': '#f9fafb', 'width': 4},
-                'thickness': 0.8,
-                'value': CONFIDENCE_THRESHOLD * 100
-            }
-        },
-        title={
-            'text': "Confidence Level",
-            'font': {'size': 18, 'color': '#e5e7eb', 'family': 'Inter', 'weight': 700}
-        }
-    ))
-    
-    fig.update_layout(
-        height=320,
-        margin=dict(l=30, r=30, t=80, b=30),
-        paper_bgcolor="rgba(0,0,0,0)",
-        plot_bgcolor="rgba(0,0,0,0)",
-        font={'color': "#f9fafb", 'family': "Inter, sans-serif"},
-        annotations=[
-            dict(
-                text=f"Decision Threshold: {CONFIDENCE_THRESHOLD*100:.0f}%",
-                x=0.5,
-                y=-0.15,
-                xref="paper",
-                yref="paper",
-                showarrow=False,
-                font=dict(size=13, color="#6b7280", family="Inter")
+    trace = RequestTrace(trace_log, source="app")
+    try:
+        # Tokenize once to decide between single-pass and windowed inference
+        classifier = engine.classifier
+        revision = model_revision(classifier)
+        model_version = revision
+        primary_seconds = None
+        with trace.stage("tokenize"):
+            encoding = encode_document(classifier.tokenizer, news_text)
+            windowed = needs_windows(classifier.tokenizer, encoding)
+        record_input(len(news_text), len(encoding["input_ids"]))
+        
+        with trace.stage("inference"):
+            # Aggregation only changes scores for windowed documents
+            variant = aggregation_strategy if windowed else ""
+            key = cache_key(
+                news_text,
+                SERVED_MODEL_ID,
+                revision,
+                variant=variant
             )
-        ]
+            cached = prediction_cache.get(key)
+            window_result = None
+            
+            # Recycled story: a near-identical text was already scored
+            near_match = None
+            if cached is None and neardup_index is not None:
+                near_match = neardup_index.query(news_text, variant=variant)
+            
+            if cached is not None:
+                # Previously scored text (after normalization)
+                prob_real, prob_fake = cached
+            elif near_match is not None:
+                prob_real, prob_fake = near_match["prob_real"], near_match["prob_fake"]
+            elif windowed:
+                # Long article: classify overlapping windows in one batched
+                # pass, all on the one version leased for the document
+                with pinned(classifier) as (windows_classifier, window_version):
+                    window_result = classify_windows(
+                        windows_classifier,
+                        news_text,
+                        strategy=aggregation_strategy,
+                        threshold=calibration["threshold"],
+                        encoding=encoding
+                    )
+                prob_real = window_result["prob_real"]
+                prob_fake = window_result["prob_fake"]
+                model_version = window_version or model_version
+                if model_version != revision:
+                    key = cache_key(news_text, SERVED_MODEL_ID, model_version, variant=variant)
+            else:
+                # Get model predictions
+                start = time.perf_counter()
+                outputs = engine.classify(news_text)
+                primary_seconds = time.perf_counter() - start
+                
+                # Extract probabilities
+                prob_real, prob_fake = extract_probabilities(outputs)
+                
+                # A hot-swap may have landed since the cache key was built
+                model_version = prediction_version(outputs) or model_version
+                if model_version != revision:
+                    key = cache_key(news_text, SERVED_MODEL_ID, model_version, variant=variant)
+            
+            # Only fresh model scores enter either layer; a near-duplicate
+            # verdict stays a near-duplicate match on every later lookup
+            if cached is None and near_match is None:
+                prediction_cache.put(key, prob_real, prob_fake)
+                if neardup_index is not None:
+                    neardup_index.add(news_text, prob_real, prob_fake, variant=variant)
+        record_cache(cached is not None)
+        
+        # Caches hold raw scores; calibrate, then apply the confidence threshold
+        raw_real, raw_fake = prob_real, prob_fake
+        prob_real, prob_fake = apply_temperature(prob_real, prob_fake, calibration["temperature"])
+        threshold = calibration["threshold"]
+        decision, confidence = decide(prob_real, prob_fake, threshold)
+        record_decision(decision, confidence, threshold)
+        
+        # Fresh single-pass scores only; the shadow reuses this request's token ids
+        if shadow is not None and primary_seconds is not None:
+            shadow.record_primary(primary_seconds)
+            shadow.observe(news_text, encoding["input_ids"], raw_real, raw_fake, decision)
+        
+        trace.annotate(
+            chars=len(news_text),
+            tokens=len(encoding["input_ids"]),
+            windowed=windowed,
+            cache_hit=cached is not None,
+            decision=decision,
+            confidence=round(confidence, 4),
+            model_version=model_version
+        )
+    finally:
+        trace.finish()
+    
+    return {
+        "prob_real": prob_real,
+        "prob_fake": prob_fake,
+        "decision": decision,
+        "confidence": confidence,
+        "threshold": threshold,
+        "window_result": window_result,
+        "cached": cached is not None,
+        "near_match": near_match,
+        "revision": revision,
+        "model_version": model_version,
+        "completed_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+def explain_text(classifier, news_text, explain_key, explanation_cache, trace_log):
+    """Word-level explanation for the UI, run on a job thread and cached."""
+    trace = RequestTrace(trace_log, source="app")
+    try:
+        with trace.stage("explain"):
+            explanation = explain(classifier, news_text, budget=EXPLAIN_BUDGET)
+        trace.annotate(chars=len(news_text), explain_budget=EXPLAIN_BUDGET)
+    finally:
+        trace.finish()
+    explanation_cache.put(explain_key, explanation)
+    return explanation
+
+# ==============================================
+# PROGRESSIVE RESULTS
+# ==============================================
+def render_verdict(result):
+    """Decision card and score cards: everything that only needs the scores."""
+    decision = result["decision"]
+    if decision == "uncertain":
+        decision_en = "Uncertain — Requires Review"
+        decision_ar = "غير مؤكد — يحتاج إلى مراجعة"
+        emoji = "⚠️"
+        card_class = "decision-card-uncertain"
+        title_class = "decision-title-uncertain"
+    elif decision == "fake":
+        decision_en = "Fake News Detected"
+        decision_ar = "تم اكتشاف خبر مزيف"
+        emoji = "🚨"
+        card_class = "decision-card-fake"
+        title_class = "decision-title-fake"
+    else:
+        decision_en = "Real News Detected"
+        decision_ar = "تم اكتشاف خبر حقيقي"
+        emoji = "✅"
+        card_class = "decision-card-real"
+        title_class = "decision-title-real"
+    
+    # Custom divider
+    st.markdown("<div class='custom-divider'></div>", unsafe_allow_html=True)
+    
+    # Decision card
+    st.markdown(f"""
+    <div class='decision-card {card_class}'>
+        <span class='decision-icon'>{emoji}</span>
+        <h2 class='decision-title {title_class}'>{decision_en}</h2>
+        <p class='decision-subtitle'>{decision_ar}</p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    # Score breakdown
+    st.markdown("<div class='section-header'>🔢 Detailed Scores</div>", unsafe_allow_html=True)
+    
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        st.markdown(f"""
+        <div class='score-card'>
+            <div class='score-label'>Confidence</div>
+            <div class='score-value score-value-confidence'>{result['confidence']:.1%}</div>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col2:
+        st.markdown(f"""
+        <div class='score-card'>
+            <div class='score-label'>Real Score</div>
+            <div class='score-value score-value-real'>{result['prob_real']:.4f}</div>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col3:
+        st.markdown(f"""
+        <div class='score-card'>
+            <div class='score-label'>Fake Score</div>
+            <div class='score-value score-value-fake'>{result['prob_fake']:.4f}</div>
+        </div>
+        """, unsafe_allow_html=True)
+
+def render_gauge(result, record=True):
+    """
+    Confidence gauge, built after the verdict is already on screen.
+    record=False skips the render latency metric (repeat renders of a result).
+    """
+    st.markdown("<div class='section-header'>📊 Confidence Analysis</div>", unsafe_allow_html=True)
+    
+    start = time.perf_counter()
+    if GAUGE_RENDERER == "svg":
+        st.markdown(confidence_gauge_svg(result["confidence"], result["decision"], result["threshold"]), unsafe_allow_html=True)
+    else:
+        gauge_fig = create_confidence_gauge(result["confidence"], result["decision"], result["threshold"])
+        st.plotly_chart(gauge_fig, use_container_width=True, config={'displayModeBar': False})
+    if record:
+        STAGE_LATENCY.observe(time.perf_counter() - start, stage="render")
+
+def render_windows(result, news_text):
+    """Window breakdown for long documents."""
+    window_result = result["window_result"]
+    st.markdown("<div class='section-header'>🧩 Window Analysis</div>", unsafe_allow_html=True)
+    st.caption(
+        f"📄 {window_result['n_tokens']} tokens split into {len(window_result['windows'])} "
+        f"overlapping windows | Aggregation: {window_result['strategy']}"
     )
+    for index in window_result["drivers"]:
+        window = window_result["windows"][index]
+        excerpt = ""
+        if "char_start" in window:
+            excerpt = news_text[window["char_start"]:window["char_end"]][:200]
+        st.markdown(
+            f"**Window {index + 1}** — Real {window['prob_real']:.4f} | "
+            f"Fake {window['prob_fake']:.4f} | Weight {window['weight']:.2f}"
+        )
+        if excerpt:
+            st.caption(f"…{excerpt}…")
+
+def render_explanation(news_text, explanation):
+    """Word-level explanation for reviewers."""
+    st.markdown("<div class='section-header'>🔎 Word Contributions</div>", unsafe_allow_html=True)
+    st.markdown(render_highlights(news_text, explanation), unsafe_allow_html=True)
+    
+    drivers = top_drivers(explanation)
+    if drivers["fake"]:
+        st.caption("🔴 Toward Fake: " + " · ".join(
+            f"{word['text']} ({word['contribution']:+.3f})" for word in drivers["fake"]
+        ))
+    if drivers["real"]:
+        st.caption("🟢 Toward Real: " + " · ".join(
+            f"{word['text']} ({word['contribution']:+.3f})" for word in drivers["real"]
+        ))
+    
+    grouping = "per word" if explanation["span_size"] == 1 else f"in runs of {explanation['span_size']} words"
+    st.caption(
+        f"⏱️ {explanation['evaluations']} occluded copies {grouping}, "
+        f"{explanation['forward_passes']} forward passes, {explanation['elapsed_ms']:.0f} ms "
+        f"(≈{explanation['cost_ratio']:.1f}× a plain classification)"
+    )
+    if explanation["unseen_words"]:
+        st.caption(
+            f"{explanation['unseen_words']} words beyond the model's 512-token input are shown in grey."
+        )
+
+def render_guidance(result):
+    """Interpretation guidance, timestamp and provenance of the scores."""
+    decision = result["decision"]
+    st.markdown("<div class='section-header'>💡 Interpretation Guide</div>", unsafe_allow_html=True)
+    
+    if decision == "uncertain":
+        st.info(f"""
+        **⚠️ Low Confidence Alert**
+        
+        The model's confidence is below the threshold ({result['threshold']:.0%}). This could indicate:
+        - Ambiguous or mixed content patterns
+        - Text characteristics falling between fake and real news patterns
+        - Unusual writing style or structure
+        
+        **Recommendation:** Exercise caution and verify through additional trusted sources.
+        """)
+    elif decision == "fake":
+        st.warning("""
+        **🚨 Fake News Indicators Detected**
+        
+        The analysis suggests patterns commonly associated with misinformation:
+        - Sensationalized language or claims
+        - Lack of credible source attribution
+        - Emotional manipulation tactics
+        
+        **Recommendation:** Verify claims through official sources and fact-checking organizations.
+        """)
+    else:
+        st.success("""
+        **✅ Authentic News Indicators Detected**
+        
+        The analysis suggests patterns commonly associated with legitimate news:
+        - Balanced and objective language
+        - Credible source references
+        - Factual presentation style
+        
+        **Note:** Always maintain critical thinking and cross-reference important information.
+        """)
+    
+    # Timestamp
+    st.caption(f"🕒 Analysis completed at: {result['completed_at']} | Model version: {result['model_version']}")
+    near_match = result["near_match"]
+    if result["cached"]:
+        st.caption("⚡ Served from prediction cache | نتيجة محفوظة مسبقاً")
+    elif near_match is not None:
+        st.caption(
+            f"♻️ Matched prior item #{near_match['id']} "
+            f"({near_match['similarity']:.0%} similar) | مطابق لخبر سابق: "
+            f"…{near_match['excerpt'][:120]}…"
+        )
+
+@st.fragment(run_every=POLL_INTERVAL_SECONDS)
+def poll_jobs(job_manager, job_ids):
+    """
+    Timed check on pending jobs; only rendered while one is in flight.
+    Reruns the app once they have all finished, which renders the
+    results without this poller, so polling stops.
+    """
+    jobs = [job for job in (job_manager.get(job_id) for job_id in job_ids) if job is not None]
+    if all(job.done() for job in jobs):
+        st.rerun()
+
+@st.fragment
+def analysis_results(job_manager, engine, explanation_cache, trace_log, explain_all):
+    """
+    Render this session's analysis job with whatever is ready.
     
-    return fig
+    The verdict appears as soon as the scores exist, the gauge follows,
+    and the explanation fills in when its own job finishes. While either
+    job is pending a small timed fragment (``poll_jobs``) watches it;
+    finished results are rendered once and not polled.
+    """
+    job = job_manager.get(st.session_state.get("analysis_job"))
+    if job is None:
+        return
+    news_text = st.session_state["analysis_text"]
+    
+    if job.status == "cancelled":
+        st.info("✖️ Analysis cancelled | تم إلغاء التحليل")
+        return
+    if job.status == "failed":
+        st.error(f"❌ **Analysis Error**\n\nAn error occurred during processing: {str(job.error)}\n\nPlease try again or contact support if the issue persists.")
+        return
+    if not job.done():
+        st.caption(f"🔄 Analyzing text... ({job.status}, {job.elapsed():.1f}s) | جاري التحليل... يرجى الانتظار")
+        if st.button("✖️ Cancel | إلغاء", key="cancel_analysis"):
+            job_manager.cancel(job.id)
+        poll_jobs(job_manager, [job.id])
+        return
+    
+    # ==============================================
+    # RESULTS DISPLAY
+    # ==============================================
+    result = job.result
+    first_render = st.session_state.get("rendered_job") != job.id
+    st.session_state["rendered_job"] = job.id
+    st.markdown("<div class='results-container'>", unsafe_allow_html=True)
+    render_verdict(result)
+    render_gauge(result, record=first_render)
+    if result["window_result"] is not None:
+        render_windows(result, news_text)
+    
+    # Explanations run as a separate job so they never delay the verdict;
+    # they always occlude through AraBERT, never the cascade's student
+    explainer = getattr(engine.classifier, "teacher", engine.classifier)
+    explain_job = None
+    if result["decision"] == "uncertain" or explain_all:
+        explain_key = cache_key(
+            news_text,
+            SERVED_MODEL_ID,
+            result["revision"],
+            variant=f"explain-{EXPLAIN_BUDGET}"
+        )
+        explanation = explanation_cache.get(explain_key)
+        if explanation is None:
+            # Submit once per result; a failed explanation is reported, not retried
+            submitted = st.session_state.get("explain_job")
+            if submitted is not None and submitted[0] == explain_key:
+                explain_job = job_manager.get(submitted[1])
+            if explain_job is None:
+                explain_job = job_manager.submit(
+                    get_session_id(), "explain", explain_key,
+                    explain_text, explainer, news_text, explain_key, explanation_cache, trace_log
+                )
+                st.session_state["explain_job"] = (explain_key, explain_job.id)
+            explanation = explain_job.result
+            if explain_job.status == "failed":
+                st.error(f"❌ **Explanation Error**\n\n{str(explain_job.error)}")
+            elif not explain_job.done():
+                st.caption("🔎 Explaining the score... | جاري تفسير النتيجة...")
+        if explanation is not None:
+            render_explanation(news_text, explanation)
+    
+    render_guidance(result)
+    removed = st.session_state.get("analysis_raw_chars", 0) - len(news_text)
+    if removed > 0:
+        st.caption(f"🧹 Preprocessing removed {removed} characters (links, emojis, diacritics, boilerplate) before analysis")
+    st.markdown("</div>", unsafe_allow_html=True)
+    
+    if explain_job is not None and not explain_job.done():
+        poll_jobs(job_manager, [explain_job.id])
+
+@st.fragment(run_every=MONITOR_REFRESH_SECONDS)
+def feed_monitor():
+    """Live view of the state file written by a running ``monitor.py``."""
+    try:
+        with open(MONITOR_STATE_PATH, "r", encoding="utf-8") as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        st.caption("📡 Waiting for the feed monitor to write its state | في انتظار مراقب الأخبار")
+        return
+    
+    counts = snapshot["counts"]
+    latency = snapshot["latency_ms"]
+    stale = time.time() - snapshot["updated"]
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Classified", counts.get("classified", 0))
+    col2.metric("Duplicates", counts.get("duplicate", 0))
+    col3.metric("Queue", f"{snapshot['queue_depth']}/{snapshot['max_queue']}")
+    col4.metric("Latency p95", f"{latency['p95']:.0f} ms")
+    if counts.get("shed") or counts.get("blocked"):
+        st.caption(
+            f"⏳ Backpressure: {counts.get('blocked', 0)} items waited for queue space, "
+            f"{counts.get('shed', 0)} shed ({snapshot['overflow']} policy)"
+        )
+    if stale > 3 * MONITOR_REFRESH_SECONDS:
+        st.warning(f"⚠️ Monitor state is {stale:.0f}s old; is `monitor.py` still running?")
+    
+    window_minutes = snapshot["window_seconds"] // 60
+    st.dataframe(
+        [
+            {
+                "Source": row["source"],
+                "Window (UTC)": datetime.fromtimestamp(row["window_start"], timezone.utc).strftime("%Y-%m-%d %H:%M"),
+                "Items": row["total"],
+                "Fake": row["fake"],
+                "Uncertain": row["uncertain"],
+                "Fake rate": f"{row['fake_rate']:.1%}",
+            }
+            for row in snapshot["windows"]
+        ],
+        hide_index=True,
+        use_container_width=True,
+    )
+    st.caption(f"Current {window_minutes}-minute window per source; * is every source combined")
+    for alert in snapshot["alerts"][:5]:
+        st.error(
+            f"🚨 **{alert['source']}**: {alert['fake_rate']:.0%} Fake "
+            f"({alert['fake']} of {alert['total']}) in the window starting "
+            f"{datetime.fromtimestamp(alert['window_start'], timezone.utc).strftime('%Y-%m-%d %H:%M')} UTC"
+        )
 
 # ==============================================
 # MAIN APPLICATION
@@ -565,9 +1182,16 @@ def main():
     
     # Load the model
     with st.spinner("🔄 Loading AI model..."):
-        classifier = load_model()
-    
-    if classifier is None:
+        engine = load_engine()
+        prediction_cache = load_prediction_cache()
+        explanation_cache = load_explanation_cache()
+        job_manager = load_job_manager()
+        trace_log = start_metrics()
+        calibration = load_decision_calibration()
+        shadow = load_shadow()
+        preprocessor = Preprocessor(TEXT_PREPROCESSING)
+    
+    if engine is None:
         st.error("❌ Unable to initialize the application. Please check the model files.")
         return
     
@@ -602,6 +1226,19 @@ def main():
     if char_count > 0:
         st.caption(f"📊 Character count: {char_count} | عدد الأحرف: {char_count}")
     
+    # Long-document aggregation strategy
+    aggregation_strategy = st.sidebar.selectbox(
+        "Long-document aggregation",
+        AGGREGATION_STRATEGIES,
+        help="How per-window scores are combined for articles longer than 512 tokens.",
+        key="aggregation_strategy"
+    )
+    explain_all = st.sidebar.checkbox(
+        "Explain every result",
+        help="Highlight the words that drove the score. Uncertain results are always explained.",
+        key="explain_all"
+    )
+    
     # Analysis button
     analyze_clicked = st.button("🔍 Analyze Text | تحليل النص")
     
@@ -609,151 +1246,180 @@ def main():
     # ANALYSIS LOGIC
     # ==============================================
     if analyze_clicked:
+        # Clean once so the job key, the caches and the model all see the same text
+        clean_text = preprocessor(news_text)
+        
         # Input validation
-        if char_count < 10:
+        if len(clean_text) < 10:
             st.warning("⚠️ **Input too short** | النص قصير جداً\n\nPlease provide at least 10 characters for meaningful analysis. | الرجاء إدخال 10 أحرف على الأقل للحصول على تحليل دقيق.")
         else:
-            # Show processing state
-            with st.spinner("🔄 Analyzing text... Please wait | جاري التحليل... يرجى الانتظار"):
-                try:
-                    # Get model predictions
-                    outputs = classifier(news_text)[0]
-                    
-                    # Extract probabilities
-                    scores = {item["label"]: item["score"] for item in outputs}
-                    prob_real = scores.get("Real", 0)
-                    prob_fake = scores.get("Fake", 0)
-                    confidence = max(prob_real, prob_fake)
-                    
-                    # Determine decision based on confidence threshold
-                    if confidence < CONFIDENCE_THRESHOLD:
-                        decision = "uncertain"
-                        decision_en = "Uncertain — Requires Review"
-                        decision_ar = "غير مؤكد — يحتاج إلى مراجعة"
-                        emoji = "⚠️"
-                        card_class = "decision-card-uncertain"
-                        title_class = "decision-title-uncertain"
-                    elif prob_fake > prob_real:
-                        decision = "fake"
-                        decision_en = "Fake News Detected"
-                        decision_ar = "تم اكتشاف خبر مزيف"
-                        emoji = "🚨"
-                        card_class = "decision-card-fake"
-                        title_class = "decision-title-fake"
-                    else:
-                        decision = "real"
-                        decision_en = "Real News Detected"
-                        decision_ar = "تم اكتشاف خبر حقيقي"
-                        emoji = "✅"
-                        card_class = "decision-card-real"
-                        title_class = "decision-title-real"
-                    
-                    # ==============================================
-                    # RESULTS DISPLAY
-                    # ==============================================
-                    st.markdown("<div class='results-container'>", unsafe_allow_html=True)
-                    
-                    # Custom divider
-                    st.markdown("<div class='custom-divider'></div>", unsafe_allow_html=True)
-                    
-                    # Decision card
-                    st.markdown(f"""
-                    <div class='decision-card {card_class}'>
-                        <span class='decision-icon'>{emoji}</span>
-                        <h2 class='decision-title {title_class}'>{decision_en}</h2>
-                        <p class='decision-subtitle'>{decision_ar}</p>
-                    </div>
-                    """, unsafe_allow_html=True)
-                    
-                    # Confidence gauge section
-                    st.markdown("<div class='section-header'>📊 Confidence Analysis</div>", unsafe_allow_html=True)
-                    
-                    # Display the gauge
-                    gauge_fig = create_confidence_gauge(confidence, decision)
-                    st.plotly_chart(gauge_fig, use_container_width=True, config={'displayModeBar': False})
-                    
-                    # Score breakdown
-                    st.markdown("<div class='section-header'>🔢 Detailed Scores</div>", unsafe_allow_html=True)
-                    
-                    col1, col2, col3 = st.columns(3)
-                    
-                    with col1:
-                        st.markdown(f"""
-                        <div class='score-card'>
-                            <div class='score-label'>Confidence</div>
-                            <div class='score-value score-value-confidence'>{confidence:.1%}</div>
-                        </div>
-                        """, unsafe_allow_html=True)
-                    
-                    with col2:
-                        st.markdown(f"""
-                        <div class='score-card'>
-                            <div class='score-label'>Real Score</div>
-                            <div class='score-value score-value-real'>{prob_real:.4f}</div>
-                        </div>
-                        """, unsafe_allow_html=True)
-                    
-                    with col3:
-                        st.markdown(f"""
-                        <div class='score-card'>
-                            <div class='score-label'>Fake Score</div>
-                            <div class='score-value score-value-fake'>{prob_fake:.4f}</div>
-                        </div>
-                        """, unsafe_allow_html=True)
-                    
-                    # Interpretation guidance
-                    st.markdown("<div class='section-header'>💡 Interpretation Guide</div>", unsafe_allow_html=True)
-                    
-                    if decision == "uncertain":
-                        st.info("""
-                        **⚠️ Low Confidence Alert**
-                        
-                        The model's confidence is below the threshold (80%). This could indicate:
-                        - Ambiguous or mixed content patterns
-                        - Text characteristics falling between fake and real news patterns
-                        - Unusual writing style or structure
-                        
-                        **Recommendation:** Exercise caution and verify through additional trusted sources.
-                        """)
-                    elif decision == "fake":
-                        st.warning("""
-                        **🚨 Fake News Indicators Detected**
-                        
-                        The analysis suggests patterns commonly associated with misinformation:
-                        - Sensationalized language or claims
-                        - Lack of credible source attribution
-                        - Emotional manipulation tactics
-                        
-                        **Recommendation:** Verify claims through official sources and fact-checking organizations.
-                        """)
-                    else:
-                        st.success("""
-                        **✅ Authentic News Indicators Detected**
-                        
-                        The analysis suggests patterns commonly associated with legitimate news:
-                        - Balanced and objective language
-                        - Credible source references
-                        - Factual presentation style
-                        
-                        **Note:** Always maintain critical thinking and cross-reference important information.
-                        """)
-                    
-                    # Timestamp
-                    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    st.caption(f"🕒 Analysis completed at: {current_time}")
-                    
-                    st.markdown("</div>", unsafe_allow_html=True)
-                    
-                except Exception as e:
-                    st.error(f"❌ **Analysis Error**\n\nAn error occurred during processing: {str(e)}\n\nPlease try again or contact support if the issue persists.")
+            # Submit in the background; repeated clicks on the same text join the
+            # job already in flight, a new text supersedes it
+            neardup_index = None
+            if NEARDUP_THRESHOLD is not None:
+                neardup_index = load_neardup_index(f"{SERVED_MODEL_ID}@{model_revision(engine.classifier)}")
+            session_id = get_session_id()
+            job = job_manager.submit(
+                session_id, "analysis", (clean_text, aggregation_strategy),
+                score_text, engine, clean_text, aggregation_strategy, prediction_cache, neardup_index,
+                trace_log, calibration, shadow
+            )
+            if st.session_state.get("analysis_job") != job.id:
+                job_manager.cancel_slot(session_id, "explain")
+            st.session_state["analysis_job"] = job.id
+            st.session_state["analysis_text"] = clean_text
+            st.session_state["analysis_raw_chars"] = len(news_text.strip())
+    
+    analysis_results(job_manager, engine, explanation_cache, trace_log, explain_all)
+    
+    # ==============================================
+    # BULK ANALYSIS
+    # ==============================================
+    st.markdown("<div class='section-header'>📂 Bulk Analysis</div>", unsafe_allow_html=True)
+    
+    uploaded_file = st.file_uploader(
+        "Upload a CSV or JSONL file of articles | ارفع ملف CSV أو JSONL",
+        type=["csv", "jsonl"],
+        help="Each row must contain the article text in the selected column. Results stream to an output file of the same format.",
+        key="bulk_file_input"
+    )
+    text_column = st.text_input("Text column | عمود النص", value="text", key="bulk_text_column")
+    
+    if uploaded_file is not None and st.button("📂 Classify File | تصنيف الملف"):
+        fmt = detect_format(uploaded_file.name)
+        
+        # Key the work directory by the upload and every setting that changes
+        # its decisions, so clicking again after an interruption resumes the
+        # same output instead of starting over
+        digest = hashlib.sha256()
+        for chunk in iter(lambda: uploaded_file.read(1 << 20), b""):
+            digest.update(chunk)
+        uploaded_file.seek(0)
+        settings = [text_column, str(model_revision(engine.classifier)),
+                    str(calibration["threshold"]), str(calibration["temperature"])]
+        digest.update("\x00".join(settings).encode("utf-8"))
+        work_dir = os.path.join(tempfile.gettempdir(), f"bulk_{digest.hexdigest()[:32]}")
+        os.makedirs(work_dir, exist_ok=True)
+        input_path = os.path.join(work_dir, f"input.{fmt}")
+        output_path = os.path.join(work_dir, f"decisions.{fmt}")
+        
+        # Spool the upload to disk in chunks so it is streamed, not parsed in
+        # memory; an existing copy is left untouched so its checkpoint matches
+        if not os.path.exists(input_path):
+            partial_path = input_path + ".part"
+            with open(partial_path, "wb") as f:
+                for chunk in iter(lambda: uploaded_file.read(1 << 20), b""):
+                    f.write(chunk)
+            os.replace(partial_path, input_path)
+        
+        status = st.empty()
+        
+        # Sort each chunk of rows into length buckets to minimise padding
+        bucketed = BucketedClassifier(engine.classifier, bucket_size=MAX_BATCH_SIZE)
+        try:
+            total = classify_file(
+                input_path,
+                output_path,
+                bucketed,
+                text_column=text_column,
+                batch_size=MAX_BATCH_SIZE * BUCKET_READ_FACTOR,
+                threshold=calibration["threshold"],
+                temperature=calibration["temperature"],
+                preprocessor=preprocessor,
+                progress=lambda rows_done: status.caption(f"📊 Rows classified: {rows_done}")
+            )
+            st.success(f"✅ Classified {total} rows | تم تصنيف {total} صف")
+            bucket_stats = bucketed.stats()
+            st.caption(
+                f"📊 Padding ratio: {bucket_stats['padding_ratio']:.1%} | "
+                f"Throughput: {bucket_stats['tokens_per_s']:.0f} tokens/s"
+            )
+            with open(output_path, "rb") as f:
+                st.download_button(
+                    "⬇️ Download Results | تحميل النتائج",
+                    data=f,
+                    file_name=f"decisions.{fmt}",
+                    mime="text/csv" if fmt == "csv" else "application/x-ndjson"
+                )
+        except Exception as e:
+            st.error(f"❌ **Bulk Analysis Error**\n\n{str(e)}")
+    
+    # ==============================================
+    # FEED MONITOR
+    # ==============================================
+    if MONITOR_STATE_PATH:
+        st.markdown("<div class='section-header'>📡 Feed Monitor</div>", unsafe_allow_html=True)
+        feed_monitor()
+    
+    # ==============================================
+    # ENGINE STATISTICS
+    # ==============================================
+    with st.sidebar.expander("⚙️ Inference Engine"):
+        stats = engine.stats()
+        st.caption(f"Queue depth: {stats['queue_depth']} (peak {stats['max_queue_depth']})")
+        st.caption(f"Batches run: {stats['total_batches']} | Texts: {stats['total_items']}")
+        st.caption(f"Mean batch size: {stats['mean_batch_size']:.2f} / {stats['max_batch_size']}")
+        cache_stats = prediction_cache.stats()
+        st.caption(
+            f"Cache hit rate: {cache_stats['hit_rate']:.1%} "
+            f"({cache_stats['hits']} hits / {cache_stats['misses']} misses, "
+            f"{cache_stats['entries']} entries)"
+        )
+        if STUDENT_MODEL_PATH:
+            cascade_stats = engine.classifier.stats()
+            st.caption(
+                f"Student cascade: {cascade_stats['escalation_rate']:.1%} escalated to AraBERT "
+                f"({cascade_stats['escalated']} of {cascade_stats['texts']} texts)"
+            )
+        if shadow is not None:
+            shadow_stats = shadow.stats()
+            overhead = shadow_stats["overhead"]
+            st.caption(
+                f"Shadow: {shadow_stats['scored']} scored, sampling {shadow_stats['sample_rate']:.0%}, "
+                f"overhead {'n/a' if overhead is None else f'{overhead:+.1%}'} "
+                f"(budget {shadow_stats['overhead_budget']:.0%})"
+            )
+            for name, candidate in shadow_stats["candidates"].items():
+                if candidate["count"]:
+                    st.caption(
+                        f"↳ {name}: {candidate['agreement']:.1%} agreement, "
+                        f"mean |Δ fake| {candidate['mean_abs_delta']:.3f}"
+                    )
+        served = getattr(engine.classifier, "teacher", engine.classifier)
+        if isinstance(served, HotSwapClassifier):
+            swap_stats = served.stats()
+            last_swap = swap_stats["swaps"][-1] if swap_stats["swaps"] else None
+            st.caption(
+                f"Model version: {swap_stats['version']}"
+                + (" (loading a new version...)" if swap_stats["swapping"] else "")
+                + (f" | last swap {last_swap['to']}: {last_swap['status']}" if last_swap else "")
+            )
+        if EARLY_EXIT_PATH:
+            from early_exit import EarlyExitClassifier
+            early = served
+            if isinstance(served, HotSwapClassifier):
+                with served.lease() as slot:
+                    early = slot.classifier
+            if isinstance(early, EarlyExitClassifier):
+                exit_stats = early.stats()
+                st.caption(
+                    f"Early exit: {exit_stats['mean_layers']:.1f} of {exit_stats['total_layers']} layers "
+                    f"per text ({exit_stats['layer_speedup']:.2f}x fewer, {exit_stats['texts']} texts)"
+                )
+        job_stats = job_manager.stats()
+        st.caption(
+            f"Jobs: {job_stats['running']} running, {job_stats['queued']} queued | "
+            f"{job_stats['deduplicated']} duplicate clicks joined, {job_stats['cancelled']} cancelled"
+        )
     
     # ==============================================
     # FOOTER SECTION
     # ==============================================
-    st.markdown("""
+    threshold_percent = f"{calibration['threshold']:.0%}"
+    st.markdown(f"""
     <div class='app-footer'>
         <p>🤖 <span class='footer-highlight'>Powered by AraBERT Transformer Model</span></p>
-        <p>Confidence Threshold: <strong>80%</strong> | عتبة الثقة: <strong>80%</strong></p>
+        <p>Confidence Threshold: <strong>{threshold_percent}</strong> | عتبة الثقة: <strong>{threshold_percent}</strong></p>
         <p style='margin-top: 1rem; font-size: 0.8rem; color: #4b5563;'>
             This is an assistive AI tool for educational and research purposes. 
             Results should be verified through multiple reliable sources.
@@ -0,0 +1,180 @@
+"""
+Micro-batching inference engine for the AraBERT classification pipeline.
+
+A single engine instance is shared by every Streamlit session. Texts
+submitted from any session are collected into dynamic batches (bounded by
+a maximum batch size and a maximum wait time) and classified together in
+one padded forward pass. Each caller receives only its own result.
+"""
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+# ==============================================
+# DEFAULTS
+# ==============================================
+DEFAULT_MAX_BATCH_SIZE = 16
+DEFAULT_MAX_WAIT_MS = 10
+
+
+class BatchingEngine:
+    """
+    Gather pending texts into batches and run them through a classifier.
+
+    Args:
+        classifier: Callable accepting a list of texts and a ``batch_size``
+            keyword, such as the pipeline returned by ``load_model()``
+        max_batch_size: Maximum number of texts per forward pass
+        max_wait_ms: Maximum time to wait for a batch to fill up after the
+            first text arrives
+        concurrency: Batches in flight at once; raise it for classifiers
+            that run batches in parallel (e.g. a ``WorkerPool``)
+    """
+
+    def __init__(self, classifier, max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                 max_wait_ms=DEFAULT_MAX_WAIT_MS, concurrency=1):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        if max_wait_ms < 0:
+            raise ValueError("max_wait_ms must not be negative")
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+
+        self.classifier = classifier
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._total_items = 0
+        self._total_batches = 0
+        self._max_queue_depth = 0
+        self._running = True
+
+        self._workers = [
+            threading.Thread(target=self._run, name=f"batching-engine-{i}", daemon=True)
+            for i in range(concurrency)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    # ----------------------------------------------
+    # Public API
+    # ----------------------------------------------
+    def submit(self, text):
+        """
+        Queue a text for classification.
+
+        Returns:
+            Future resolving to the pipeline output for this text
+            (a list of ``{"label", "score"}`` dicts)
+        """
+        if not self._running:
+            raise RuntimeError("Batching engine has been shut down")
+
+        future = Future()
+        self._queue.put((text, future))
+
+        depth = self._queue.qsize()
+        with self._lock:
+            self._max_queue_depth = max(self._max_queue_depth, depth)
+        return future
+
+    def classify(self, text, timeout=None):
+        """Classify a single text, blocking until its batch has run."""
+        return self.submit(text).result(timeout=timeout)
+
+    def classify_many(self, texts, timeout=None):
+        """Classify several texts, preserving input order."""
+        futures = [self.submit(text) for text in texts]
+        return [future.result(timeout=timeout) for future in futures]
+
+    def stats(self):
+        """
+        Snapshot of queue-depth and batch-size statistics.
+
+        Returns:
+            Dict with current and peak queue depth, batch and item totals,
+            mean batch size and a histogram of observed batch sizes
+        """
+        with self._lock:
+            mean_batch = (
+                self._total_items / self._total_batches if self._total_batches else 0.0
+            )
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self._max_queue_depth,
+                "total_batches": self._total_batches,
+                "total_items": self._total_items,
+                "mean_batch_size": mean_batch,
+                "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "concurrency": len(self._workers),
+            }
+
+    def shutdown(self, timeout=None):
+        """Stop the worker threads after draining already-queued texts."""
+        self._running = False
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join(timeout=timeout)
+
+    # ----------------------------------------------
+    # Worker loop
+    # ----------------------------------------------
+    def _collect_batch(self):
+        """Block for the first item, then fill the batch until size or deadline."""
+        first = self._queue.get()
+        if first is None:
+            return None
+
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    item = self._queue.get(timeout=remaining)
+                else:
+                    # Deadline passed: still take anything already waiting
+                    item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Re-queue the sentinel so the loop exits after this batch
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            if batch is None:
+                break
+
+            # Drop requests whose callers have already given up
+            batch = [(text, fut) for text, fut in batch if fut.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            texts = [text for text, _ in batch]
+            try:
+                outputs = self.classifier(texts, batch_size=len(texts))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            with self._lock:
+                self._total_batches += 1
+                self._total_items += len(batch)
+                self._batch_sizes[len(batch)] += 1
+
+            for (_, future), output in zip(batch, outputs):
+                future.set_result(output)
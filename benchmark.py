@@ -0,0 +1,305 @@
+"""
+Reproducible end-to-end and per-stage latency benchmark.
+
+Generates synthetic Arabic inputs from a configurable length
+distribution and runs them through each stage of an analysis across a
+grid of batch sizes and torch thread counts:
+
+    tokenize     tokenizer call with padding/truncation
+    forward      model forward pass
+    postprocess  softmax, label mapping and the Real/Fake/Uncertain rule
+    render       confidence gauge (``gauge_payload``, Plotly or static SVG)
+
+Results (per-stage latency percentiles, throughput, peak RSS) are written
+as JSON. ``--baseline`` compares against a saved run with the same
+workload and exits non-zero when any configuration regresses beyond
+``--tolerance``. The baseline is read before the run, so ``--output`` may
+name the same file to refresh it.
+
+Usage:
+    python benchmark.py --batch-sizes 1,8,32 --threads 1,4 --output bench.json
+    python benchmark.py --lengths 12,80,400 --weights 0.5,0.3,0.2 --baseline bench.json
+    python benchmark.py --gauge-renderer svg
+"""
+import argparse
+import json
+import platform
+import random
+import resource
+import sys
+import time
+
+from inference import CONFIDENCE_THRESHOLD, MAX_SEQUENCE_LENGTH, MODEL_PATH, decide
+
+# ==============================================
+# CONFIGURATION
+# ==============================================
+DEFAULT_LENGTHS = (12, 80, 400)       # words: headline, short report, long article
+DEFAULT_WEIGHTS = (0.5, 0.3, 0.2)
+DEFAULT_BATCH_SIZES = (1, 8, 32)
+DEFAULT_THREADS = (1, 4)
+DEFAULT_SAMPLES = 256
+DEFAULT_TOLERANCE = 0.10
+COMPARABLE_META = ("model_path", "samples", "lengths", "weights", "seed")  # must match the baseline's
+STAGES = ("tokenize", "forward", "postprocess", "render")
+
+VOCABULARY = (
+    "أعلنت وزارة الصحة اليوم عن اكتشاف علاج جديد يقضي على فيروس كورونا خلال ساعة "
+    "عقد مجلس الوزراء جلسته الأسبوعية برئاسة رئيس الحكومة وناقش الملفات الاقتصادية "
+    "تحذير عاجل دراسة سرية تكشف أن شرب الماء البارد بعد الأكل يسبب أمراض خطيرة "
+    "افتتح وزير التعليم مدرسة جديدة في المحافظة بحضور عدد من المسؤولين والأهالي "
+    "انتشار فيديو يزعم أن الرواتب ستلغى اعتباراً من الشهر المقبل وفق مصادر مطلعة"
+).split()
+
+# ==============================================
+# SYNTHETIC INPUTS
+# ==============================================
+def synthetic_texts(n, lengths=DEFAULT_LENGTHS, weights=DEFAULT_WEIGHTS, seed=0):
+    """
+    Generate ``n`` Arabic texts whose word counts follow the given mixture.
+
+    Each text draws a target length from ``lengths`` (weighted), jitters it
+    by ±25% and samples words from a fixed news vocabulary, so the same
+    seed always produces the same corpus.
+    """
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(n):
+        target = rng.choices(lengths, weights=weights)[0]
+        words = max(1, int(target * rng.uniform(0.75, 1.25)))
+        texts.append(" ".join(rng.choices(VOCABULARY, k=words)))
+    return texts
+
+# ==============================================
+# MEASUREMENT
+# ==============================================
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes on Linux
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def summarize(samples_ms):
+    """Mean and p50/p95/p99 of a list of millisecond timings."""
+    ordered = sorted(samples_ms)
+    n = len(ordered)
+
+    def pct(p):
+        return ordered[min(n - 1, int(p / 100.0 * n))]
+
+    return {
+        "mean": sum(ordered) / n,
+        "p50": pct(50),
+        "p95": pct(95),
+        "p99": pct(99),
+    }
+
+
+def run_configuration(classifier, texts, batch_size, threads, render=True, gauge_renderer="plotly"):
+    """
+    Time each stage for every batch of ``texts`` at one configuration.
+
+    Returns:
+        Dict with per-stage per-batch latency summaries, end-to-end
+        throughput and the process peak RSS after the run
+    """
+    import torch
+
+    from gauge import gauge_payload
+
+    torch.set_num_threads(threads)
+    tokenizer, model = classifier.tokenizer, classifier.model
+    id2label = model.config.id2label
+    timings = {stage: [] for stage in STAGES}
+
+    # One untimed batch so lazy initialisation does not skew the first sample
+    warm = tokenizer(texts[:batch_size], padding=True, truncation=True,
+                     max_length=MAX_SEQUENCE_LENGTH, return_tensors="pt")
+    with torch.inference_mode():
+        model(**warm)
+
+    start = time.perf_counter()
+    for i in range(0, len(texts), batch_size):
+        batch = texts[i:i + batch_size]
+
+        t0 = time.perf_counter()
+        features = tokenizer(batch, padding=True, truncation=True,
+                             max_length=MAX_SEQUENCE_LENGTH, return_tensors="pt")
+        t1 = time.perf_counter()
+        with torch.inference_mode():
+            logits = model(**features).logits
+        t2 = time.perf_counter()
+
+        # Mirror main(): probabilities -> label scores -> decision
+        probs = torch.softmax(logits.float(), dim=-1).tolist()
+        results = []
+        for row in probs:
+            scores = {id2label[j]: score for j, score in enumerate(row)}
+            results.append(decide(scores.get("Real", 0), scores.get("Fake", 0), CONFIDENCE_THRESHOLD))
+        t3 = time.perf_counter()
+
+        if render:
+            for decision, confidence in results:
+                gauge_payload(gauge_renderer, confidence, decision)
+        t4 = time.perf_counter()
+
+        timings["tokenize"].append((t1 - t0) * 1000.0)
+        timings["forward"].append((t2 - t1) * 1000.0)
+        timings["postprocess"].append((t3 - t2) * 1000.0)
+        timings["render"].append((t4 - t3) * 1000.0)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "batch_size": batch_size,
+        "threads": threads,
+        "gauge_renderer": gauge_renderer if render else None,
+        "batches": len(timings["forward"]),
+        "stages_ms_per_batch": {stage: summarize(values) for stage, values in timings.items()},
+        "texts_per_s": len(texts) / elapsed,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def run_benchmark(classifier, texts, batch_sizes, threads, render=True, gauge_renderer="plotly"):
+    results = []
+    for thread_count in threads:
+        for batch_size in batch_sizes:
+            results.append(run_configuration(classifier, texts, batch_size, thread_count, render, gauge_renderer))
+    return results
+
+# ==============================================
+# REGRESSION CHECK
+# ==============================================
+def compare_to_baseline(current, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Flag configurations that got slower than the baseline.
+
+    A configuration regresses when its throughput drops, or any stage's
+    p50 latency grows, by more than ``tolerance`` (a fraction).
+    Configurations are matched on batch size, threads and gauge renderer.
+
+    Returns:
+        List of human-readable regression descriptions (empty when clean)
+
+    Raises:
+        ValueError: When the two runs used a different workload
+            (``COMPARABLE_META``), so their timings are not comparable
+    """
+    current_meta, baseline_meta = current.get("meta", {}), baseline.get("meta", {})
+    mismatched = [
+        f"{field} {baseline_meta.get(field)!r} != {current_meta.get(field)!r}"
+        for field in COMPARABLE_META
+        if baseline_meta.get(field) != current_meta.get(field)
+    ]
+    if mismatched:
+        raise ValueError("Baseline was recorded with a different workload: " + "; ".join(mismatched))
+
+    def key(result):
+        return result["batch_size"], result["threads"], result.get("gauge_renderer")
+
+    previous = {key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        old = previous.get(key(result))
+        if old is None:
+            continue
+        label = f"batch={result['batch_size']} threads={result['threads']} render={result.get('gauge_renderer')}"
+
+        if result["texts_per_s"] < old["texts_per_s"] * (1 - tolerance):
+            regressions.append(
+                f"{label}: throughput {old['texts_per_s']:.1f} -> {result['texts_per_s']:.1f} texts/s"
+            )
+        for stage, stats in result["stages_ms_per_batch"].items():
+            old_stats = old["stages_ms_per_batch"].get(stage)
+            if old_stats and stats["p50"] > old_stats["p50"] * (1 + tolerance):
+                regressions.append(
+                    f"{label}: {stage} p50 {old_stats['p50']:.2f} -> {stats['p50']:.2f} ms"
+                )
+    return regressions
+
+# ==============================================
+# COMMAND-LINE ENTRY POINT
+# ==============================================
+def _int_list(value):
+    return tuple(int(item) for item in value.split(","))
+
+
+def _float_list(value):
+    return tuple(float(item) for item in value.split(","))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark per-stage latency and throughput.")
+    parser.add_argument("--model-path", default=MODEL_PATH)
+    parser.add_argument("--samples", type=int, default=DEFAULT_SAMPLES,
+                        help="Synthetic texts per configuration")
+    parser.add_argument("--lengths", type=_int_list, default=DEFAULT_LENGTHS,
+                        help="Comma-separated word counts of the length mixture")
+    parser.add_argument("--weights", type=_float_list, default=DEFAULT_WEIGHTS,
+                        help="Comma-separated weights of the length mixture")
+    parser.add_argument("--batch-sizes", type=_int_list, default=DEFAULT_BATCH_SIZES)
+    parser.add_argument("--threads", type=_int_list, default=DEFAULT_THREADS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-render", action="store_true", help="Skip the gauge stage")
+    parser.add_argument("--gauge-renderer", choices=("plotly", "svg"), default="plotly",
+                        help="Gauge renderer timed in the render stage (see gauge.py)")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    parser.add_argument("--baseline", default=None, help="Saved report to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed slowdown before flagging a regression (fraction)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    from inference import build_classifier
+
+    args = parse_args(argv)
+    if len(args.lengths) != len(args.weights):
+        raise SystemExit("--lengths and --weights must have the same number of entries")
+
+    # Read before the run: --output may be the same file
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    texts = synthetic_texts(args.samples, args.lengths, args.weights, args.seed)
+    classifier = build_classifier(args.model_path)
+
+    report = {
+        "meta": {
+            "model_path": args.model_path,
+            "samples": args.samples,
+            "lengths": list(args.lengths),
+            "weights": list(args.weights),
+            "seed": args.seed,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": run_benchmark(
+            classifier, texts, args.batch_sizes, args.threads,
+            render=not args.no_render, gauge_renderer=args.gauge_renderer
+        ),
+    }
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+    if baseline is not None:
+        try:
+            regressions = compare_to_baseline(report, baseline, args.tolerance)
+        except ValueError as e:
+            raise SystemExit(str(e))
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print("No regressions against baseline", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
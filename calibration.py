@@ -0,0 +1,324 @@
+"""
+Probability calibration and threshold tuning from cached logits.
+
+``collect`` runs the model over a labelled dataset once and stores the
+raw logits and labels in a compact ``.npz`` file. Everything else works
+from that file without touching the model again:
+
+    fit    temperature scaling (one scalar dividing the logits, fitted by
+           minimising the negative log-likelihood), expected calibration
+           error and reliability curves before and after, and a sweep of
+           confidence thresholds with the Uncertain rate and the error
+           rate of the remaining Real/Fake decisions at each
+
+``fit`` writes a small JSON file holding the temperature and the chosen
+threshold; the app, server and bulk tool load it at startup.
+
+Usage:
+    python calibration.py collect --data labelled.csv --output logits.npz
+    python calibration.py fit --logits logits.npz --target-error 0.05 --output models/calibration.json
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import time
+
+import numpy as np
+
+from inference import CONFIDENCE_THRESHOLD, MAX_SEQUENCE_LENGTH, MODEL_PATH
+
+logger = logging.getLogger("calibration")
+
+# ==============================================
+# CONFIGURATION
+# ==============================================
+ECE_BINS = 10
+SWEEP_THRESHOLDS = tuple(round(0.50 + 0.01 * i, 2) for i in range(50))  # 0.50 .. 0.99
+TEMPERATURE_RANGE = (0.05, 20.0)
+DEFAULT_BATCH_SIZE = 32
+
+# ==============================================
+# LOGIT COLLECTION
+# ==============================================
+def collect_logits(classifier, texts, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Raw ``[n, 2]`` (Real, Fake) logits for ``texts``, first 512 tokens each.
+    """
+    import torch
+
+    tokenizer, model = classifier.tokenizer, classifier.model
+    rows = []
+    for i in range(0, len(texts), batch_size):
+        features = tokenizer(
+            texts[i:i + batch_size],
+            padding=True,
+            truncation=True,
+            max_length=MAX_SEQUENCE_LENGTH,
+            return_tensors="pt",
+        )
+        features = {name: value.to(model.device) for name, value in features.items()}
+        with torch.inference_mode():
+            rows.append(model(**features).logits.float().cpu().numpy())
+    return np.concatenate(rows) if rows else np.zeros((0, 2), dtype=np.float32)
+
+
+def save_logits(path, logits, labels, meta):
+    np.savez_compressed(
+        path,
+        logits=np.asarray(logits, dtype=np.float32),
+        labels=np.asarray(labels, dtype=np.int8),
+        meta=np.array(json.dumps(meta)),
+    )
+
+
+def load_logits(path):
+    """Returns ``(logits, labels, meta)`` saved by ``save_logits()``."""
+    with np.load(path) as arrays:
+        return arrays["logits"], arrays["labels"].astype(np.int64), json.loads(str(arrays["meta"]))
+
+# ==============================================
+# CALIBRATION METRICS
+# ==============================================
+def softmax(logits, temperature=1.0):
+    scaled = logits / temperature
+    scaled = scaled - scaled.max(axis=1, keepdims=True)
+    probs = np.exp(scaled)
+    return probs / probs.sum(axis=1, keepdims=True)
+
+
+def negative_log_likelihood(logits, labels, temperature=1.0):
+    probs = softmax(logits, temperature)
+    return float(-np.log(np.clip(probs[np.arange(len(labels)), labels], 1e-12, None)).mean())
+
+
+def fit_temperature(logits, labels, low=TEMPERATURE_RANGE[0], high=TEMPERATURE_RANGE[1], iterations=60):
+    """Temperature minimising the NLL, by golden-section search over log T."""
+    a, b = math.log(low), math.log(high)
+    ratio = (math.sqrt(5) - 1) / 2
+
+    def loss(log_t):
+        return negative_log_likelihood(logits, labels, math.exp(log_t))
+
+    c, d = b - ratio * (b - a), a + ratio * (b - a)
+    loss_c, loss_d = loss(c), loss(d)
+    for _ in range(iterations):
+        if loss_c < loss_d:
+            b, d, loss_d = d, c, loss_c
+            c = b - ratio * (b - a)
+            loss_c = loss(c)
+        else:
+            a, c, loss_c = c, d, loss_d
+            d = a + ratio * (b - a)
+            loss_d = loss(d)
+    return math.exp((a + b) / 2)
+
+
+def reliability(probs, labels, bins=ECE_BINS):
+    """
+    Reliability curve and expected calibration error.
+
+    Confidence is the top-class probability, binned evenly over [0.5, 1].
+
+    Returns:
+        Tuple of (ECE, list of per-bin dicts with count, mean confidence
+        and accuracy)
+    """
+    confidence = probs.max(axis=1)
+    correct = probs.argmax(axis=1) == labels
+    edges = np.linspace(0.5, 1.0, bins + 1)
+    index = np.clip(np.searchsorted(edges, confidence, side="right") - 1, 0, bins - 1)
+
+    curve = []
+    ece = 0.0
+    for b in range(bins):
+        in_bin = index == b
+        count = int(in_bin.sum())
+        if not count:
+            curve.append({"bin": [float(edges[b]), float(edges[b + 1])], "count": 0})
+            continue
+        mean_conf = float(confidence[in_bin].mean())
+        acc = float(correct[in_bin].mean())
+        ece += count / len(labels) * abs(acc - mean_conf)
+        curve.append({
+            "bin": [float(edges[b]), float(edges[b + 1])],
+            "count": count,
+            "confidence": mean_conf,
+            "accuracy": acc,
+        })
+    return ece, curve
+
+
+def sweep_thresholds(probs, labels, thresholds=SWEEP_THRESHOLDS):
+    """
+    Uncertain rate and decided-item error rate at each threshold.
+
+    An item is decided (Real/Fake) when its top-class probability reaches
+    the threshold; the error rate counts wrong decisions among those.
+    """
+    confidence = probs.max(axis=1)
+    wrong = probs.argmax(axis=1) != labels
+    n = len(labels)
+    rows = []
+    for threshold in thresholds:
+        decided = confidence >= threshold
+        n_decided = int(decided.sum())
+        errors = int(wrong[decided].sum())
+        rows.append({
+            "threshold": threshold,
+            "uncertain_rate": 1 - n_decided / n if n else 0.0,
+            "error_rate": errors / n_decided if n_decided else 0.0,
+            "errors_per_1000": 1000.0 * errors / n if n else 0.0,
+        })
+    return rows
+
+
+def choose_threshold(sweep, target_error=None, max_uncertain=None, default=CONFIDENCE_THRESHOLD):
+    """
+    Pick a threshold from a sweep.
+
+    With ``target_error`` the lowest threshold (fewest Uncertain items)
+    whose error rate is within target; with ``max_uncertain`` the highest
+    threshold whose Uncertain rate is within budget; otherwise ``default``.
+    """
+    if target_error is not None:
+        for row in sweep:
+            if row["error_rate"] <= target_error:
+                return row["threshold"]
+        return sweep[-1]["threshold"]
+    if max_uncertain is not None:
+        within = [row["threshold"] for row in sweep if row["uncertain_rate"] <= max_uncertain]
+        return within[-1] if within else sweep[0]["threshold"]
+    return default
+
+
+def calibration_report(logits, labels, target_error=None, max_uncertain=None):
+    """
+    Fit the temperature and sweep thresholds on cached logits.
+
+    Returns:
+        Dict with the temperature, ECE and reliability curve before and
+        after scaling, the calibrated threshold sweep and the chosen
+        threshold
+    """
+    temperature = fit_temperature(logits, labels)
+    raw = softmax(logits)
+    scaled = softmax(logits, temperature)
+    ece_before, curve_before = reliability(raw, labels)
+    ece_after, curve_after = reliability(scaled, labels)
+    sweep = sweep_thresholds(scaled, labels)
+    threshold = choose_threshold(sweep, target_error, max_uncertain)
+    return {
+        "samples": len(labels),
+        "temperature": temperature,
+        "nll_before": negative_log_likelihood(logits, labels),
+        "nll_after": negative_log_likelihood(logits, labels, temperature),
+        "ece_before": ece_before,
+        "ece_after": ece_after,
+        "reliability_before": curve_before,
+        "reliability_after": curve_after,
+        "threshold": threshold,
+        "at_threshold": next((row for row in sweep if row["threshold"] == threshold), None),
+        "sweep": sweep,
+    }
+
+# ==============================================
+# SAVED CALIBRATION
+# ==============================================
+def save_calibration(path, report, meta):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "temperature": report["temperature"],
+            "threshold": report["threshold"],
+            "ece_before": report["ece_before"],
+            "ece_after": report["ece_after"],
+            "samples": report["samples"],
+            **meta,
+        }, f, indent=2)
+
+
+def load_calibration(path):
+    """
+    Temperature and threshold saved by ``fit``.
+
+    Falls back to no scaling and ``CONFIDENCE_THRESHOLD`` when ``path`` is
+    unset or missing, so entry points can always call this.
+    """
+    if path and os.path.isfile(path):
+        with open(path, "r", encoding="utf-8") as f:
+            calibration = json.load(f)
+        logger.info(
+            "Calibration from %s: temperature %.3f, threshold %.2f (model %s)",
+            path, calibration["temperature"], calibration["threshold"], calibration.get("model_path")
+        )
+        return calibration
+    return {"temperature": 1.0, "threshold": CONFIDENCE_THRESHOLD}
+
+# ==============================================
+# COMMAND-LINE ENTRY POINT
+# ==============================================
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Calibrate probabilities and tune the decision threshold.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    collect = subparsers.add_parser("collect", help="Score a labelled dataset once and cache the logits")
+    collect.add_argument("--data", required=True, help="Labelled CSV/JSONL file")
+    collect.add_argument("--text-column", default="text")
+    collect.add_argument("--label-column", default="label")
+    collect.add_argument("--limit", type=int, default=None)
+    collect.add_argument("--model-path", default=MODEL_PATH)
+    collect.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    collect.add_argument("--output", required=True, help="Logits .npz file to write")
+
+    fit = subparsers.add_parser("fit", help="Fit temperature and sweep thresholds from cached logits")
+    fit.add_argument("--logits", required=True, help="File written by collect")
+    choice = fit.add_mutually_exclusive_group()
+    choice.add_argument("--target-error", type=float, default=None,
+                        help="Choose the lowest threshold whose Real/Fake error rate is within this")
+    choice.add_argument("--max-uncertain", type=float, default=None,
+                        help="Choose the highest threshold whose Uncertain rate is within this")
+    fit.add_argument("--output", default=None, help="Calibration JSON to write for the app")
+    fit.add_argument("--full", action="store_true", help="Print the whole sweep and reliability curves")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.command == "collect":
+        from evaluation import load_labelled_sample
+        from inference import build_classifier, model_revision
+
+        texts, labels = load_labelled_sample(args.data, args.text_column, args.label_column, args.limit)
+        classifier = build_classifier(args.model_path)
+        start = time.perf_counter()
+        logits = collect_logits(classifier, texts, args.batch_size)
+        meta = {
+            "model_path": args.model_path,
+            "model_revision": model_revision(classifier),
+            "data": args.data,
+            "seconds": time.perf_counter() - start,
+        }
+        save_logits(args.output, logits, labels, meta)
+        print(f"Saved logits for {len(labels)} texts to {args.output}")
+        return
+
+    logits, labels, meta = load_logits(args.logits)
+    report = calibration_report(logits, labels, args.target_error, args.max_uncertain)
+    if args.output:
+        save_calibration(args.output, report, {
+            "model_path": meta.get("model_path"),
+            "model_revision": meta.get("model_revision"),
+            "logits": args.logits,
+        })
+    if not args.full:
+        report = {k: v for k, v in report.items() if k not in ("sweep", "reliability_before", "reliability_after")}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,398 @@
+"""
+Persistent pre-tokenized corpus store with memory-mapped token arrays.
+
+Re-scoring an archive after a model or threshold change should not pay
+for tokenization again. ``build`` preprocesses and tokenizes a CSV/JSONL
+corpus once, in parallel worker processes, into a directory holding:
+
+    tokens.i32      every document's token ids (special tokens included,
+                    truncated to the model limit) back to back, int32
+    offsets.i64     ``n + 1`` document start offsets into tokens.i32
+    documents.jsonl row index and record id of each document
+    index.json      tokenizer identity, preprocessing steps and counts
+
+``CorpusStore`` maps the two arrays read-only. Batches are sorted by
+length and assembled straight from the mapped pages into one padded
+buffer that torch wraps without a further copy, so scoring is reading
+plus the forward pass. ``compare`` reports the time saved over
+tokenizing the same documents on the fly.
+
+Usage:
+    python corpus_store.py build --data archive.jsonl --output corpora/archive --workers 8
+    python corpus_store.py score --corpus corpora/archive --output decisions.jsonl
+    python corpus_store.py compare --corpus corpora/archive --data archive.jsonl --limit 5000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import numpy as np
+
+from bulk import iter_batches, iter_records
+from inference import CONFIDENCE_THRESHOLD, DECISION_LABELS, MAX_SEQUENCE_LENGTH, MODEL_PATH, apply_temperature, decide
+from preprocessing import PREPROCESS_STEPS, Preprocessor
+
+# ==============================================
+# CONFIGURATION
+# ==============================================
+FORMAT_VERSION = 1
+TOKENS_NAME = "tokens.i32"
+OFFSETS_NAME = "offsets.i64"
+DOCUMENTS_NAME = "documents.jsonl"
+INDEX_NAME = "index.json"
+DEFAULT_CHUNK_SIZE = 1000     # documents per tokenization task
+DEFAULT_WORKERS = max(1, (os.cpu_count() or 1) - 1)
+DEFAULT_BATCH_SIZE = 32
+
+# ==============================================
+# PARALLEL TOKENIZATION
+# ==============================================
+_worker = {}
+
+
+def _init_worker(model_path, steps):
+    # Each process tokenizes its own chunks; nested Rust threads would oversubscribe
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    from transformers import AutoTokenizer
+
+    _worker["tokenizer"] = AutoTokenizer.from_pretrained(model_path)
+    _worker["preprocessor"] = Preprocessor(steps)
+
+
+def _tokenize_chunk(texts):
+    """Token ids of a chunk as one flat int32 array plus per-document lengths."""
+    texts = _worker["preprocessor"].batch(texts)
+    ids = _worker["tokenizer"](
+        texts, truncation=True, max_length=MAX_SEQUENCE_LENGTH, verbose=False
+    )["input_ids"]
+    lengths = np.fromiter((len(row) for row in ids), dtype=np.int64, count=len(ids))
+    flat = np.fromiter((token for row in ids for token in row), dtype=np.int32, count=int(lengths.sum()))
+    return flat, lengths
+
+
+def build_corpus(input_path, output_dir, model_path=MODEL_PATH, text_column="text", id_column=None,
+                 steps=PREPROCESS_STEPS, workers=DEFAULT_WORKERS, chunk_size=DEFAULT_CHUNK_SIZE,
+                 progress=None):
+    """
+    Tokenize a CSV/JSONL corpus once into a memory-mappable store.
+
+    Chunks are tokenized in ``workers`` processes with at most two chunks
+    per worker in flight, so memory stays bounded on any corpus size;
+    results are written in input order.
+
+    Returns:
+        The index dict written to ``index.json``
+    """
+    from transformers import AutoTokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+    start = time.perf_counter()
+    n_docs = n_tokens = 0
+
+    tokens_f = open(os.path.join(output_dir, TOKENS_NAME), "wb")
+    offsets_f = open(os.path.join(output_dir, OFFSETS_NAME), "wb")
+    documents_f = open(os.path.join(output_dir, DOCUMENTS_NAME), "w", encoding="utf-8")
+    try:
+        offsets_f.write(np.zeros(1, dtype=np.int64).tobytes())
+        chunks = iter_batches(iter_records(input_path, text_column, id_column), chunk_size)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(model_path, tuple(steps))) as executor:
+            pending = deque()
+
+            def drain_one():
+                nonlocal n_docs, n_tokens
+                records, future = pending.popleft()
+                flat, lengths = future.result()
+                tokens_f.write(flat.tobytes())
+                offsets_f.write((n_tokens + np.cumsum(lengths)).astype(np.int64).tobytes())
+                for index, record_id, _ in records:
+                    documents_f.write(json.dumps({"row": index, "id": record_id}, ensure_ascii=False) + "\n")
+                n_docs += len(records)
+                n_tokens += int(lengths.sum())
+                if progress is not None:
+                    progress(n_docs)
+
+            for records in chunks:
+                texts = [text for _, _, text in records]
+                pending.append((records, executor.submit(_tokenize_chunk, texts)))
+                if len(pending) >= 2 * workers:
+                    drain_one()
+            while pending:
+                drain_one()
+    finally:
+        tokens_f.close()
+        offsets_f.close()
+        documents_f.close()
+
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    index = {
+        "format_version": FORMAT_VERSION,
+        "source": os.path.abspath(input_path),
+        "tokenizer": model_path,
+        "vocab_size": len(tokenizer),
+        "pad_token_id": tokenizer.pad_token_id,
+        "max_length": MAX_SEQUENCE_LENGTH,
+        "preprocess_steps": list(steps),
+        "documents": n_docs,
+        "tokens": n_tokens,
+        "build_seconds": time.perf_counter() - start,
+        "workers": workers,
+    }
+    with open(os.path.join(output_dir, INDEX_NAME), "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2)
+    return index
+
+# ==============================================
+# MEMORY-MAPPED STORE
+# ==============================================
+class CorpusStore:
+    """
+    Read-only view of a directory written by ``build_corpus()``.
+
+    Args:
+        corpus_dir: Store directory
+    """
+
+    def __init__(self, corpus_dir):
+        self.corpus_dir = corpus_dir
+        with open(os.path.join(corpus_dir, INDEX_NAME), "r", encoding="utf-8") as f:
+            self.index = json.load(f)
+        if self.index["format_version"] != FORMAT_VERSION:
+            raise ValueError(
+                f"Corpus store format {self.index['format_version']} is not supported "
+                f"(expected {FORMAT_VERSION}); rebuild it"
+            )
+        self.offsets = np.fromfile(os.path.join(corpus_dir, OFFSETS_NAME), dtype=np.int64)
+        n_tokens = int(self.offsets[-1])
+        # np.memmap refuses empty files
+        self.tokens = (
+            np.memmap(os.path.join(corpus_dir, TOKENS_NAME), dtype=np.int32, mode="r", shape=(n_tokens,))
+            if n_tokens else np.zeros(0, dtype=np.int32)
+        )
+        self.lengths = np.diff(self.offsets)
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def document(self, i):
+        """Token ids of document ``i`` as a view into the mapped file."""
+        return self.tokens[self.offsets[i]:self.offsets[i + 1]]
+
+    def records(self):
+        """``(row, id)`` of each document, in store order."""
+        with open(os.path.join(self.corpus_dir, DOCUMENTS_NAME), "r", encoding="utf-8") as f:
+            return [(record["row"], record["id"]) for record in map(json.loads, f)]
+
+    def check_tokenizer(self, tokenizer):
+        """Raise when ``tokenizer`` would read these token ids differently."""
+        if len(tokenizer) != self.index["vocab_size"] or tokenizer.pad_token_id != self.index["pad_token_id"]:
+            raise ValueError(
+                f"Corpus was tokenized with {self.index['tokenizer']} "
+                f"(vocabulary {self.index['vocab_size']}); rebuild it for this model"
+            )
+
+    def batch_arrays(self, indices):
+        """
+        Padded ``input_ids`` and ``attention_mask`` arrays for documents.
+
+        Token ids are copied once, from the mapped pages into the batch
+        buffer; no Python lists are built.
+        """
+        lengths = self.lengths[indices]
+        width = int(lengths.max())
+        input_ids = np.full((len(indices), width), self.index["pad_token_id"], dtype=np.int64)
+        attention_mask = np.zeros((len(indices), width), dtype=np.int64)
+        for row, (i, length) in enumerate(zip(indices, lengths)):
+            input_ids[row, :length] = self.document(i)
+            attention_mask[row, :length] = 1
+        return input_ids, attention_mask
+
+    def batches(self, batch_size=DEFAULT_BATCH_SIZE, sort_by_length=True):
+        """
+        Yield ``(document indices, input_ids, attention_mask)`` batches.
+
+        Sorting by length keeps padding to a minimum, as in bucketing.py.
+        """
+        order = np.argsort(self.lengths, kind="stable") if sort_by_length else np.arange(len(self))
+        for start in range(0, len(order), batch_size):
+            indices = order[start:start + batch_size]
+            yield (indices, *self.batch_arrays(indices))
+
+# ==============================================
+# BATCH SCORING
+# ==============================================
+def score_store(classifier, store, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """
+    Score every document of a store with the classifier's model.
+
+    Returns:
+        ``[n, 2]`` array of (prob_real, prob_fake) in store order
+    """
+    import torch
+
+    model = classifier.model
+    store.check_tokenizer(classifier.tokenizer)
+    label_columns = [model.config.label2id["Real"], model.config.label2id["Fake"]]
+    probabilities = np.zeros((len(store), 2), dtype=np.float64)
+    done = 0
+    for indices, input_ids, attention_mask in store.batches(batch_size):
+        features = {
+            "input_ids": torch.from_numpy(input_ids).to(model.device),
+            "attention_mask": torch.from_numpy(attention_mask).to(model.device),
+        }
+        with torch.inference_mode():
+            logits = model(**features).logits.float()
+        probabilities[indices] = torch.softmax(logits, dim=-1).cpu().numpy()[:, label_columns]
+        done += len(indices)
+        if progress is not None:
+            progress(done)
+    return probabilities
+
+
+def write_decisions(store, probabilities, output_path, threshold=CONFIDENCE_THRESHOLD, temperature=1.0,
+                    model_version=None):
+    """Write one decision per document in the bulk tool's output format."""
+    from bulk import _open_writer, detect_format
+
+    f, writer = _open_writer(output_path, detect_format(output_path), 0, 0)
+    try:
+        for (row, record_id), (prob_real, prob_fake) in zip(store.records(), probabilities):
+            prob_real, prob_fake = apply_temperature(float(prob_real), float(prob_fake), temperature)
+            decision, confidence = decide(prob_real, prob_fake, threshold)
+            writer.write({
+                "row": row,
+                "id": record_id,
+                "decision": DECISION_LABELS[decision],
+                "prob_real": f"{prob_real:.6f}",
+                "prob_fake": f"{prob_fake:.6f}",
+                "confidence": f"{confidence:.6f}",
+                "model_version": model_version,
+            })
+    finally:
+        f.close()
+
+# ==============================================
+# TIME-SAVED REPORT
+# ==============================================
+def compare_tokenization(store, input_path, tokenizer, text_column="text", limit=None,
+                         batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Time batch preparation on the fly versus from the store.
+
+    On the fly means reading, preprocessing and tokenizing (with padding)
+    the first ``limit`` documents of the source; from the store means
+    assembling padded arrays for the same documents. The forward pass is
+    identical either way and is left out.
+    """
+    preprocessor = Preprocessor(tuple(store.index["preprocess_steps"]))
+    n = min(limit or len(store), len(store))
+
+    start = time.perf_counter()
+    records = islice(iter_records(input_path, text_column), n)
+    for batch in iter_batches(records, batch_size):
+        tokenizer(
+            preprocessor.batch([text for _, _, text in batch]),
+            padding=True, truncation=True, max_length=MAX_SEQUENCE_LENGTH, return_tensors="np",
+        )
+    on_the_fly = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(0, n, batch_size):
+        store.batch_arrays(np.arange(i, min(i + batch_size, n)))
+    from_store = time.perf_counter() - start
+
+    return {
+        "documents": n,
+        "tokens": int(store.offsets[n]),
+        "on_the_fly_seconds": on_the_fly,
+        "store_seconds": from_store,
+        "seconds_saved": on_the_fly - from_store,
+        "speedup": on_the_fly / from_store if from_store else 0.0,
+        "build_seconds": store.index["build_seconds"],
+    }
+
+# ==============================================
+# COMMAND-LINE ENTRY POINT
+# ==============================================
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Build and score pre-tokenized corpus stores.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build = subparsers.add_parser("build", help="Tokenize a CSV/JSONL corpus into a store")
+    build.add_argument("--data", required=True)
+    build.add_argument("--output", required=True, help="Store directory to write")
+    build.add_argument("--text-column", default="text")
+    build.add_argument("--id-column", default=None)
+    build.add_argument("--model-path", default=MODEL_PATH, help="Model whose tokenizer to use")
+    build.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    build.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    build.add_argument("--no-preprocess", action="store_true")
+
+    score = subparsers.add_parser("score", help="Score a store and write decisions")
+    score.add_argument("--corpus", required=True)
+    score.add_argument("--output", required=True, help="Output .csv or .jsonl file")
+    score.add_argument("--model-path", default=MODEL_PATH)
+    score.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    score.add_argument("--threshold", type=float, default=None)
+    score.add_argument("--calibration", default=None,
+                       help="Calibration JSON written by `python calibration.py fit`")
+
+    compare = subparsers.add_parser("compare", help="Time on-the-fly tokenization against the store")
+    compare.add_argument("--corpus", required=True)
+    compare.add_argument("--data", required=True, help="Source file the store was built from")
+    compare.add_argument("--text-column", default="text")
+    compare.add_argument("--limit", type=int, default=None)
+    compare.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    def report(done):
+        print(f"\r{done} documents", end="", file=sys.stderr, flush=True)
+
+    if args.command == "build":
+        index = build_corpus(
+            args.data, args.output, args.model_path, args.text_column, args.id_column,
+            steps=() if args.no_preprocess else PREPROCESS_STEPS,
+            workers=args.workers, chunk_size=args.chunk_size, progress=report,
+        )
+        print(file=sys.stderr)
+        print(json.dumps(index, indent=2))
+        return
+
+    store = CorpusStore(args.corpus)
+    if args.command == "compare":
+        from transformers import AutoTokenizer
+
+        tokenizer = AutoTokenizer.from_pretrained(store.index["tokenizer"])
+        print(json.dumps(compare_tokenization(
+            store, args.data, tokenizer, args.text_column, args.limit, args.batch_size
+        ), indent=2))
+        return
+
+    from calibration import load_calibration
+    from inference import build_classifier, model_revision
+
+    calibration = load_calibration(args.calibration)
+    classifier = build_classifier(args.model_path)
+    start = time.perf_counter()
+    probabilities = score_store(classifier, store, args.batch_size, progress=report)
+    elapsed = time.perf_counter() - start
+    write_decisions(
+        store, probabilities, args.output,
+        threshold=args.threshold if args.threshold is not None else calibration["threshold"],
+        temperature=calibration["temperature"],
+        model_version=model_revision(classifier),
+    )
+    print(f"\nScored {len(store)} documents in {elapsed:.1f}s -> {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
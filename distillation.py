@@ -0,0 +1,392 @@
+"""
+Knowledge distillation of the AraBERT teacher into a hashed n-gram student.
+
+The student is a logistic-regression model over hashed character and word
+n-grams of the normalized Arabic text, trained on the teacher's softened
+``prob_fake`` rather than on hard labels. It scores a text in well under
+a millisecond on one CPU core.
+
+``CascadeClassifier`` serves both: the student answers when it is
+confidently Real or Fake (its confidence clears the threshold by
+``margin``), everything else is escalated to the teacher in one batch.
+A weak student confidence says more about the student than about the
+text, so near-threshold and low-confidence items both go to the teacher.
+The cascade has the pipeline's call interface and exposes the teacher's
+``tokenizer`` and ``model``, so windowed inference still runs on the
+teacher.
+
+Usage:
+    python distillation.py distill --data articles.jsonl --output models/student
+    python distillation.py evaluate --student models/student --data heldout.csv --label-column label
+"""
+import argparse
+import json
+import math
+import os
+import random
+import threading
+import time
+import zlib
+from itertools import islice
+
+import numpy as np
+
+from inference import CONFIDENCE_THRESHOLD, MODEL_PATH, apply_temperature
+from prediction_cache import normalize_arabic
+
+# ==============================================
+# CONFIGURATION
+# ==============================================
+HASH_BITS = 20                # 2**20 weights, 4 MiB as float32
+CHAR_NGRAMS = (2, 3, 4)
+WORD_NGRAMS = (1, 2)
+MAX_STUDENT_CHARS = 4000      # the teacher only sees ~512 tokens of the text either way
+DEFAULT_TEMPERATURE = 2.0
+DEFAULT_EPOCHS = 5
+DEFAULT_LEARNING_RATE = 0.5
+DEFAULT_L2 = 1e-6
+DEFAULT_MARGIN = 0.1
+DEFAULT_HOLDOUT = 0.1
+STUDENT_WEIGHTS_NAME = "student.npz"
+STUDENT_CONFIG_NAME = "student.json"
+
+# ==============================================
+# FEATURES
+# ==============================================
+def hashed_features(text, hash_bits=HASH_BITS):
+    """
+    Sorted unique feature indices of a text's character and word n-grams.
+
+    Uses CRC32 rather than ``hash()`` so indices are stable across
+    processes and a saved student scores the same everywhere.
+    """
+    normalized = normalize_arabic(text)[:MAX_STUDENT_CHARS]
+    mask = (1 << hash_bits) - 1
+    grams = set()
+    padded = f" {normalized} "
+    for n in CHAR_NGRAMS:
+        grams.update("c" + padded[i:i + n] for i in range(len(padded) - n + 1))
+    words = normalized.split()
+    for n in WORD_NGRAMS:
+        grams.update("w" + " ".join(words[i:i + n]) for i in range(len(words) - n + 1))
+    return np.unique(np.fromiter(
+        (zlib.crc32(gram.encode("utf-8")) & mask for gram in grams),
+        dtype=np.int64, count=len(grams)
+    ))
+
+
+def soften(prob_fake, temperature=DEFAULT_TEMPERATURE):
+    """Teacher ``prob_fake`` with its log-odds divided by ``temperature``."""
+    prob_fake = min(max(prob_fake, 1e-7), 1 - 1e-7)
+    return 1.0 / (1.0 + math.exp(-math.log(prob_fake / (1 - prob_fake)) / temperature))
+
+
+def _sigmoid(z):
+    return 1.0 / (1.0 + math.exp(-z)) if z >= 0 else math.exp(z) / (1.0 + math.exp(z))
+
+# ==============================================
+# STUDENT MODEL
+# ==============================================
+class HashedNgramStudent:
+    """
+    Binary logistic regression over hashed n-gram indicator features.
+
+    Each text's active features share a weight of ``1/sqrt(n_active)`` so
+    long and short texts produce logits on the same scale. The logit is
+    trained against teacher log-odds divided by ``temperature`` and
+    multiplied back at prediction time, so served probabilities are on
+    the teacher's scale.
+    """
+
+    def __init__(self, hash_bits=HASH_BITS, temperature=DEFAULT_TEMPERATURE):
+        self.hash_bits = hash_bits
+        self.temperature = temperature
+        self.weights = np.zeros(1 << hash_bits, dtype=np.float32)
+        self.bias = 0.0
+        self.meta = {}
+
+    def logit(self, features):
+        if not len(features):
+            return self.bias
+        return float(self.weights[features].sum()) / math.sqrt(len(features)) + self.bias
+
+    def predict_proba(self, texts):
+        """``prob_fake`` for each text, on the teacher's (unsoftened) scale."""
+        return [
+            _sigmoid(self.logit(hashed_features(text, self.hash_bits)) * self.temperature)
+            for text in texts
+        ]
+
+    def fit(self, texts, teacher_prob_fake, epochs=DEFAULT_EPOCHS,
+            learning_rate=DEFAULT_LEARNING_RATE, l2=DEFAULT_L2, seed=0):
+        """
+        Train on softened teacher probabilities with per-feature Adagrad.
+
+        Args:
+            texts: Training texts
+            teacher_prob_fake: Teacher ``prob_fake`` for each text
+        """
+        features = [hashed_features(text, self.hash_bits) for text in texts]
+        targets = [soften(p, self.temperature) for p in teacher_prob_fake]
+        squared = np.full(1 << self.hash_bits, 1e-8, dtype=np.float32)
+        bias_squared = 1e-8
+        order = list(range(len(texts)))
+        rng = random.Random(seed)
+
+        for _ in range(epochs):
+            rng.shuffle(order)
+            for i in order:
+                active = features[i]
+                scale = 1.0 / math.sqrt(len(active)) if len(active) else 0.0
+                # Soft-target cross-entropy: the gradient w.r.t. the logit is p - target
+                error = _sigmoid(self.logit(active)) - targets[i]
+                if len(active):
+                    grad = error * scale + l2 * self.weights[active]
+                    squared[active] += grad * grad
+                    self.weights[active] -= learning_rate * grad / np.sqrt(squared[active])
+                bias_squared += error * error
+                self.bias -= learning_rate * error / math.sqrt(bias_squared)
+
+        self.meta.update(train_examples=len(texts), epochs=epochs)
+        return self
+
+    def save(self, output_dir):
+        os.makedirs(output_dir, exist_ok=True)
+        np.savez_compressed(
+            os.path.join(output_dir, STUDENT_WEIGHTS_NAME),
+            weights=self.weights, bias=np.float64(self.bias)
+        )
+        with open(os.path.join(output_dir, STUDENT_CONFIG_NAME), "w", encoding="utf-8") as f:
+            json.dump({"hash_bits": self.hash_bits, "temperature": self.temperature, **self.meta}, f, indent=2)
+
+    @classmethod
+    def load(cls, student_dir):
+        with open(os.path.join(student_dir, STUDENT_CONFIG_NAME), "r", encoding="utf-8") as f:
+            config = json.load(f)
+        student = cls(hash_bits=config["hash_bits"], temperature=config["temperature"])
+        with np.load(os.path.join(student_dir, STUDENT_WEIGHTS_NAME)) as arrays:
+            student.weights = arrays["weights"]
+            student.bias = float(arrays["bias"])
+        student.meta = {k: v for k, v in config.items() if k not in ("hash_bits", "temperature")}
+        return student
+
+# ==============================================
+# CASCADE
+# ==============================================
+def _scores(prob_real, prob_fake):
+    # Same structure as the pipeline: all labels, highest score first
+    return sorted(
+        [{"label": "Real", "score": prob_real}, {"label": "Fake", "score": prob_fake}],
+        key=lambda item: item["score"],
+        reverse=True,
+    )
+
+
+class CascadeClassifier:
+    """
+    Pipeline-compatible student-first cascade.
+
+    Args:
+        student: ``HashedNgramStudent``
+        teacher: Pipeline from ``build_classifier()`` (or compatible)
+        threshold: Confidence threshold for Real/Fake vs Uncertain
+        margin: How far above ``threshold`` the student's confidence must
+            be for it to answer without the teacher
+        temperature: Calibration temperature the caller applies to every
+            output before the threshold; the student is tested on the
+            scaled confidence the caller will actually see
+    """
+
+    def __init__(self, student, teacher, threshold=CONFIDENCE_THRESHOLD, margin=DEFAULT_MARGIN,
+                 temperature=1.0):
+        self.student = student
+        self.teacher = teacher
+        self.threshold = threshold
+        self.margin = margin
+        self.temperature = temperature
+
+        self._lock = threading.Lock()
+        self._texts = 0
+        self._escalated = 0
+
+    # Read through, so a hot-swapped teacher is never pinned here
+    @property
+    def tokenizer(self):
+        return self.teacher.tokenizer
+
+    @property
+    def model(self):
+        return self.teacher.model
+
+    def __call__(self, texts, batch_size=None, truncation=True, **kwargs):
+        if isinstance(texts, str):
+            texts = [texts]
+        results = [None] * len(texts)
+        escalate = []
+        for i, prob_fake in enumerate(self.student.predict_proba(texts)):
+            if max(apply_temperature(1 - prob_fake, prob_fake, self.temperature)) >= self.threshold + self.margin:
+                results[i] = _scores(1 - prob_fake, prob_fake)
+            else:
+                escalate.append(i)
+
+        if escalate:
+            outputs = self.teacher(
+                [texts[i] for i in escalate],
+                batch_size=batch_size or len(escalate),
+                truncation=truncation,
+                **kwargs
+            )
+            for i, output in zip(escalate, outputs):
+                results[i] = output
+
+        with self._lock:
+            self._texts += len(texts)
+            self._escalated += len(escalate)
+        return results
+
+    def stats(self):
+        with self._lock:
+            return {
+                "texts": self._texts,
+                "escalated": self._escalated,
+                "escalation_rate": self._escalated / self._texts if self._texts else 0.0,
+                "margin": self.margin,
+            }
+
+
+def build_cascade(teacher, student_dir, threshold=CONFIDENCE_THRESHOLD, margin=DEFAULT_MARGIN,
+                  temperature=1.0):
+    """Wrap a loaded teacher pipeline in a cascade with a saved student."""
+    return CascadeClassifier(HashedNgramStudent.load(student_dir), teacher, threshold, margin, temperature)
+
+# ==============================================
+# DISTILLATION AND REPORT
+# ==============================================
+def distill(teacher, texts, batch_size=16, **fit_kwargs):
+    """
+    Label ``texts`` with the teacher and fit a student on its probabilities.
+
+    Returns:
+        Tuple of (student, teacher ``(prob_real, prob_fake)`` list)
+    """
+    from evaluation import predict_probabilities
+
+    probabilities, _ = predict_probabilities(teacher, texts, batch_size)
+    student = HashedNgramStudent(
+        temperature=fit_kwargs.pop("temperature", DEFAULT_TEMPERATURE)
+    ).fit(texts, [fake for _, fake in probabilities], **fit_kwargs)
+    return student, probabilities
+
+
+def evaluate_cascade(teacher, cascade, texts, labels=None, batch_size=16):
+    """
+    Compare the cascade with the teacher alone on held-out texts.
+
+    Returns:
+        Dict with timings, speedup, escalation rate, student-only and
+        cascade agreement with the teacher (``compare_predictions()``)
+    """
+    from evaluation import compare_predictions, predict_probabilities
+
+    teacher_probs, teacher_time = predict_probabilities(teacher, texts, batch_size)
+
+    start = time.perf_counter()
+    student_fake = cascade.student.predict_proba(texts)
+    student_time = time.perf_counter() - start
+    student_probs = [(1 - fake, fake) for fake in student_fake]
+
+    before = cascade.stats()
+    cascade_probs, cascade_time = predict_probabilities(cascade, texts, batch_size)
+    after = cascade.stats()
+    escalated = after["escalated"] - before["escalated"]
+
+    report = {
+        "threshold": cascade.threshold,
+        "margin": cascade.margin,
+        "teacher_seconds": teacher_time,
+        "student_seconds": student_time,
+        "cascade_seconds": cascade_time,
+        "speedup": teacher_time / cascade_time if cascade_time else 0.0,
+        "escalated": escalated,
+        "escalation_rate": escalated / len(texts) if texts else 0.0,
+        "student_only": compare_predictions(teacher_probs, student_probs, labels, cascade.threshold),
+    }
+    report.update(compare_predictions(teacher_probs, cascade_probs, labels, cascade.threshold))
+    return report
+
+
+def _load_texts(path, text_column, label_column, limit):
+    from bulk import iter_records
+    from evaluation import load_labelled_sample
+    from preprocessing import preprocess
+
+    if label_column:
+        return load_labelled_sample(path, text_column, label_column, limit)
+    records = iter_records(path, text_column=text_column)
+    return [preprocess(text) for _, _, text in islice(records, limit)], None
+
+# ==============================================
+# COMMAND-LINE ENTRY POINT
+# ==============================================
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Distil AraBERT into a hashed n-gram student and cascade them.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    distill_cmd = subparsers.add_parser("distill", help="Train a student on teacher probabilities")
+    distill_cmd.add_argument("--output", required=True, help="Student directory to write")
+    distill_cmd.add_argument("--holdout", type=float, default=DEFAULT_HOLDOUT,
+                             help="Fraction of texts kept out of training for the cascade report")
+    distill_cmd.add_argument("--temperature", type=float, default=DEFAULT_TEMPERATURE)
+    distill_cmd.add_argument("--epochs", type=int, default=DEFAULT_EPOCHS)
+    distill_cmd.add_argument("--seed", type=int, default=0)
+
+    evaluate_cmd = subparsers.add_parser("evaluate", help="Report a saved student's cascade on held-out data")
+    evaluate_cmd.add_argument("--student", required=True, help="Student directory")
+
+    for command in (distill_cmd, evaluate_cmd):
+        command.add_argument("--data", required=True, help="CSV/JSONL file of texts")
+        command.add_argument("--text-column", default="text")
+        command.add_argument("--label-column", default=None,
+                             help="Optional Real/Fake label column for accuracy figures")
+        command.add_argument("--limit", type=int, default=None)
+        command.add_argument("--model-path", default=MODEL_PATH)
+        command.add_argument("--threshold", type=float, default=CONFIDENCE_THRESHOLD)
+        command.add_argument("--margin", type=float, default=DEFAULT_MARGIN)
+        command.add_argument("--batch-size", type=int, default=16)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    from inference import build_classifier
+
+    args = parse_args(argv)
+    texts, labels = _load_texts(args.data, args.text_column, args.label_column, args.limit)
+    teacher = build_classifier(args.model_path)
+
+    if args.command == "distill":
+        order = list(range(len(texts)))
+        random.Random(args.seed).shuffle(order)
+        n_holdout = int(len(texts) * args.holdout)
+        held, train = order[:n_holdout], order[n_holdout:]
+
+        student, _ = distill(
+            teacher, [texts[i] for i in train], batch_size=args.batch_size,
+            temperature=args.temperature, epochs=args.epochs, seed=args.seed
+        )
+        student.meta["teacher"] = args.model_path
+        student.save(args.output)
+        print(f"Saved student trained on {len(train)} texts to {args.output}")
+        if not held:
+            return
+        texts = [texts[i] for i in held]
+        labels = [labels[i] for i in held] if labels is not None else None
+    else:
+        student = HashedNgramStudent.load(args.student)
+
+    cascade = CascadeClassifier(student, teacher, threshold=args.threshold, margin=args.margin)
+    report = evaluate_cascade(teacher, cascade, texts, labels, batch_size=args.batch_size)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,471 @@
+"""
+Early-exit inference with classification heads on intermediate layers.
+
+A small head (a copy of the model's own pooler and classifier) is attached
+to the [CLS] state of a few intermediate encoder layers and distilled from
+the final head's softened probabilities on unlabelled texts; the encoder
+itself is frozen and unchanged. Each head gets an exit threshold chosen on
+held-out texts so that the samples it lets out agree with the full model's
+Real/Fake/Uncertain decision at least ``target_agreement`` of the time.
+
+``EarlyExitClassifier`` runs the embeddings and encoder layers one by one.
+After each head layer the samples whose head confidence clears that
+layer's exit threshold are answered and dropped from the batch, and the
+batch is re-trimmed to its longest remaining sequence, so the rest of the
+forward pass only pays for the hard texts. It has the pipeline's call
+interface and exposes the full model's ``tokenizer`` and ``model``, so
+windowed inference over long documents still runs every layer.
+
+Usage:
+    python early_exit.py train --data articles.jsonl --output models/early-exit
+    python early_exit.py evaluate --heads models/early-exit --data heldout.csv --label-column label
+"""
+import argparse
+import json
+import os
+import random
+import threading
+from itertools import islice
+
+from inference import CONFIDENCE_THRESHOLD, MAX_SEQUENCE_LENGTH, MODEL_PATH, decide
+
+# ==============================================
+# CONFIGURATION
+# ==============================================
+DEFAULT_EXIT_LAYERS = (2, 4, 6, 8, 10)   # of AraBERT-base's 12; the last layer always uses the real head
+DEFAULT_TEMPERATURE = 2.0
+DEFAULT_EPOCHS = 8
+DEFAULT_LEARNING_RATE = 1e-3
+DEFAULT_TARGET_AGREEMENT = 0.99
+DEFAULT_HOLDOUT = 0.2
+EXIT_THRESHOLD_GRID = [0.5 + 0.005 * i for i in range(100)]
+MIN_CALIBRATION_EXITS = 20    # fewer exiting held-out samples than this is not evidence; the head stays off
+HEADS_WEIGHTS_NAME = "heads.pt"
+HEADS_CONFIG_NAME = "early_exit.json"
+
+# ==============================================
+# MODEL ACCESS
+# ==============================================
+def _encoder_parts(model):
+    """
+    The modules a layer-by-layer forward pass needs from a BERT-style
+    sequence classifier: (backbone, encoder layers, classifier).
+    """
+    backbone = getattr(model, getattr(model, "base_model_prefix", ""), None)
+    layers = getattr(getattr(backbone, "encoder", None), "layer", None)
+    classifier = getattr(model, "classifier", None)
+    if (backbone is None or layers is None or classifier is None
+            or getattr(backbone, "embeddings", None) is None or getattr(backbone, "pooler", None) is None):
+        raise ValueError("early exit needs a BERT-style torch model with embeddings, encoder layers and a pooler")
+    return backbone, layers, classifier
+
+
+def _make_head(model):
+    """A new exit head initialised from the model's own pooler and classifier."""
+    import copy
+
+    import torch
+
+    backbone, _, classifier = _encoder_parts(model)
+    head = torch.nn.Sequential(
+        copy.deepcopy(backbone.pooler.dense), torch.nn.Tanh(), copy.deepcopy(classifier)
+    )
+    return head.float()
+
+
+def _run_layer(layer, hidden, attention_mask):
+    # BertLayer returns a tuple in most transformers releases, a tensor in some
+    output = layer(hidden, attention_mask=attention_mask)
+    return output[0] if isinstance(output, (tuple, list)) else output
+
+# ==============================================
+# TRAINING
+# ==============================================
+def collect_features(classifier, texts, exit_layers, batch_size=16):
+    """
+    Run the full model once over ``texts``, keeping the [CLS] state after
+    each exit layer and the final logits.
+
+    Returns:
+        Tuple of ({layer: float32 tensor [n, hidden]}, final logits [n, labels])
+    """
+    import torch
+
+    tokenizer, model = classifier.tokenizer, classifier.model
+    features = {layer: [] for layer in exit_layers}
+    logits = []
+    for i in range(0, len(texts), batch_size):
+        batch = tokenizer(
+            texts[i:i + batch_size], truncation=True, max_length=MAX_SEQUENCE_LENGTH,
+            padding=True, return_tensors="pt"
+        )
+        batch = {key: value.to(model.device) for key, value in batch.items()}
+        with torch.inference_mode():
+            output = model(**batch, output_hidden_states=True)
+        # hidden_states[0] is the embedding output, [k] the output of layer k
+        for layer in exit_layers:
+            features[layer].append(output.hidden_states[layer][:, 0].float().cpu())
+        logits.append(output.logits.float().cpu())
+    return {layer: torch.cat(rows) for layer, rows in features.items()}, torch.cat(logits)
+
+
+def train_heads(model, features, teacher_logits, temperature=DEFAULT_TEMPERATURE,
+                epochs=DEFAULT_EPOCHS, learning_rate=DEFAULT_LEARNING_RATE, batch_size=64, seed=0):
+    """
+    Distil one head per exit layer from the final head's softened outputs.
+
+    Returns:
+        ``torch.nn.ModuleDict`` keyed by the layer number as a string
+    """
+    import torch
+
+    torch.manual_seed(seed)
+    heads = torch.nn.ModuleDict({str(layer): _make_head(model) for layer in features})
+    targets = torch.softmax(teacher_logits / temperature, dim=-1)
+    n = len(teacher_logits)
+
+    for layer, inputs in features.items():
+        head = heads[str(layer)]
+        head.train()
+        optimizer = torch.optim.AdamW(head.parameters(), lr=learning_rate)
+        for _ in range(epochs):
+            for rows in torch.randperm(n).split(batch_size):
+                log_probs = torch.log_softmax(head(inputs[rows]) / temperature, dim=-1)
+                loss = torch.nn.functional.kl_div(log_probs, targets[rows], reduction="batchmean")
+                optimizer.zero_grad()
+                (loss * temperature ** 2).backward()
+                optimizer.step()
+        head.eval()
+    return heads
+
+
+def calibrate_exit_thresholds(heads, features, teacher_logits, id2label,
+                              target_agreement=DEFAULT_TARGET_AGREEMENT,
+                              decision_threshold=CONFIDENCE_THRESHOLD):
+    """
+    Pick the lowest exit threshold per layer whose exiting held-out samples
+    agree with the full model's decision at least ``target_agreement`` of
+    the time.
+
+    Layers are calibrated in order on the samples still in the batch, as
+    at inference. A layer with no qualifying threshold gets None (no exit).
+
+    Returns:
+        Dict of {layer: threshold or None}
+    """
+    import torch
+
+    def to_decisions(probs):
+        return [decide(*_real_fake(row, id2label), decision_threshold)[0] for row in probs.tolist()]
+
+    final = to_decisions(torch.softmax(teacher_logits, dim=-1))
+    remaining = list(range(len(final)))
+    thresholds = {}
+
+    for layer in sorted(features, key=int):
+        with torch.no_grad():
+            probs = torch.softmax(heads[str(layer)](features[layer][remaining]), dim=-1)
+        confidence = probs.max(dim=-1).values.tolist()
+        head_decisions = to_decisions(probs)
+
+        thresholds[layer] = None
+        for threshold in EXIT_THRESHOLD_GRID:
+            exiting = [j for j, conf in enumerate(confidence) if conf >= threshold]
+            if len(exiting) < MIN_CALIBRATION_EXITS:
+                break
+            agreed = sum(head_decisions[j] == final[remaining[j]] for j in exiting)
+            if agreed / len(exiting) >= target_agreement:
+                thresholds[layer] = threshold
+                exited = set(exiting)
+                remaining = [index for j, index in enumerate(remaining) if j not in exited]
+                break
+    return thresholds
+
+
+def _real_fake(row, id2label):
+    labels = {id2label[j].lower(): score for j, score in enumerate(row)}
+    return labels["real"], labels["fake"]
+
+# ==============================================
+# INFERENCE
+# ==============================================
+class EarlyExitClassifier:
+    """
+    Pipeline-compatible classifier that stops at the first confident layer.
+
+    Args:
+        classifier: Pipeline from ``build_classifier()`` (torch backend)
+        heads: ``torch.nn.ModuleDict`` of exit heads keyed by layer number
+        thresholds: Dict of {layer: exit threshold or None}
+        max_length: Truncation length including special tokens
+    """
+
+    def __init__(self, classifier, heads, thresholds, max_length=MAX_SEQUENCE_LENGTH):
+        self.classifier = classifier
+        self.tokenizer = classifier.tokenizer
+        self.model = classifier.model
+        self.backbone, self.layers, self.head = _encoder_parts(self.model)
+        self.heads = heads.to(self.model.device).eval()
+        self.thresholds = {int(layer): threshold for layer, threshold in thresholds.items()}
+        self.max_length = max_length
+
+        self._lock = threading.Lock()
+        self._texts = 0
+        self._layers_run = 0
+        self._exits = {}
+
+    @classmethod
+    def load(cls, classifier, path):
+        """Attach heads saved by ``save()`` to a freshly built classifier."""
+        import torch
+
+        with open(os.path.join(path, HEADS_CONFIG_NAME), encoding="utf-8") as f:
+            config = json.load(f)
+        model_config = classifier.model.config
+        if (config["hidden_size"] != model_config.hidden_size
+                or config["num_hidden_layers"] != model_config.num_hidden_layers):
+            raise ValueError(f"exit heads in {path} were trained for a different architecture")
+
+        heads = torch.nn.ModuleDict({str(layer): _make_head(classifier.model) for layer in config["thresholds"]})
+        state = torch.load(os.path.join(path, HEADS_WEIGHTS_NAME), map_location="cpu", weights_only=True)
+        heads.load_state_dict(state)
+        return cls(classifier, heads, config["thresholds"])
+
+    def save(self, path, **meta):
+        """Write the heads' weights and per-layer exit thresholds to ``path``."""
+        import torch
+
+        os.makedirs(path, exist_ok=True)
+        torch.save(self.heads.state_dict(), os.path.join(path, HEADS_WEIGHTS_NAME))
+        config = {
+            "hidden_size": self.model.config.hidden_size,
+            "num_hidden_layers": self.model.config.num_hidden_layers,
+            "thresholds": {str(layer): threshold for layer, threshold in sorted(self.thresholds.items())},
+            **meta,
+        }
+        with open(os.path.join(path, HEADS_CONFIG_NAME), "w", encoding="utf-8") as f:
+            json.dump(config, f, indent=2)
+
+    def __call__(self, texts, batch_size=None, truncation=True, **kwargs):
+        if isinstance(texts, str):
+            texts = [texts]
+        if not texts:
+            return []
+        batch_size = batch_size or len(texts)
+
+        results = []
+        for start in range(0, len(texts), batch_size):
+            results.extend(self._forward(list(texts[start:start + batch_size]), truncation))
+        return results
+
+    def _forward(self, texts, truncation):
+        import torch
+
+        batch = self.tokenizer(
+            texts, truncation=truncation, max_length=self.max_length, padding=True, return_tensors="pt"
+        )
+        batch = {key: value.to(self.model.device) for key, value in batch.items()}
+        mask = batch["attention_mask"]
+        # Trimming to the longest remaining sequence only works with right padding
+        trim = self.tokenizer.padding_side == "right"
+
+        probs = [None] * len(texts)
+        depth = [0] * len(texts)
+        rows = torch.arange(len(texts), device=mask.device)
+        n_layers = len(self.layers)
+
+        with torch.inference_mode():
+            hidden = self.backbone.embeddings(
+                input_ids=batch["input_ids"], token_type_ids=batch.get("token_type_ids")
+            )
+            extended = self.model.get_extended_attention_mask(mask, mask.shape)
+
+            for layer_number, layer in enumerate(self.layers, start=1):
+                hidden = _run_layer(layer, hidden, extended)
+
+                if layer_number == n_layers:
+                    logits = self.head(self.backbone.pooler(hidden))
+                    done = torch.ones(len(rows), dtype=torch.bool, device=rows.device)
+                else:
+                    threshold = self.thresholds.get(layer_number)
+                    if threshold is None or str(layer_number) not in self.heads:
+                        continue
+                    logits = self.heads[str(layer_number)](hidden[:, 0].float())
+                    done = torch.softmax(logits.float(), dim=-1).max(dim=-1).values >= threshold
+                    if not done.any():
+                        continue
+
+                exited = torch.softmax(logits[done].float(), dim=-1).cpu().tolist()
+                for i, row in zip(rows[done].tolist(), exited):
+                    probs[i], depth[i] = row, layer_number
+                if done.all():
+                    break
+
+                keep = ~done
+                hidden, mask, rows = hidden[keep], mask[keep], rows[keep]
+                if trim:
+                    length = int(mask.sum(dim=1).max())
+                    hidden, mask = hidden[:, :length], mask[:, :length]
+                extended = self.model.get_extended_attention_mask(mask, mask.shape)
+
+        id2label = self.model.config.id2label
+        with self._lock:
+            self._texts += len(texts)
+            self._layers_run += sum(depth)
+            for layer_number in depth:
+                self._exits[layer_number] = self._exits.get(layer_number, 0) + 1
+        return [
+            sorted(
+                ({"label": id2label[j], "score": score} for j, score in enumerate(row)),
+                key=lambda item: item["score"],
+                reverse=True,
+            )
+            for row in probs
+        ]
+
+    def stats(self):
+        """Texts scored, mean encoder layers run per text and exits by layer."""
+        with self._lock:
+            n_layers = len(self.layers)
+            mean_layers = self._layers_run / self._texts if self._texts else 0.0
+            return {
+                "texts": self._texts,
+                "layers_run": self._layers_run,
+                "mean_layers": mean_layers,
+                "total_layers": n_layers,
+                "layer_speedup": n_layers / mean_layers if mean_layers else 0.0,
+                "exits_by_layer": dict(sorted(self._exits.items())),
+            }
+
+
+def evaluate_early_exit(classifier, early, texts, labels=None, batch_size=16,
+                        threshold=CONFIDENCE_THRESHOLD):
+    """
+    Compare early-exit inference with the full model on held-out texts.
+
+    Returns:
+        Dict with timings, measured speedup, mean layers executed, exits by
+        layer and agreement with the full model (``compare_predictions()``)
+    """
+    from evaluation import compare_predictions, predict_probabilities
+
+    full_probs, full_time = predict_probabilities(classifier, texts, batch_size)
+
+    before = early.stats()
+    early_probs, early_time = predict_probabilities(early, texts, batch_size)
+    after = early.stats()
+    scored = after["texts"] - before["texts"]
+    layers_run = after["layers_run"] - before["layers_run"]
+    mean_layers = layers_run / scored if scored else 0.0
+
+    report = {
+        "exit_thresholds": {str(layer): t for layer, t in sorted(early.thresholds.items())},
+        "full_seconds": full_time,
+        "early_exit_seconds": early_time,
+        "speedup": full_time / early_time if early_time else 0.0,
+        "mean_layers": mean_layers,
+        "total_layers": after["total_layers"],
+        "layer_speedup": after["total_layers"] / mean_layers if mean_layers else 0.0,
+        "exits_by_layer": {
+            str(layer): count - before["exits_by_layer"].get(layer, 0)
+            for layer, count in after["exits_by_layer"].items()
+        },
+    }
+    report.update(compare_predictions(full_probs, early_probs, labels, threshold))
+    return report
+
+
+def _load_texts(path, text_column, label_column, limit):
+    from bulk import iter_records
+    from evaluation import load_labelled_sample
+    from preprocessing import preprocess
+
+    if label_column:
+        return load_labelled_sample(path, text_column, label_column, limit)
+    records = iter_records(path, text_column=text_column)
+    return [preprocess(text) for _, _, text in islice(records, limit)], None
+
+# ==============================================
+# COMMAND-LINE ENTRY POINT
+# ==============================================
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Train and evaluate early-exit heads on intermediate AraBERT layers.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    train_cmd = subparsers.add_parser("train", help="Distil exit heads from the final head and calibrate thresholds")
+    train_cmd.add_argument("--output", required=True, help="Heads directory to write")
+    train_cmd.add_argument("--layers", type=int, nargs="+", default=list(DEFAULT_EXIT_LAYERS),
+                           help="Encoder layers (1-based) that get an exit head")
+    train_cmd.add_argument("--holdout", type=float, default=DEFAULT_HOLDOUT,
+                           help="Fraction of texts used to calibrate exit thresholds and for the report")
+    train_cmd.add_argument("--target-agreement", type=float, default=DEFAULT_TARGET_AGREEMENT,
+                           help="Minimum decision agreement with the full model among samples a head lets out")
+    train_cmd.add_argument("--temperature", type=float, default=DEFAULT_TEMPERATURE)
+    train_cmd.add_argument("--epochs", type=int, default=DEFAULT_EPOCHS)
+    train_cmd.add_argument("--seed", type=int, default=0)
+
+    evaluate_cmd = subparsers.add_parser("evaluate", help="Report saved exit heads on held-out data")
+    evaluate_cmd.add_argument("--heads", required=True, help="Heads directory")
+
+    for command in (train_cmd, evaluate_cmd):
+        command.add_argument("--data", required=True, help="CSV/JSONL file of texts")
+        command.add_argument("--text-column", default="text")
+        command.add_argument("--label-column", default=None,
+                             help="Optional Real/Fake label column for accuracy figures")
+        command.add_argument("--limit", type=int, default=None)
+        command.add_argument("--model-path", default=MODEL_PATH)
+        command.add_argument("--threshold", type=float, default=CONFIDENCE_THRESHOLD,
+                             help="Real/Fake decision threshold that agreement is measured at")
+        command.add_argument("--batch-size", type=int, default=16)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    import torch
+
+    from inference import build_classifier
+
+    args = parse_args(argv)
+    texts, labels = _load_texts(args.data, args.text_column, args.label_column, args.limit)
+    classifier = build_classifier(args.model_path)
+
+    if args.command == "train":
+        n_layers = classifier.model.config.num_hidden_layers
+        layers = sorted({layer for layer in args.layers if 1 <= layer < n_layers})
+        if not layers:
+            raise SystemExit(f"--layers must name layers between 1 and {n_layers - 1}")
+
+        order = list(range(len(texts)))
+        random.Random(args.seed).shuffle(order)
+        n_holdout = int(len(texts) * args.holdout)
+        held, train = order[:n_holdout], order[n_holdout:]
+        if not held or not train:
+            raise SystemExit("need texts both to train the heads and to calibrate their thresholds")
+
+        features, logits = collect_features(classifier, texts, layers, args.batch_size)
+        train_rows, held_rows = torch.tensor(train), torch.tensor(held)
+        heads = train_heads(
+            classifier.model,
+            {layer: rows[train_rows] for layer, rows in features.items()}, logits[train_rows],
+            temperature=args.temperature, epochs=args.epochs, seed=args.seed
+        )
+        thresholds = calibrate_exit_thresholds(
+            heads, {layer: rows[held_rows] for layer, rows in features.items()}, logits[held_rows],
+            classifier.model.config.id2label,
+            target_agreement=args.target_agreement, decision_threshold=args.threshold
+        )
+        early = EarlyExitClassifier(classifier, heads, thresholds)
+        early.save(args.output, base_model=args.model_path, target_agreement=args.target_agreement,
+                   decision_threshold=args.threshold, trained_on=len(train))
+        print(f"Saved exit heads for layers {layers} trained on {len(train)} texts to {args.output}")
+        texts = [texts[i] for i in held]
+        labels = [labels[i] for i in held] if labels is not None else None
+    else:
+        early = EarlyExitClassifier.load(classifier, args.heads)
+
+    report = evaluate_early_exit(classifier, early, texts, labels, args.batch_size, args.threshold)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Helpers shared by the offline comparison and evaluation tools.
+
+Loads labelled samples, scores them with any classifier pipeline and
+summarises how two sets of predictions differ under the confidence
+threshold (decision flips, accuracy, throughput).
+"""
+import io
+import time
+from itertools import islice
+
+import torch
+
+from bulk import iter_rows
+from inference import CONFIDENCE_THRESHOLD, decide, extract_probabilities
+from preprocessing import DEFAULT_PREPROCESSOR
+
+# ==============================================
+# LABELLED DATA
+# ==============================================
+LABEL_VALUES = {
+    "real": 0, "0": 0, "true": 0,
+    "fake": 1, "1": 1, "false": 1,
+}
+
+
+def parse_label(value):
+    """Map a Real/Fake label (name or 0/1 id) to its class index."""
+    key = str(value).strip().lower()
+    if key not in LABEL_VALUES:
+        raise ValueError(f"Unrecognised label '{value}' (expected Real/Fake or 0/1)")
+    return LABEL_VALUES[key]
+
+
+def load_labelled_sample(path, text_column="text", label_column="label", limit=None,
+                         preprocessor=DEFAULT_PREPROCESSOR):
+    """
+    Read a labelled CSV/JSONL sample, cleaned as the serving entry points do.
+
+    Returns:
+        Tuple of (texts, labels) with labels as 0 (Real) / 1 (Fake)
+    """
+    texts, labels = [], []
+    for record in islice(iter_rows(path), limit):
+        text = record[text_column] or ""
+        texts.append(preprocessor(text) if preprocessor is not None else text)
+        labels.append(parse_label(record[label_column]))
+    return texts, labels
+
+# ==============================================
+# SCORING
+# ==============================================
+def predict_probabilities(classifier, texts, batch_size=16):
+    """
+    Score texts in batches with a classification pipeline.
+
+    Returns:
+        Tuple of (list of ``(prob_real, prob_fake)``, elapsed seconds)
+    """
+    probabilities = []
+    start = time.perf_counter()
+    for i in range(0, len(texts), batch_size):
+        batch = texts[i:i + batch_size]
+        outputs = classifier(batch, batch_size=len(batch), truncation=True)
+        probabilities.extend(extract_probabilities(output) for output in outputs)
+    return probabilities, time.perf_counter() - start
+
+
+def decisions(probabilities, threshold=CONFIDENCE_THRESHOLD):
+    """Real/Fake/Uncertain decision for each ``(prob_real, prob_fake)`` pair."""
+    return [decide(real, fake, threshold)[0] for real, fake in probabilities]
+
+
+def accuracy(probabilities, labels):
+    """Argmax accuracy against 0/1 labels, ignoring the threshold."""
+    if not labels:
+        return 0.0
+    correct = sum(int(fake > real) == label for (real, fake), label in zip(probabilities, labels))
+    return correct / len(labels)
+
+
+def compare_predictions(reference, candidate, labels=None, threshold=CONFIDENCE_THRESHOLD):
+    """
+    Summarise how a candidate's predictions differ from a reference's.
+
+    Returns:
+        Dict with decision agreement, flip counts by transition, the mean
+        and max absolute ``prob_fake`` difference and, when labels are
+        given, both accuracies
+    """
+    ref_decisions = decisions(reference, threshold)
+    cand_decisions = decisions(candidate, threshold)
+
+    flips = {}
+    for ref, cand in zip(ref_decisions, cand_decisions):
+        if ref != cand:
+            transition = f"{ref}->{cand}"
+            flips[transition] = flips.get(transition, 0) + 1
+
+    deltas = [abs(r[1] - c[1]) for r, c in zip(reference, candidate)]
+    n = len(deltas)
+    report = {
+        "samples": n,
+        "decision_agreement": (n - sum(flips.values())) / n if n else 0.0,
+        "decision_flips": sum(flips.values()),
+        "flips_by_transition": flips,
+        "mean_abs_prob_fake_delta": sum(deltas) / n if n else 0.0,
+        "max_abs_prob_fake_delta": max(deltas) if deltas else 0.0,
+    }
+    if labels is not None:
+        report["reference_accuracy"] = accuracy(reference, labels)
+        report["candidate_accuracy"] = accuracy(candidate, labels)
+    return report
+
+
+def serialized_size(model):
+    """Size in bytes of the model's state dict as written by ``torch.save``."""
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell()
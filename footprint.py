@@ -0,0 +1,342 @@
+"""
+Memory-mapped safetensors loading and model footprint reduction.
+
+``from_pretrained`` reads every weight into private, anonymous process
+memory. This loader instead maps the safetensors file copy-on-write and
+builds each parameter directly on top of the mapping, so weights are
+file-backed pages: they are only faulted in when touched, the kernel can
+share them between replicas through the page cache, and a reload of the
+same file costs almost nothing.
+
+Optionally the weights are kept in bfloat16, halving their size (saved
+bf16 artifacts are mapped as-is; converting an fp32 file on load costs a
+private bf16 copy). bf16 matmuls are only fast on CPUs with native
+support (AVX512-BF16 / AMX); check accuracy and speed with ``report``.
+
+Usage:
+    python footprint.py convert --dtype bf16 --output models/arabert-bf16
+    python footprint.py report --model-path models/arabert-snapshot
+"""
+import argparse
+import ctypes
+import json
+import mmap
+import os
+import subprocess
+import sys
+import time
+
+import torch
+from transformers import AutoConfig, AutoModelForSequenceClassification, AutoTokenizer
+
+from inference import MODEL_PATH, make_pipeline
+from workerpool import process_memory
+
+# ==============================================
+# CONFIGURATION
+# ==============================================
+WEIGHTS_NAME = "model.safetensors"
+WEIGHTS_INDEX_NAME = "model.safetensors.index.json"
+SNAPSHOT_PATTERNS = ["*.json", "*.txt", "*.model", "*.safetensors"]
+LOAD_MODES = ("standard", "mmap", "mmap-bf16")
+
+DTYPES = {
+    "fp32": torch.float32,
+    "bf16": torch.bfloat16,
+}
+
+# safetensors dtype codes
+SAFETENSORS_DTYPES = {
+    "F64": torch.float64,
+    "F32": torch.float32,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "I64": torch.int64,
+    "I32": torch.int32,
+    "I16": torch.int16,
+    "I8": torch.int8,
+    "U8": torch.uint8,
+    "BOOL": torch.bool,
+}
+
+# ==============================================
+# SAFETENSORS MAPPING
+# ==============================================
+def weight_files(model_dir):
+    """
+    Safetensors files of a local model directory (single or sharded).
+
+    Returns:
+        List of file paths, empty when the model has no safetensors weights
+    """
+    index_path = os.path.join(model_dir, WEIGHTS_INDEX_NAME)
+    if os.path.isfile(index_path):
+        with open(index_path, "r", encoding="utf-8") as f:
+            shards = sorted(set(json.load(f)["weight_map"].values()))
+        return [os.path.join(model_dir, shard) for shard in shards]
+    path = os.path.join(model_dir, WEIGHTS_NAME)
+    return [path] if os.path.isfile(path) else []
+
+
+def mmap_safetensors(path):
+    """
+    Map a safetensors file and return its tensors without copying them.
+
+    The mapping is private copy-on-write: pages stay shared with the page
+    cache until something writes to them, which inference never does.
+    """
+    with open(path, "rb") as f:
+        header_size = int.from_bytes(f.read(8), "little")
+        header = json.loads(f.read(header_size))
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    data_start = 8 + header_size
+    tensors = {}
+    for name, info in header.items():
+        if name == "__metadata__":
+            continue
+        dtype = SAFETENSORS_DTYPES[info["dtype"]]
+        begin, end = info["data_offsets"]
+        offset = data_start + begin
+        count = (end - begin) // dtype.itemsize
+        if count == 0:
+            tensors[name] = torch.empty(info["shape"], dtype=dtype)
+            continue
+        tensor = torch.frombuffer(buffer, dtype=dtype, count=count, offset=offset)
+        if offset % dtype.itemsize:
+            # Misaligned entries cannot be viewed in place
+            tensor = tensor.clone()
+        tensors[name] = tensor.view(info["shape"])
+    return tensors
+
+
+def resolve_model_dir(model_path, local_files_only=False):
+    """Local directory holding ``model_path`` (downloading hub ids to the cache)."""
+    if os.path.isdir(model_path):
+        return model_path
+    from huggingface_hub import snapshot_download
+
+    return snapshot_download(
+        repo_id=model_path,
+        allow_patterns=SNAPSHOT_PATTERNS,
+        local_files_only=local_files_only,
+    )
+
+# ==============================================
+# FOOTPRINT REDUCTION
+# ==============================================
+def strip_for_inference(model):
+    """
+    Drop state that only training or generation needs.
+
+    Parameters stop tracking gradients (no ``.grad`` buffers can ever be
+    allocated) and the unused generation config is released.
+    """
+    model.eval()
+    model.requires_grad_(False)
+    for parameter in model.parameters():
+        parameter.grad = None
+    if getattr(model, "generation_config", None) is not None:
+        model.generation_config = None
+    return model
+
+
+def release_free_memory():
+    """Return freed heap pages to the OS (glibc only; no-op elsewhere)."""
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+def _skip_weight_init():
+    # Parameters are replaced by mapped tensors, so random init is wasted work
+    try:
+        from transformers.initialization import no_init_weights
+    except ImportError:
+        from transformers.modeling_utils import no_init_weights
+    return no_init_weights()
+
+# ==============================================
+# LOADING
+# ==============================================
+def load_mmap_model(model_path=MODEL_PATH, dtype=None, local_files_only=False):
+    """
+    Build the classification model on top of memory-mapped weights.
+
+    Falls back to ``from_pretrained`` when the model ships no safetensors
+    file. When every weight stays mapped from the file (no dtype
+    conversion), the model carries ``mmap_source``: the arguments that map
+    the same file again, so other processes can share its pages through the
+    page cache instead of copying them.
+
+    Args:
+        model_path: Hub id or local directory
+        dtype: ``"fp32"``, ``"bf16"`` or None to keep the stored dtype
+        local_files_only: Never contact the hub
+    """
+    model_dir = resolve_model_dir(model_path, local_files_only)
+    config = AutoConfig.from_pretrained(model_path, local_files_only=local_files_only)
+    target = DTYPES[dtype] if dtype else None
+
+    files = weight_files(model_dir)
+    if not files:
+        model = AutoModelForSequenceClassification.from_pretrained(
+            model_path, local_files_only=local_files_only
+        )
+        if target is not None:
+            model = model.to(target)
+        return strip_for_inference(model)
+
+    state_dict = {}
+    for path in files:
+        state_dict.update(mmap_safetensors(path))
+    file_backed = target is None or all(
+        tensor.dtype == target
+        for tensor in state_dict.values() if tensor.is_floating_point()
+    )
+    if not file_backed:
+        state_dict = {
+            name: tensor.to(target) if tensor.is_floating_point() else tensor
+            for name, tensor in state_dict.items()
+        }
+
+    with _skip_weight_init():
+        model = AutoModelForSequenceClassification.from_config(config)
+    # assign=True adopts the mapped tensors instead of copying into the
+    # freshly allocated (never touched) parameters
+    missing, _ = model.load_state_dict(state_dict, strict=False, assign=True)
+    missing = [
+        name for name in missing
+        if name not in dict(model.named_buffers())
+    ]
+    if missing:
+        raise ValueError(f"Weights missing from {model_dir}: {', '.join(missing)}")
+    model.tie_weights()
+    if file_backed:
+        model.mmap_source = {
+            "model_path": model_path,
+            "dtype": dtype,
+            "local_files_only": local_files_only,
+        }
+
+    release_free_memory()
+    return strip_for_inference(model)
+
+
+def build_mmap_classifier(model_path=MODEL_PATH, dtype=None, local_files_only=False):
+    """Classification pipeline over memory-mapped (optionally bf16) weights."""
+    tokenizer = AutoTokenizer.from_pretrained(model_path, local_files_only=local_files_only)
+    model = load_mmap_model(model_path, dtype=dtype, local_files_only=local_files_only)
+    return make_pipeline(model, tokenizer)
+
+
+def save_artifact(model_path, output_dir, dtype="bf16"):
+    """
+    Write a safetensors artifact in ``dtype`` so it can be mapped directly.
+
+    The tokenizer and config are saved alongside.
+    """
+    from safetensors.torch import save_file
+
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    model = AutoModelForSequenceClassification.from_pretrained(model_path)
+    model = model.to(DTYPES[dtype])
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer.save_pretrained(output_dir)
+    model.config.save_pretrained(output_dir)
+    state_dict = {name: tensor.contiguous() for name, tensor in model.state_dict().items()}
+    save_file(state_dict, os.path.join(output_dir, WEIGHTS_NAME), metadata={"format": "pt"})
+
+# ==============================================
+# RESIDENT-MEMORY REPORT
+# ==============================================
+def measure_load(mode, model_path):
+    """
+    Load the classifier with one mode in this process and record memory.
+
+    Returns:
+        Dict with RSS/PSS/USS/anonymous MiB before loading, after loading
+        and after one forward pass, plus the load time
+    """
+    before = process_memory()
+    start = time.perf_counter()
+    if mode == "standard":
+        from inference import build_classifier
+
+        classifier = build_classifier(model_path)
+    else:
+        classifier = build_mmap_classifier(
+            model_path, dtype="bf16" if mode == "mmap-bf16" else None
+        )
+    load_seconds = time.perf_counter() - start
+    loaded = process_memory()
+
+    classifier(["خبر للتحقق من استهلاك الذاكرة"], truncation=True)
+    return {
+        "mode": mode,
+        "load_seconds": load_seconds,
+        "before_mb": before,
+        "loaded_mb": loaded,
+        "after_inference_mb": process_memory(),
+    }
+
+
+def report(model_path, modes=LOAD_MODES):
+    """Measure each loading mode in a fresh interpreter so runs do not share memory."""
+    results = []
+    for mode in modes:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "measure",
+             "--mode", mode, "--model-path", model_path],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        results.append(json.loads(output))
+
+    # Anonymous memory is what each replica pays privately; file-backed
+    # weight pages are shared through the page cache
+    baseline = next((r for r in results if r["mode"] == "standard"), None)
+    for result in results:
+        if baseline and result["after_inference_mb"] and baseline["after_inference_mb"]:
+            ours, theirs = result["after_inference_mb"], baseline["after_inference_mb"]
+            result["rss_saved_mb"] = theirs["rss"] - ours["rss"]
+            result["anon_saved_mb"] = theirs["anon"] - ours["anon"]
+    return {"model_path": model_path, "results": results}
+
+# ==============================================
+# COMMAND-LINE ENTRY POINT
+# ==============================================
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Memory-mapped loading and footprint tools.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    convert = subparsers.add_parser("convert", help="Write a mappable safetensors artifact")
+    convert.add_argument("--model-path", default=MODEL_PATH)
+    convert.add_argument("--output", required=True)
+    convert.add_argument("--dtype", choices=sorted(DTYPES), default="bf16")
+
+    report_parser = subparsers.add_parser("report", help="Compare resident memory of each loading mode")
+    report_parser.add_argument("--model-path", default=MODEL_PATH)
+    report_parser.add_argument("--modes", default=",".join(LOAD_MODES))
+
+    measure = subparsers.add_parser("measure", help="Measure one loading mode in this process")
+    measure.add_argument("--model-path", default=MODEL_PATH)
+    measure.add_argument("--mode", choices=LOAD_MODES, required=True)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.command == "convert":
+        save_artifact(args.model_path, args.output, args.dtype)
+        print(f"Wrote {args.dtype} artifact to {args.output}")
+    elif args.command == "measure":
+        print(json.dumps(measure_load(args.mode, args.model_path)))
+    else:
+        print(json.dumps(report(args.model_path, args.modes.split(",")), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+Confidence gauge rendering shared by the app and the benchmark suite.
+
+Two renderers draw the same gauge:
+
+    plotly  ``go.Figure(go.Indicator(...))`` built per request and shipped
+            to the browser as Plotly JSON
+    svg     static inline SVG; everything but the value arc and the
+            number is precomputed once, so a request is a few string
+            substitutions and ships no chart payload or script
+
+Usage:
+    python gauge.py --samples 500
+"""
+import argparse
+import json
+import math
+import time
+from functools import lru_cache
+
+from inference import CONFIDENCE_THRESHOLD
+
+# ==============================================
+# CONFIGURATION
+# ==============================================
+GAUGE_RENDERERS = ("svg", "plotly")
+GAUGE_COLORS = {
+    'real': '#10b981',
+    'fake': '#ef4444',
+    'uncertain': '#f59e0b'
+}
+DEFAULT_GAUGE_COLOR = '#6366f1'
+GAUGE_STEPS = (
+    (0, 50, 'rgba(239, 68, 68, 0.1)'),
+    (50, 80, 'rgba(245, 158, 11, 0.1)'),
+    (80, 100, 'rgba(16, 185, 129, 0.1)')
+)
+DEFAULT_SAMPLES = 500
+
+# ==============================================
+# CONFIDENCE GAUGE VISUALIZATION
+# ==============================================
+def create_confidence_gauge(confidence_score, decision_type, threshold=CONFIDENCE_THRESHOLD):
+    """
+    Create an elegant, professional confidence gauge using Plotly.
+    
+    Args:
+        confidence_score: Float between 0 and 1
+        decision_type: 'real', 'fake', or 'uncertain'
+        threshold: Decision threshold marked on the dial
+    
+    Returns:
+        Plotly figure object
+    """
+    import plotly.graph_objects as go
+    
+    gauge_color = GAUGE_COLORS.get(decision_type, DEFAULT_GAUGE_COLOR)
+    confidence_percent = confidence_score * 100
+    
+    fig = go.Figure(go.Indicator(
+        mode="gauge+number",
+        value=confidence_percent,
+        domain={'x': [0, 1], 'y': [0, 1]},
+        number={
+            'suffix': "%",
+            'font': {
+                'size': 56,
+                'color': gauge_color,
+                'family': 'Inter, sans-serif',
+                'weight': 900
+            },
+            'valueformat': '.1f'
+        },
+        gauge={
+            'axis': {
+                'range': [0, 100],
+                'tickwidth': 2,
+                'tickcolor': '#374151',
+                'tickfont': {'size': 13, 'color': '#9ca3af', 'family': 'Inter'}
+            },
+            'bar': {
+                'color': gauge_color,
+                'thickness': 0.75,
+                'line': {'width': 0}
+            },
+            'bgcolor': '#1f2937',
+            'borderwidth': 3,
+            'bordercolor': '#374151',
+            'steps': [
+                {'range': [low, high], 'color': color} for low, high, color in GAUGE_STEPS
+            ],
+            'threshold': {
+                'line': {'color': '#f9fafb', 'width': 4},
+                'thickness': 0.8,
+                'value': threshold * 100
+            }
+        },
+        title={
+            'text': "Confidence Level",
+            'font': {'size': 18, 'color': '#e5e7eb', 'family': 'Inter', 'weight': 700}
+        }
+    ))
+    
+    fig.update_layout(
+        height=320,
+        margin=dict(l=30, r=30, t=80, b=30),
+        paper_bgcolor="rgba(0,0,0,0)",
+        plot_bgcolor="rgba(0,0,0,0)",
+        font={'color': "#f9fafb", 'family': "Inter, sans-serif"},
+        annotations=[
+            dict(
+                text=f"Decision Threshold: {threshold*100:.0f}%",
+                x=0.5,
+                y=-0.15,
+                xref="paper",
+                yref="paper",
+                showarrow=False,
+                font=dict(size=13, color="#6b7280", family="Inter")
+            )
+        ]
+    )
+    
+    return fig
+
+# ==============================================
+# STATIC SVG GAUGE
+# ==============================================
+_CX, _CY, _RADIUS, _BAND = 200, 230, 140, 44
+
+
+def _point(percent, radius):
+    # 0% sits at the left end of the half circle, 100% at the right end
+    angle = math.pi * (1 - percent / 100.0)
+    return _CX + radius * math.cos(angle), _CY - radius * math.sin(angle)
+
+
+def _arc(start, end, radius=_RADIUS):
+    x0, y0 = _point(start, radius)
+    x1, y1 = _point(end, radius)
+    return f"M {x0:.2f} {y0:.2f} A {radius} {radius} 0 0 1 {x1:.2f} {y1:.2f}"
+
+
+@lru_cache(maxsize=8)
+def _static_svg_parts(threshold):
+    """Everything in the SVG gauge that does not depend on the score."""
+    parts = [
+        f"<path d='{_arc(0, 100)}' fill='none' stroke='#1f2937' stroke-width='{_BAND + 6}'/>"
+    ]
+    for low, high, color in GAUGE_STEPS:
+        parts.append(f"<path d='{_arc(low, high)}' fill='none' stroke='{color}' stroke-width='{_BAND}'/>")
+    for tick in range(0, 101, 20):
+        x0, y0 = _point(tick, _RADIUS + _BAND / 2 + 2)
+        x1, y1 = _point(tick, _RADIUS + _BAND / 2 + 10)
+        lx, ly = _point(tick, _RADIUS + _BAND / 2 + 26)
+        parts.append(
+            f"<line x1='{x0:.2f}' y1='{y0:.2f}' x2='{x1:.2f}' y2='{y1:.2f}' stroke='#374151' stroke-width='2'/>"
+            f"<text x='{lx:.2f}' y='{ly + 4:.2f}' text-anchor='middle' font-size='13' fill='#9ca3af'>{tick}</text>"
+        )
+    threshold = threshold * 100
+    x0, y0 = _point(threshold, _RADIUS - _BAND * 0.4)
+    x1, y1 = _point(threshold, _RADIUS + _BAND * 0.4)
+    threshold_line = (
+        f"<line x1='{x0:.2f}' y1='{y0:.2f}' x2='{x1:.2f}' y2='{y1:.2f}' stroke='#f9fafb' stroke-width='4'/>"
+    )
+    head = (
+        "<div style='text-align: center;'>"
+        "<svg viewBox='0 0 400 300' width='100%' style='max-height: 320px;' role='img' "
+        "font-family='Inter, sans-serif' xmlns='http://www.w3.org/2000/svg'>"
+        "<text x='200' y='24' text-anchor='middle' font-size='18' font-weight='700' fill='#e5e7eb'>"
+        "Confidence Level</text>"
+        + "".join(parts)
+    )
+    tail = (
+        threshold_line
+        + f"<text x='200' y='285' text-anchor='middle' font-size='13' fill='#6b7280'>"
+        f"Decision Threshold: {threshold:.0f}%</text>"
+        "</svg></div>"
+    )
+    return head, tail
+
+
+def confidence_gauge_svg(confidence_score, decision_type, threshold=CONFIDENCE_THRESHOLD):
+    """
+    Same gauge as ``create_confidence_gauge`` as a self-contained SVG string.
+
+    Render with ``st.markdown(..., unsafe_allow_html=True)``.
+    """
+    gauge_color = GAUGE_COLORS.get(decision_type, DEFAULT_GAUGE_COLOR)
+    confidence_percent = min(max(confidence_score * 100, 0.0), 100.0)
+    value_arc = ""
+    if confidence_percent > 0:
+        value_arc = (
+            f"<path d='{_arc(0, confidence_percent)}' fill='none' stroke='{gauge_color}' "
+            f"stroke-width='{_BAND * 0.75:.0f}'/>"
+        )
+    number = (
+        f"<text x='200' y='215' text-anchor='middle' font-size='56' font-weight='900' "
+        f"fill='{gauge_color}'>{confidence_percent:.1f}%</text>"
+    )
+    head, tail = _static_svg_parts(threshold)
+    return head + value_arc + number + tail
+
+# ==============================================
+# RENDERER BENCHMARK
+# ==============================================
+def gauge_payload(renderer, confidence_score, decision_type):
+    """The gauge as the string shipped to the browser by ``renderer``."""
+    if renderer == "svg":
+        return confidence_gauge_svg(confidence_score, decision_type)
+    if renderer == "plotly":
+        return create_confidence_gauge(confidence_score, decision_type).to_json()
+    raise ValueError(f"Unknown gauge renderer {renderer!r}; expected one of {GAUGE_RENDERERS}")
+
+
+def benchmark_renderers(samples=DEFAULT_SAMPLES, renderers=GAUGE_RENDERERS):
+    """
+    Server-side build time and payload size of each renderer.
+
+    Scores sweep evenly over [0, 1] and cycle through the decision types.
+    Plotly timings include serialising the figure to JSON, which Streamlit
+    does on every ``st.plotly_chart`` call; the plotly.js bundle the
+    browser must also load is not counted.
+    """
+    decisions = tuple(GAUGE_COLORS)
+    inputs = [(i / max(samples - 1, 1), decisions[i % len(decisions)]) for i in range(samples)]
+    report = {}
+    for renderer in renderers:
+        # First call pays imports and template set-up; keep it out of the timings
+        gauge_payload(renderer, 0.5, "real")
+        timings = []
+        sizes = []
+        for confidence, decision in inputs:
+            start = time.perf_counter()
+            payload = gauge_payload(renderer, confidence, decision)
+            timings.append((time.perf_counter() - start) * 1000.0)
+            sizes.append(len(payload.encode("utf-8")))
+        timings.sort()
+        report[renderer] = {
+            "mean_ms": sum(timings) / samples,
+            "p50_ms": timings[samples // 2],
+            "p95_ms": timings[min(samples - 1, int(0.95 * samples))],
+            "mean_payload_bytes": sum(sizes) / samples,
+        }
+    if "svg" in report and "plotly" in report:
+        report["speedup"] = report["plotly"]["mean_ms"] / report["svg"]["mean_ms"]
+        report["payload_ratio"] = report["plotly"]["mean_payload_bytes"] / report["svg"]["mean_payload_bytes"]
+    return report
+
+# ==============================================
+# COMMAND-LINE ENTRY POINT
+# ==============================================
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compare gauge renderers by build time and payload size.")
+    parser.add_argument("--samples", type=int, default=DEFAULT_SAMPLES)
+    parser.add_argument("--renderers", default=",".join(GAUGE_RENDERERS),
+                        help="Comma-separated subset of: " + ", ".join(GAUGE_RENDERERS))
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    renderers = tuple(name for name in args.renderers.split(",") if name)
+    print(json.dumps(benchmark_renderers(args.samples, renderers), indent=2))
+
+
+if __name__ == "__main__":
+    main()
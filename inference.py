@@ -0,0 +1,141 @@
+"""
+Model loading and decision logic shared by every entry point.
+
+The Streamlit UI, the bulk file classifier and any other headless tool
+build the same pipeline and apply the same Real/Fake/Uncertain rule, so
+a prediction never depends on which entry point produced it.
+"""
+import math
+import os
+
+# ==============================================
+# CONFIGURATION
+# ==============================================
+CONFIDENCE_THRESHOLD = 0.8
+MODEL_PATH = "AhmadDS04/arabert-fake-news"
+MAX_SEQUENCE_LENGTH = 512  # AraBERT position-embedding limit, special tokens included
+
+DECISION_LABELS = {
+    "real": "Real",
+    "fake": "Fake",
+    "uncertain": "Uncertain",
+}
+
+# ==============================================
+# MODEL LOADING
+# ==============================================
+# transformers is imported inside the loaders so that importing this module
+# (e.g. for the decision logic) stays cheap
+def build_classifier(model_path=MODEL_PATH, local_files_only=False):
+    """
+    Load the pre-trained AraBERT model and create a classification pipeline.
+
+    Args:
+        model_path: Hub id or local directory of the fine-tuned model
+        local_files_only: Never contact the hub (for pinned local snapshots)
+
+    Returns:
+        transformers text-classification pipeline returning all scores
+    """
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+
+    tokenizer = AutoTokenizer.from_pretrained(model_path, local_files_only=local_files_only)
+    model = AutoModelForSequenceClassification.from_pretrained(
+        model_path, local_files_only=local_files_only
+    )
+    return make_pipeline(model, tokenizer)
+
+
+def make_pipeline(model, tokenizer):
+    """
+    Wrap an already loaded model and tokenizer in the classification pipeline.
+    Used for model variants (e.g. quantized) that are loaded differently.
+    """
+    from transformers import pipeline
+
+    # Make truncation=True stop at the model's input limit even when the
+    # tokenizer config does not declare one
+    tokenizer.model_max_length = min(tokenizer.model_max_length, MAX_SEQUENCE_LENGTH)
+
+    # Configure label mapping
+    model.config.id2label = {0: "Real", 1: "Fake"}
+    model.config.label2id = {"Real": 0, "Fake": 1}
+
+    # Create classification pipeline
+    return pipeline(
+        "text-classification",
+        model=model,
+        tokenizer=tokenizer,
+        top_k=None  # all labels, highest score first (replaces return_all_scores)
+    )
+
+def model_revision(classifier):
+    """
+    Identify the exact weights behind a classifier.
+
+    Uses the model registry version when one was hot-swapped in, the hub
+    commit hash when the model came from the hub, otherwise the newest
+    modification time of the files in the local model directory.
+    """
+    config = classifier.model.config
+    registry_version = getattr(config, "registry_version", None)
+    if registry_version:
+        return registry_version
+    commit_hash = getattr(config, "_commit_hash", None)
+    if commit_hash:
+        return commit_hash
+
+    model_dir = config.name_or_path
+    if model_dir and os.path.isdir(model_dir):
+        mtimes = [
+            os.path.getmtime(os.path.join(model_dir, name))
+            for name in os.listdir(model_dir)
+        ]
+        if mtimes:
+            return f"local-{max(mtimes):.0f}"
+    return "unknown"
+
+# ==============================================
+# DECISION LOGIC
+# ==============================================
+def extract_probabilities(outputs):
+    """
+    Convert one pipeline output into ``(prob_real, prob_fake)``.
+
+    Args:
+        outputs: List of ``{"label", "score"}`` dicts for a single text
+    """
+    scores = {item["label"]: item["score"] for item in outputs}
+    return scores.get("Real", 0), scores.get("Fake", 0)
+
+
+def apply_temperature(prob_real, prob_fake, temperature=1.0):
+    """
+    Temperature-scale a pair of probabilities.
+
+    With two classes the softmax only depends on the logit difference,
+    which is recovered from the probabilities and divided by
+    ``temperature`` (see ``calibration.py``).
+    """
+    if temperature == 1.0:
+        return prob_real, prob_fake
+    eps = 1e-12
+    difference = math.log(max(prob_fake, eps)) - math.log(max(prob_real, eps))
+    prob_fake = 1.0 / (1.0 + math.exp(-difference / temperature))
+    return 1.0 - prob_fake, prob_fake
+
+
+def decide(prob_real, prob_fake, threshold=CONFIDENCE_THRESHOLD):
+    """
+    Apply the confidence threshold to a pair of probabilities.
+
+    Returns:
+        Tuple of (decision, confidence) where decision is
+        'real', 'fake', or 'uncertain'
+    """
+    confidence = max(prob_real, prob_fake)
+    if confidence < threshold:
+        return "uncertain", confidence
+    if prob_fake > prob_real:
+        return "fake", confidence
+    return "real", confidence
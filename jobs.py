@@ -0,0 +1,166 @@
+"""
+Background analysis jobs for the Streamlit UI.
+
+Scoring and explanations run on a shared thread pool instead of inside
+the session's script run, so a slow request never freezes the page. Each
+job has an id the UI polls; results are rendered as soon as they exist.
+
+Within one session every job occupies a named slot ("analysis",
+"explain"). Submitting the same key to a slot again returns the job that
+is already in flight (repeated clicks do no extra work); submitting a
+different key supersedes the previous job, which is cancelled if it has
+not started and has its result discarded otherwise. Failed and cancelled
+jobs are never reused, so clicking again retries them.
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+# ==============================================
+# CONFIGURATION
+# ==============================================
+DEFAULT_MAX_WORKERS = 4
+DEFAULT_RETENTION_SECONDS = 15 * 60
+
+
+class Job:
+    """One submitted unit of work and its outcome."""
+
+    def __init__(self, session_id, slot, key):
+        self.id = uuid.uuid4().hex[:12]
+        self.session_id = session_id
+        self.slot = slot
+        self.key = key
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.superseded = False
+        self.future = None
+
+    @property
+    def status(self):
+        if self.superseded or self.future.cancelled():
+            return "cancelled"
+        if not self.future.done():
+            return "running" if self.started else "queued"
+        return "failed" if self.future.exception() is not None else "done"
+
+    def done(self):
+        return self.status in ("done", "failed", "cancelled")
+
+    @property
+    def result(self):
+        return self.future.result() if self.status == "done" else None
+
+    @property
+    def error(self):
+        return self.future.exception() if self.status == "failed" else None
+
+    def elapsed(self):
+        return (self.finished or time.time()) - self.created
+
+
+class JobManager:
+    """
+    Thread-pool job runner with per-session deduplication and cancellation.
+
+    Args:
+        max_workers: Jobs executing at once across all sessions
+        retention_seconds: How long finished jobs stay retrievable
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS,
+                 retention_seconds=DEFAULT_RETENTION_SECONDS):
+        self.retention_seconds = retention_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis-job")
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._slots = {}
+        self._submitted = 0
+        self._deduplicated = 0
+        self._cancelled = 0
+
+    def submit(self, session_id, slot, key, fn, *args, **kwargs):
+        """
+        Run ``fn(*args, **kwargs)`` in the background for a session slot.
+
+        Returns:
+            The new ``Job``, or the in-flight/finished job already holding
+            ``key`` in this slot
+        """
+        with self._lock:
+            self._prune()
+            current = self._jobs.get(self._slots.get((session_id, slot)))
+            if current is not None and current.key == key and current.status not in ("failed", "cancelled"):
+                self._deduplicated += 1
+                return current
+            if current is not None and not current.done():
+                self._cancel(current)
+
+            job = Job(session_id, slot, key)
+            job.future = self._executor.submit(self._run, job, fn, args, kwargs)
+            self._jobs[job.id] = job
+            self._slots[(session_id, slot)] = job.id
+            self._submitted += 1
+            return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Cancel a job; True when it had not finished yet."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.done():
+                return False
+            self._cancel(job)
+            return True
+
+    def cancel_slot(self, session_id, slot):
+        """Cancel whatever is in flight in one of a session's slots."""
+        with self._lock:
+            job = self._jobs.get(self._slots.get((session_id, slot)))
+            if job is None or job.done():
+                return False
+            self._cancel(job)
+            return True
+
+    def stats(self):
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+            return {
+                "submitted": self._submitted,
+                "deduplicated": self._deduplicated,
+                "cancelled": self._cancelled,
+                "queued": statuses.count("queued"),
+                "running": statuses.count("running"),
+                "retained": len(statuses),
+            }
+
+    def _cancel(self, job):
+        # A running job cannot be interrupted; its result is dropped instead
+        job.superseded = True
+        job.future.cancel()
+        self._cancelled += 1
+
+    def _run(self, job, fn, args, kwargs):
+        job.started = time.time()
+        try:
+            if job.superseded:
+                raise CancelledError()
+            return fn(*args, **kwargs)
+        finally:
+            job.finished = time.time()
+
+    def _prune(self):
+        cutoff = time.time() - self.retention_seconds
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.done() and (job.finished or job.created) < cutoff
+        ]
+        for job_id in expired:
+            job = self._jobs.pop(job_id)
+            if self._slots.get((job.session_id, job.slot)) == job_id:
+                del self._slots[(job.session_id, job.slot)]
@@ -0,0 +1,140 @@
+"""
+Local load-test harness for the JSON inference server.
+
+Fires requests at ``server.py`` from a fixed number of concurrent clients
+and reports latency percentiles, throughput and the status-code mix
+(including 429 backpressure responses).
+
+Usage:
+    python loadtest.py --url http://localhost:8080 --concurrency 32 --requests 2000
+    python loadtest.py --batch 16 --inputs samples.jsonl
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+
+from tornado.httpclient import AsyncHTTPClient, HTTPClientError
+
+# ==============================================
+# SAMPLE INPUTS
+# ==============================================
+SAMPLE_TEXTS = [
+    "أعلنت وزارة الصحة اليوم عن اكتشاف علاج جديد يقضي على فيروس كورونا بنسبة 100٪ خلال 24 ساعة فقط",
+    "عقد مجلس الوزراء جلسته الأسبوعية برئاسة رئيس الوزراء وناقش عدداً من الملفات الاقتصادية",
+    "تحذير عاجل: شرب الماء البارد بعد الأكل يسبب السرطان حسب دراسة سرية",
+    "افتتح وزير التعليم اليوم مدرسة جديدة في المحافظة بحضور عدد من المسؤولين",
+    "انتشار فيديو يزعم أن الحكومة ستلغي جميع الرواتب اعتباراً من الشهر المقبل",
+]
+
+
+def load_inputs(path):
+    """Read texts from a JSONL file with a ``text`` key, or use the built-in samples."""
+    if path is None:
+        return SAMPLE_TEXTS
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line)["text"] for line in f if line.strip()]
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+# ==============================================
+# LOAD GENERATION
+# ==============================================
+async def run_load(url, texts, concurrency, total_requests, batch):
+    client = AsyncHTTPClient(max_clients=concurrency)
+    endpoint = f"{url}/v1/classify/batch" if batch > 1 else f"{url}/v1/classify"
+    latencies = []
+    statuses = Counter()
+    remaining = total_requests
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            if batch > 1:
+                body = {"texts": random.choices(texts, k=batch)}
+            else:
+                body = {"text": random.choice(texts)}
+
+            start = time.perf_counter()
+            try:
+                response = await client.fetch(
+                    endpoint,
+                    method="POST",
+                    body=json.dumps(body, ensure_ascii=False),
+                    headers={"Content-Type": "application/json"},
+                    request_timeout=120,
+                )
+                statuses[response.code] += 1
+            except HTTPClientError as e:
+                statuses[e.code] += 1
+                continue
+            except OSError:
+                statuses["connection-error"] += 1
+                continue
+            latencies.append((time.perf_counter() - start) * 1000.0)
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - wall_start
+    client.close()
+
+    latencies.sort()
+    succeeded = len(latencies)
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": total_requests,
+        "texts_per_request": batch,
+        "succeeded": succeeded,
+        "status_codes": {str(code): count for code, count in sorted(statuses.items(), key=str)},
+        "elapsed_s": elapsed,
+        "requests_per_s": succeeded / elapsed if elapsed else 0.0,
+        "texts_per_s": succeeded * batch / elapsed if elapsed else 0.0,
+        "latency_ms": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": latencies[-1] if latencies else 0.0,
+        },
+    }
+
+# ==============================================
+# COMMAND-LINE ENTRY POINT
+# ==============================================
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the JSON inference server.")
+    parser.add_argument("--url", default="http://localhost:8080")
+    parser.add_argument("--concurrency", type=int, default=16,
+                        help="Concurrent client connections")
+    parser.add_argument("--requests", type=int, default=500, help="Total requests to send")
+    parser.add_argument("--batch", type=int, default=1,
+                        help="Texts per request (>1 uses the batch endpoint)")
+    parser.add_argument("--inputs", default=None, help="Optional JSONL file of texts")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    random.seed(args.seed)
+    report = asyncio.run(run_load(
+        args.url.rstrip("/"),
+        load_inputs(args.inputs),
+        args.concurrency,
+        args.requests,
+        args.batch,
+    ))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
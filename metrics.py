@@ -0,0 +1,297 @@
+"""
+Low-overhead instrumentation and a Prometheus-style metrics endpoint.
+
+Counters and fixed-bucket histograms are plain Python objects guarded by
+a lock; recording a sample is a dict lookup, a bisect and two additions,
+so the instrumentation can stay on in production. ``render()`` produces
+the Prometheus text exposition format, served either by the standalone
+``start_metrics_server()`` thread (Streamlit) or a route in ``server.py``.
+
+An optional per-request trace log appends one JSON line per analysis
+with its stage timings, input size and decision.
+"""
+import json
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from inference import CONFIDENCE_THRESHOLD
+
+# ==============================================
+# CONFIGURATION
+# ==============================================
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+MARGIN_BUCKETS = (-0.3, -0.2, -0.1, -0.05, 0.0, 0.05, 0.1, 0.15, 0.2)
+LENGTH_BUCKETS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+
+# ==============================================
+# METRIC TYPES
+# ==============================================
+def _label_key(labelnames, labels):
+    if set(labels) != set(labelnames):
+        raise ValueError(f"Expected labels {labelnames}, got {tuple(labels)}")
+    return tuple(str(labels[name]) for name in labelnames)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames, key, extra=None):
+    pairs = list(zip(labelnames, key))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    body = ",".join(f'{name}="{_escape(value)}"' for name, value in pairs)
+    return "{" + body + "}"
+
+
+class Counter:
+    """Monotonically increasing count, optionally split by labels."""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = self._values or ({(): 0} if not self.labelnames else {})
+            for key, value in sorted(values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """Fixed-bucket histogram with sum and count, optionally split by labels."""
+
+    def __init__(self, name, documentation, buckets, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket (non-cumulative) counts plus +Inf, sum
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    labels = _format_labels(self.labelnames, key, ("le", le))
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {total}")
+                lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Ordered collection of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+# ==============================================
+# APPLICATION METRICS
+# ==============================================
+REGISTRY = Registry()
+
+STAGE_LATENCY = REGISTRY.register(Histogram(
+    "fakenews_stage_latency_seconds",
+    "Latency of each analysis stage (load_model, preprocess, tokenize, inference, render, explain, feed_batch).",
+    LATENCY_BUCKETS, labelnames=("stage",),
+))
+DECISIONS = REGISTRY.register(Counter(
+    "fakenews_decisions_total",
+    "Analyses by Real/Fake/Uncertain decision.",
+    labelnames=("decision",),
+))
+CONFIDENCE_MARGIN = REGISTRY.register(Histogram(
+    "fakenews_confidence_margin",
+    f"Confidence minus the decision threshold ({CONFIDENCE_THRESHOLD}); negative means Uncertain.",
+    MARGIN_BUCKETS, labelnames=("decision",),
+))
+INPUT_CHARS = REGISTRY.register(Histogram(
+    "fakenews_input_chars",
+    "Input length in characters.",
+    LENGTH_BUCKETS,
+))
+INPUT_TOKENS = REGISTRY.register(Histogram(
+    "fakenews_input_tokens",
+    "Input length in tokens.",
+    TOKEN_BUCKETS,
+))
+CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "fakenews_cache_lookups_total",
+    "Prediction cache lookups by result.",
+    labelnames=("result",),
+))
+ERRORS = REGISTRY.register(Counter(
+    "fakenews_errors_total",
+    "Errors by stage.",
+    labelnames=("stage",),
+))
+REJECTED = REGISTRY.register(Counter(
+    "fakenews_rejected_requests_total",
+    "Requests shed with HTTP 429 by admission control.",
+))
+FEED_ITEMS = REGISTRY.register(Counter(
+    "fakenews_feed_items_total",
+    "Feed monitor items by outcome (classified, duplicate, shed, malformed, failed).",
+    labelnames=("result",),
+))
+FEED_ALERTS = REGISTRY.register(Counter(
+    "fakenews_feed_alerts_total",
+    "Feed monitor Fake-rate alerts by source.",
+    labelnames=("source",),
+))
+
+
+def render():
+    """Current metrics in the Prometheus text exposition format."""
+    return REGISTRY.render()
+
+
+def record_decision(decision, confidence, threshold=CONFIDENCE_THRESHOLD):
+    DECISIONS.inc(decision=decision)
+    CONFIDENCE_MARGIN.observe(confidence - threshold, decision=decision)
+
+
+def record_input(n_chars, n_tokens=None):
+    INPUT_CHARS.observe(n_chars)
+    if n_tokens is not None:
+        INPUT_TOKENS.observe(n_tokens)
+
+
+def record_cache(hit):
+    CACHE_LOOKUPS.inc(result="hit" if hit else "miss")
+
+# ==============================================
+# REQUEST TRACING
+# ==============================================
+class TraceLog:
+    """Append-only JSONL trace log shared by all requests."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class RequestTrace:
+    """
+    Stage timer for one analysis.
+
+    Every ``stage()`` block feeds the latency histogram (and the error
+    counter if it raises); when a trace log is configured ``finish()``
+    writes the collected timings as one JSON line.
+    """
+
+    def __init__(self, trace_log=None, source="app"):
+        self.trace_log = trace_log
+        self.record = {
+            "id": uuid.uuid4().hex,
+            "source": source,
+            "started": time.time(),
+            "stages_ms": {},
+        }
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            ERRORS.inc(stage=name)
+            self.record["error_stage"] = name
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            STAGE_LATENCY.observe(elapsed, stage=name)
+            self.record["stages_ms"][name] = round(elapsed * 1000.0, 3)
+
+    def annotate(self, **fields):
+        self.record.update(fields)
+
+    def finish(self):
+        if self.trace_log is not None:
+            self.trace_log.write(self.record)
+
+# ==============================================
+# STANDALONE METRICS ENDPOINT
+# ==============================================
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes every few seconds would otherwise flood stderr
+        pass
+
+
+def start_metrics_server(port, host="0.0.0.0"):
+    """Serve ``/metrics`` from a daemon thread; returns the server object."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True)
+    thread.start()
+    return server
@@ -0,0 +1,671 @@
+"""
+Long-running feed monitor: watch an input source, classify, aggregate.
+
+Items are JSON objects with a text and optionally an id, a source name
+and a publication time. They arrive from either
+
+    a spool directory  JSONL files dropped or appended to by the feed;
+                       complete lines are tailed and the read offsets are
+                       kept in the directory, so a restart resumes
+    a local socket     newline-delimited JSON over TCP, a stand-in for a
+                       message queue
+
+Each item is preprocessed, deduplicated (same source and id, or the
+same normalized text, within a bounded memory) and queued. One classifier
+thread drains the queue in batches bounded by size and wait time, so an
+item's latency is capped on a quiet feed and batches fill up on a busy
+one. Decisions feed rolling per-source windows (Fake rate per source per
+hour by default); a window whose Fake rate crosses the alert rule fires
+one alert. When the feed outpaces inference the bounded queue either
+blocks the sources (spool files wait on disk, socket producers stall on
+TCP) or sheds new items, counted.
+
+``Monitor.snapshot()`` is the dashboard view: counters, queue depth,
+latency percentiles, current windows and recent alerts. It is printed as
+a live table with ``--dashboard`` and written to ``--state`` for the
+Streamlit app's Feed Monitor section.
+
+Usage:
+    python monitor.py --spool feeds/incoming --dashboard
+    python monitor.py --listen 127.0.0.1:9200 --state monitor_state.json --alerts alerts.jsonl
+    python monitor.py --spool feeds/incoming --overflow shed --alert-fake-rate 0.4 --decisions decisions.jsonl
+"""
+import argparse
+import glob
+import hashlib
+import json
+import logging
+import os
+import queue
+import socketserver
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from datetime import datetime, timezone
+
+from inference import DECISION_LABELS, MODEL_PATH, apply_temperature, decide, extract_probabilities, model_revision
+from metrics import FEED_ALERTS, FEED_ITEMS, STAGE_LATENCY, TraceLog, record_decision
+from prediction_cache import normalize_arabic
+from preprocessing import DEFAULT_PREPROCESSOR
+from registry import prediction_version
+
+logger = logging.getLogger("monitor")
+
+# ==============================================
+# CONFIGURATION
+# ==============================================
+DEFAULT_MAX_BATCH_SIZE = 32
+DEFAULT_MAX_WAIT_MS = 500          # longest an item waits for its batch to fill
+DEFAULT_MAX_QUEUE = 1024           # items accepted but not yet classified
+OVERFLOW_POLICIES = ("block", "shed")
+DEFAULT_WINDOW_SECONDS = 3600
+DEFAULT_RETENTION_WINDOWS = 48
+DEFAULT_DEDUP_MEMORY = 200_000     # recent ids/text hashes remembered for deduplication
+DEFAULT_ALERT_FAKE_RATE = 0.5
+DEFAULT_ALERT_MIN_ITEMS = 20       # a window needs this many items before it can alert
+SPOOL_POLL_SECONDS = 1.0
+SPOOL_OFFSETS_NAME = ".monitor-offsets.json"
+SNAPSHOT_INTERVAL_SECONDS = 2.0
+LATENCY_SAMPLES = 2000
+RECENT_ALERTS = 50
+ALL_SOURCES = "*"
+
+# ==============================================
+# FEED ITEMS
+# ==============================================
+class FeedItem:
+    """One incoming article and the time it was accepted."""
+
+    __slots__ = ("id", "source", "text", "timestamp", "received")
+
+    def __init__(self, item_id, source, text, timestamp, received):
+        self.id = item_id
+        self.source = source
+        self.text = text
+        self.timestamp = timestamp
+        self.received = received
+
+
+def parse_timestamp(value, default):
+    """Epoch seconds from a number or an ISO 8601 string; ``default`` otherwise."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return default
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+    return default
+
+
+def parse_item(record, text_field="text", id_field="id", source_field="source", time_field="published"):
+    """
+    Build a ``FeedItem`` from a decoded JSON record.
+
+    Raises:
+        ValueError: When the record is not an object or has no text
+    """
+    if not isinstance(record, dict):
+        raise ValueError("Feed item must be a JSON object")
+    text = record.get(text_field)
+    if not isinstance(text, str) or not text.strip():
+        raise ValueError(f"Feed item has no '{text_field}' text")
+    received = time.time()
+    item_id = record.get(id_field)
+    return FeedItem(
+        None if item_id is None else str(item_id),
+        str(record.get(source_field) or "unknown"),
+        text,
+        parse_timestamp(record.get(time_field), received),
+        received,
+    )
+
+
+class RecentSet:
+    """Set remembering only the most recent ``max_entries`` keys."""
+
+    def __init__(self, max_entries=DEFAULT_DEDUP_MEMORY):
+        self.max_entries = max_entries
+        self._keys = OrderedDict()
+
+    def add(self, key):
+        """Remember ``key``; returns False if it was already present."""
+        if key in self._keys:
+            self._keys.move_to_end(key)
+            return False
+        self._keys[key] = None
+        if len(self._keys) > self.max_entries:
+            self._keys.popitem(last=False)
+        return True
+
+    def __len__(self):
+        return len(self._keys)
+
+# ==============================================
+# WINDOWED AGGREGATES AND ALERTS
+# ==============================================
+class WindowedAggregates:
+    """
+    Decision counts per source per fixed time window.
+
+    Every decision is also counted under ``ALL_SOURCES``. Windows more
+    than ``retention_windows`` behind the newest one are dropped.
+    """
+
+    def __init__(self, window_seconds=DEFAULT_WINDOW_SECONDS, retention_windows=DEFAULT_RETENTION_WINDOWS):
+        self.window_seconds = window_seconds
+        self.retention_windows = retention_windows
+        self._windows = {}
+        self._newest = 0
+
+    def window_start(self, timestamp):
+        return int(timestamp // self.window_seconds) * self.window_seconds
+
+    def add(self, source, timestamp, decision):
+        """Count a decision; returns the ``(source, window_start)`` keys touched."""
+        start = self.window_start(timestamp)
+        keys = [(source, start), (ALL_SOURCES, start)]
+        for key in keys:
+            self._windows.setdefault(key, Counter())[decision] += 1
+        if start > self._newest:
+            self._newest = start
+            horizon = start - self.retention_windows * self.window_seconds
+            self._windows = {key: counts for key, counts in self._windows.items() if key[1] > horizon}
+        return keys
+
+    def summary(self, key):
+        counts = self._windows.get(key, Counter())
+        total = sum(counts.values())
+        return {
+            "source": key[0],
+            "window_start": key[1],
+            "total": total,
+            "real": counts["real"],
+            "fake": counts["fake"],
+            "uncertain": counts["uncertain"],
+            "fake_rate": counts["fake"] / total if total else 0.0,
+        }
+
+    def rows(self, latest_only=False):
+        """Window summaries, newest first; ``latest_only`` keeps each source's newest."""
+        keys = sorted(self._windows, key=lambda key: (-key[1], key[0]))
+        if latest_only:
+            seen = set()
+            keys = [key for key in keys if not (key[0] in seen or seen.add(key[0]))]
+        return [self.summary(key) for key in keys]
+
+
+class AlertRule:
+    """
+    Fire once per source window whose Fake rate reaches ``fake_rate``.
+
+    Args:
+        fake_rate: Fake share of a window's decisions that triggers an alert
+        min_items: Decisions a window needs before it is judged
+    """
+
+    def __init__(self, fake_rate=DEFAULT_ALERT_FAKE_RATE, min_items=DEFAULT_ALERT_MIN_ITEMS):
+        self.fake_rate = fake_rate
+        self.min_items = min_items
+        self._fired = set()
+
+    def check(self, summary):
+        """Alert dict for a window summary that newly crossed the rule, else None."""
+        key = (summary["source"], summary["window_start"])
+        if summary["total"] < self.min_items or summary["fake_rate"] < self.fake_rate or key in self._fired:
+            return None
+        self._fired.add(key)
+        return {
+            "time": time.time(),
+            "source": summary["source"],
+            "window_start": summary["window_start"],
+            "fake_rate": summary["fake_rate"],
+            "fake": summary["fake"],
+            "total": summary["total"],
+            "rule": {"fake_rate": self.fake_rate, "min_items": self.min_items},
+        }
+
+# ==============================================
+# MONITOR
+# ==============================================
+class Monitor:
+    """
+    Deduplicate, queue, batch-classify and aggregate feed items.
+
+    Args:
+        classifier: Pipeline from ``build_classifier()`` (or compatible)
+        threshold: Confidence threshold for Real/Fake vs Uncertain
+        temperature: Calibration temperature applied before the threshold
+        preprocessor: Optional ``Preprocessor`` run before deduplication
+        max_batch_size: Items per forward pass
+        max_wait_ms: Longest the first item of a batch waits for more
+        max_queue: Items accepted but not yet classified
+        overflow: "block" stalls the sources when the queue is full,
+            "shed" drops new items
+        aggregates: ``WindowedAggregates`` receiving every decision
+        alert_rule: Optional ``AlertRule``
+        alert_log: Optional ``TraceLog`` receiving one line per alert
+        decision_log: Optional ``TraceLog`` receiving one line per item
+    """
+
+    def __init__(self, classifier, threshold, temperature=1.0, preprocessor=DEFAULT_PREPROCESSOR,
+                 max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait_ms=DEFAULT_MAX_WAIT_MS,
+                 max_queue=DEFAULT_MAX_QUEUE, overflow="block", aggregates=None, alert_rule=None,
+                 alert_log=None, decision_log=None, dedup_memory=DEFAULT_DEDUP_MEMORY):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy {overflow!r}; expected one of {OVERFLOW_POLICIES}")
+        self.classifier = classifier
+        self.threshold = threshold
+        self.temperature = temperature
+        self.preprocessor = preprocessor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.overflow = overflow
+        self.aggregates = aggregates or WindowedAggregates()
+        self.alert_rule = alert_rule
+        self.alert_log = alert_log
+        self.decision_log = decision_log
+        self.revision = model_revision(classifier)
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._seen = RecentSet(dedup_memory)
+        self._counts = Counter()
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self._alerts = deque(maxlen=RECENT_ALERTS)
+        self._peak_queue_depth = 0
+        self.started = time.time()
+        self.stopping = threading.Event()
+        self._worker = threading.Thread(target=self._run, name="feed-monitor", daemon=True)
+        self._worker.start()
+
+    # ----------------------------------------------
+    # Intake
+    # ----------------------------------------------
+    def offer(self, item):
+        """
+        Accept one item from a source.
+
+        Returns:
+            "queued", "duplicate" or "shed"
+        """
+        if self.preprocessor is not None:
+            item.text = self.preprocessor(item.text)
+        text_hash = hashlib.sha1(normalize_arabic(item.text).encode("utf-8")).hexdigest()
+        with self._lock:
+            self._counts["received"] += 1
+            new_id = item.id is None or self._seen.add(("id", item.source, item.id))
+            new_text = self._seen.add(("text", text_hash))
+            if not (new_id and new_text):
+                return self._count("duplicate")
+
+        queued = self._put(item)
+        with self._lock:
+            if not queued:
+                return self._count("shed")
+            self._peak_queue_depth = max(self._peak_queue_depth, self._queue.qsize())
+            return "queued"
+
+    def _put(self, item):
+        try:
+            self._queue.put_nowait(item)
+            return True
+        except queue.Full:
+            if self.overflow == "shed":
+                return False
+            with self._lock:
+                self._counts["blocked"] += 1
+        # Waits in short steps so stop() is never stuck behind a full queue
+        while not self.stopping.is_set():
+            try:
+                self._queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def malformed(self, reason):
+        logger.debug("Skipping malformed feed item: %s", reason)
+        with self._lock:
+            self._count("malformed")
+
+    def _count(self, result):
+        self._counts[result] += 1
+        FEED_ITEMS.inc(result=result)
+        return result
+
+    # ----------------------------------------------
+    # Classification
+    # ----------------------------------------------
+    def _collect_batch(self):
+        """Block for one item, then gather more until full or the wait runs out."""
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not (self.stopping.is_set() and self._queue.empty()):
+            batch = self._collect_batch()
+            if not batch:
+                continue
+            try:
+                self._classify(batch)
+            except Exception:
+                logger.exception("Classifying a batch of %d feed items failed", len(batch))
+                with self._lock:
+                    self._counts["failed"] += len(batch)
+                FEED_ITEMS.inc(len(batch), result="failed")
+
+    def _classify(self, batch):
+        start = time.perf_counter()
+        outputs = self.classifier([item.text for item in batch], batch_size=len(batch))
+        STAGE_LATENCY.observe(time.perf_counter() - start, stage="feed_batch")
+        now = time.time()
+
+        alerts = []
+        with self._lock:
+            for item, output in zip(batch, outputs):
+                prob_real, prob_fake = apply_temperature(*extract_probabilities(output), self.temperature)
+                decision, confidence = decide(prob_real, prob_fake, self.threshold)
+                record_decision(decision, confidence, self.threshold)
+                self._count("classified")
+                self._latencies.append(now - item.received)
+                for key in self.aggregates.add(item.source, item.timestamp, decision):
+                    alert = self.alert_rule.check(self.aggregates.summary(key)) if self.alert_rule else None
+                    if alert is not None:
+                        alerts.append(alert)
+                        self._alerts.append(alert)
+                if self.decision_log is not None:
+                    self.decision_log.write({
+                        "id": item.id,
+                        "source": item.source,
+                        "published": item.timestamp,
+                        "decision": DECISION_LABELS[decision],
+                        "prob_real": round(prob_real, 6),
+                        "prob_fake": round(prob_fake, 6),
+                        "confidence": round(confidence, 6),
+                        "latency_ms": round((now - item.received) * 1000.0, 1),
+                        "model_version": prediction_version(output) or self.revision,
+                    })
+
+        for alert in alerts:
+            FEED_ALERTS.inc(source=alert["source"])
+            logger.warning(
+                "ALERT %s: Fake rate %.0f%% (%d of %d) in window starting %s",
+                alert["source"], 100 * alert["fake_rate"], alert["fake"], alert["total"],
+                datetime.fromtimestamp(alert["window_start"], timezone.utc).isoformat(),
+            )
+            if self.alert_log is not None:
+                self.alert_log.write(alert)
+
+    # ----------------------------------------------
+    # Dashboard
+    # ----------------------------------------------
+    def snapshot(self):
+        """Dashboard view of the monitor's state as a JSON-serialisable dict."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            counts = dict(self._counts)
+            windows = self.aggregates.rows(latest_only=True)
+            alerts = list(self._alerts)[::-1]
+            peak = self._peak_queue_depth
+
+        def percentile(q):
+            return 1000.0 * latencies[min(len(latencies) - 1, int(q * len(latencies)))] if latencies else 0.0
+
+        return {
+            "updated": time.time(),
+            "started": self.started,
+            "counts": counts,
+            "queue_depth": self._queue.qsize(),
+            "max_queue": self._queue.maxsize,
+            "peak_queue_depth": peak,
+            "overflow": self.overflow,
+            "latency_ms": {"p50": percentile(0.50), "p95": percentile(0.95), "max": percentile(1.0)},
+            "threshold": self.threshold,
+            "window_seconds": self.aggregates.window_seconds,
+            "windows": windows,
+            "alerts": alerts,
+        }
+
+    def stop(self, timeout=None):
+        """Stop accepting items, classify what is queued and join the worker."""
+        self.stopping.set()
+        self._worker.join(timeout)
+
+# ==============================================
+# SOURCES
+# ==============================================
+class SpoolDirectory:
+    """
+    Tail every ``*.jsonl`` file in a directory.
+
+    Only newline-terminated lines are consumed, so a writer may append
+    to a file while it is read. Byte offsets are saved next to the files
+    after each pass; items are at-least-once across restarts and the
+    monitor's deduplication absorbs the replays.
+    """
+
+    def __init__(self, directory, pattern="*.jsonl", poll_seconds=SPOOL_POLL_SECONDS, **fields):
+        self.directory = directory
+        self.pattern = pattern
+        self.poll_seconds = poll_seconds
+        self.fields = fields
+        self.offsets_path = os.path.join(directory, SPOOL_OFFSETS_NAME)
+        self.offsets = {}
+        if os.path.isfile(self.offsets_path):
+            with open(self.offsets_path, "r", encoding="utf-8") as f:
+                self.offsets = json.load(f)
+
+    def poll(self, monitor):
+        """Read new complete lines from every file; returns the number of lines read."""
+        lines = 0
+        for path in sorted(glob.glob(os.path.join(self.directory, self.pattern))):
+            name = os.path.basename(path)
+            offset = self.offsets.get(name, 0)
+            if os.path.getsize(path) < offset:
+                offset = 0  # truncated or replaced
+            with open(path, "rb") as f:
+                f.seek(offset)
+                for raw in iter(f.readline, b""):
+                    if not raw.endswith(b"\n") or monitor.stopping.is_set():
+                        break
+                    offset += len(raw)
+                    lines += 1
+                    if not raw.strip():
+                        continue
+                    try:
+                        monitor.offer(parse_item(json.loads(raw), **self.fields))
+                    except ValueError as e:
+                        monitor.malformed(e)
+            self.offsets[name] = offset
+        if lines:
+            self._save_offsets()
+        return lines
+
+    def _save_offsets(self):
+        tmp_path = self.offsets_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.offsets, f)
+        os.replace(tmp_path, self.offsets_path)
+
+    def run(self, monitor):
+        while not monitor.stopping.is_set():
+            if not self.poll(monitor):
+                monitor.stopping.wait(self.poll_seconds)
+
+
+class SocketSource:
+    """
+    Accept newline-delimited JSON items over local TCP connections.
+
+    Each connection is read by its own thread; while the monitor's queue
+    is full under the "block" policy that thread stops reading and TCP
+    flow control pushes back on the producer.
+    """
+
+    def __init__(self, host, port, **fields):
+        self.host = host
+        self.port = port
+        self.fields = fields
+
+    def run(self, monitor):
+        fields = self.fields
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for raw in self.rfile:
+                    if monitor.stopping.is_set():
+                        break
+                    if not raw.strip():
+                        continue
+                    try:
+                        monitor.offer(parse_item(json.loads(raw), **fields))
+                    except ValueError as e:
+                        monitor.malformed(e)
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        with socketserver.ThreadingTCPServer((self.host, self.port), Handler) as server:
+            server.daemon_threads = True
+            threading.Thread(target=lambda: (monitor.stopping.wait(), server.shutdown()), daemon=True).start()
+            logger.info("Listening for feed items on %s:%d", self.host, self.port)
+            server.serve_forever(poll_interval=0.5)
+
+# ==============================================
+# DASHBOARD OUTPUT
+# ==============================================
+def write_snapshot(path, snapshot):
+    """Atomically replace the state file read by the Streamlit dashboard."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def format_dashboard(snapshot):
+    """Plain-text dashboard of a snapshot for the terminal."""
+    counts = Counter(snapshot["counts"])
+    latency = snapshot["latency_ms"]
+    lines = [
+        f"Feed monitor | up {time.time() - snapshot['started']:.0f}s | threshold {snapshot['threshold']:.2f}",
+        f"received {counts['received']}  classified {counts['classified']}  duplicates {counts['duplicate']}  "
+        f"shed {counts['shed']}  blocked {counts['blocked']}  malformed {counts['malformed']}  failed {counts['failed']}",
+        f"queue {snapshot['queue_depth']}/{snapshot['max_queue']} (peak {snapshot['peak_queue_depth']}, "
+        f"{snapshot['overflow']})  latency p50 {latency['p50']:.0f}ms p95 {latency['p95']:.0f}ms",
+        "",
+        f"{'source':<24} {'window (UTC)':<17} {'items':>6} {'fake':>6} {'fake %':>7}",
+    ]
+    for row in snapshot["windows"]:
+        start = datetime.fromtimestamp(row["window_start"], timezone.utc).strftime("%Y-%m-%d %H:%M")
+        lines.append(
+            f"{row['source'][:24]:<24} {start:<17} {row['total']:>6} {row['fake']:>6} {row['fake_rate']:>7.1%}"
+        )
+    if snapshot["alerts"]:
+        lines.append("")
+        for alert in snapshot["alerts"][:5]:
+            lines.append(f"ALERT {alert['source']}: {alert['fake_rate']:.0%} Fake ({alert['fake']}/{alert['total']})")
+    return "\n".join(lines)
+
+# ==============================================
+# COMMAND-LINE ENTRY POINT
+# ==============================================
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Classify a continuous news feed and aggregate decisions.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--spool", help="Directory of JSONL files to tail")
+    source.add_argument("--listen", help="host:port accepting newline-delimited JSON items")
+    parser.add_argument("--text-field", default="text")
+    parser.add_argument("--id-field", default="id")
+    parser.add_argument("--source-field", default="source")
+    parser.add_argument("--time-field", default="published",
+                        help="Epoch seconds or ISO 8601 time; arrival time when absent")
+    parser.add_argument("--model-path", default=MODEL_PATH)
+    parser.add_argument("--threshold", type=float, default=None)
+    parser.add_argument("--calibration", default=None,
+                        help="Calibration JSON written by `python calibration.py fit`")
+    parser.add_argument("--no-preprocess", action="store_true")
+    parser.add_argument("--max-batch-size", type=int, default=DEFAULT_MAX_BATCH_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=DEFAULT_MAX_WAIT_MS)
+    parser.add_argument("--max-queue", type=int, default=DEFAULT_MAX_QUEUE)
+    parser.add_argument("--overflow", choices=OVERFLOW_POLICIES, default="block",
+                        help="When the queue is full: stall the sources or drop new items")
+    parser.add_argument("--window-seconds", type=int, default=DEFAULT_WINDOW_SECONDS)
+    parser.add_argument("--alert-fake-rate", type=float, default=DEFAULT_ALERT_FAKE_RATE)
+    parser.add_argument("--alert-min-items", type=int, default=DEFAULT_ALERT_MIN_ITEMS)
+    parser.add_argument("--alerts", default=None, help="Append one JSON line per alert to this file")
+    parser.add_argument("--decisions", default=None, help="Append one JSON line per classified item")
+    parser.add_argument("--state", default=None, help="Dashboard state file for the Streamlit app")
+    parser.add_argument("--dashboard", action="store_true", help="Redraw a dashboard in the terminal")
+    parser.add_argument("--metrics-port", type=int, default=None, help="Serve Prometheus /metrics here")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    from calibration import load_calibration
+    from inference import build_classifier
+    from metrics import start_metrics_server
+
+    calibration = load_calibration(args.calibration)
+    if args.metrics_port:
+        start_metrics_server(args.metrics_port)
+    monitor = Monitor(
+        build_classifier(args.model_path),
+        threshold=args.threshold if args.threshold is not None else calibration["threshold"],
+        temperature=calibration["temperature"],
+        preprocessor=None if args.no_preprocess else DEFAULT_PREPROCESSOR,
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+        max_queue=args.max_queue,
+        overflow=args.overflow,
+        aggregates=WindowedAggregates(args.window_seconds),
+        alert_rule=AlertRule(args.alert_fake_rate, args.alert_min_items),
+        alert_log=TraceLog(args.alerts) if args.alerts else None,
+        decision_log=TraceLog(args.decisions) if args.decisions else None,
+    )
+    fields = {
+        "text_field": args.text_field,
+        "id_field": args.id_field,
+        "source_field": args.source_field,
+        "time_field": args.time_field,
+    }
+    if args.spool:
+        feed = SpoolDirectory(args.spool, **fields)
+    else:
+        host, port = args.listen.rsplit(":", 1)
+        feed = SocketSource(host, int(port), **fields)
+    threading.Thread(target=feed.run, args=(monitor,), name="feed-source", daemon=True).start()
+
+    try:
+        while True:
+            time.sleep(SNAPSHOT_INTERVAL_SECONDS)
+            snapshot = monitor.snapshot()
+            if args.state:
+                write_snapshot(args.state, snapshot)
+            if args.dashboard:
+                sys.stdout.write("\x1b[2J\x1b[H" + format_dashboard(snapshot) + "\n")
+                sys.stdout.flush()
+    except KeyboardInterrupt:
+        logger.info("Stopping; classifying %d queued items", monitor.snapshot()["queue_depth"])
+        monitor.stop()
+        if args.state:
+            write_snapshot(args.state, monitor.snapshot())
+
+
+if __name__ == "__main__":
+    main()
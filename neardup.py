@@ -0,0 +1,396 @@
+"""
+Near-duplicate index over previously classified texts.
+
+Recycled fake stories circulate in lightly edited variants (a changed
+number, an added sentence, different diacritics). Each text is reduced
+to MinHash signatures of its normalized Arabic character shingles and
+indexed with banded locality-sensitive hashing, so a new text is compared
+only against the few stored texts that share a band. When the estimated
+Jaccard similarity of the best candidate reaches the threshold, its
+stored verdict is reused instead of running the transformer.
+
+The index is incrementally updatable and optionally persisted to SQLite.
+Like the prediction cache it is bounded: entries older than a TTL are
+ignored and the least recently matched are evicted past ``max_entries``.
+``evaluate`` measures recall and latency against exact Jaccard search.
+
+Usage:
+    python neardup.py evaluate --data articles.jsonl --limit 2000 --threshold 0.8
+"""
+import argparse
+import json
+import random
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict, defaultdict
+from itertools import islice
+
+import numpy as np
+
+from prediction_cache import normalize_arabic
+
+# ==============================================
+# CONFIGURATION
+# ==============================================
+SHINGLE_SIZE = 5
+NUM_PERM = 128
+BANDS = 16                    # 16 bands x 8 rows: candidate threshold ~0.71
+DEFAULT_THRESHOLD = 0.85
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DISK_PRUNE_INTERVAL = 500
+EXCERPT_CHARS = 160
+_PRIME = 4294967291           # largest prime below 2**32
+_SEED = 1
+
+# ==============================================
+# MINHASH
+# ==============================================
+def shingles(text, size=SHINGLE_SIZE):
+    """Set of character ``size``-grams of the normalized text."""
+    normalized = normalize_arabic(text)
+    if len(normalized) <= size:
+        return {normalized} if normalized else set()
+    return {normalized[i:i + size] for i in range(len(normalized) - size + 1)}
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class MinHasher:
+    """Fixed random permutations ``(a * x + b) mod p`` over 32-bit shingle hashes."""
+
+    def __init__(self, num_perm=NUM_PERM, seed=_SEED):
+        rng = np.random.RandomState(seed)
+        # a < 2**31 and x < 2**32 keep a * x + b inside uint64
+        self.a = rng.randint(1, 2**31 - 1, size=num_perm, dtype=np.int64).astype(np.uint64)
+        self.b = rng.randint(0, 2**31 - 1, size=num_perm, dtype=np.int64).astype(np.uint64)
+        self.num_perm = num_perm
+
+    def signature(self, shingle_set):
+        if not shingle_set:
+            return np.full(self.num_perm, _PRIME, dtype=np.uint64)
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in shingle_set),
+            dtype=np.uint64, count=len(shingle_set)
+        )
+        permuted = (np.outer(hashes, self.a) + self.b) % np.uint64(_PRIME)
+        return permuted.min(axis=0)
+
+# ==============================================
+# INDEX
+# ==============================================
+class NearDuplicateIndex:
+    """
+    Thread-safe MinHash/LSH index of classified texts and their verdicts.
+
+    Args:
+        model_id: Identity of the model whose verdicts are stored; entries
+            of other models are ignored when a database is reopened
+        threshold: Minimum estimated Jaccard similarity for a match
+        db_path: Optional SQLite file for persistence across restarts
+        max_entries: Maximum number of in-memory (and on-disk) entries
+        ttl_seconds: Age after which an entry is no longer matched
+        bands: LSH bands (``NUM_PERM`` must be divisible by it)
+    """
+
+    def __init__(self, model_id, threshold=DEFAULT_THRESHOLD, db_path=None,
+                 max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS,
+                 num_perm=NUM_PERM, bands=BANDS):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.model_id = model_id
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm)
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()    # id -> (signature, entry), least recently matched first
+        self._buckets = [defaultdict(set) for _ in range(bands)]
+        self._next_id = 1
+        self._matches = 0
+        self._lookups = 0
+        self._evictions = 0
+        self._adds_since_prune = 0
+
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS near_duplicates ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " model TEXT NOT NULL,"
+                " variant TEXT NOT NULL,"
+                " signature BLOB NOT NULL,"
+                " prob_real REAL NOT NULL,"
+                " prob_fake REAL NOT NULL,"
+                " excerpt TEXT NOT NULL,"
+                " created REAL NOT NULL)"
+            )
+            self._db.commit()
+            self._prune_disk(time.time())
+            rows = self._db.execute(
+                "SELECT id, variant, signature, prob_real, prob_fake, excerpt, created"
+                " FROM near_duplicates WHERE model = ? ORDER BY id",
+                (model_id,)
+            )
+            for item_id, variant, blob, prob_real, prob_fake, excerpt, created in rows:
+                self._insert(
+                    np.frombuffer(blob, dtype=np.uint64),
+                    {
+                        "id": item_id,
+                        "variant": variant,
+                        "prob_real": prob_real,
+                        "prob_fake": prob_fake,
+                        "excerpt": excerpt,
+                        "created": created,
+                    },
+                )
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _band_keys(self, signature):
+        return [
+            signature[i * self.rows:(i + 1) * self.rows].tobytes()
+            for i in range(self.bands)
+        ]
+
+    def _expired(self, created, now):
+        return self.ttl_seconds is not None and now - created > self.ttl_seconds
+
+    def _insert(self, signature, entry):
+        item_id = entry["id"]
+        self._next_id = max(self._next_id, item_id + 1)
+        self._entries[item_id] = (signature, entry)
+        for band, key in enumerate(self._band_keys(signature)):
+            self._buckets[band][key].add(item_id)
+        while len(self._entries) > self.max_entries:
+            self._evict(next(iter(self._entries)))
+
+    def _evict(self, item_id):
+        signature, _ = self._entries.pop(item_id)
+        for band, key in enumerate(self._band_keys(signature)):
+            bucket = self._buckets[band][key]
+            bucket.discard(item_id)
+            if not bucket:
+                del self._buckets[band][key]
+        self._evictions += 1
+
+    def add(self, text, prob_real, prob_fake, variant=""):
+        """Index a scored text; returns the new entry's id."""
+        signature = self.hasher.signature(shingles(text))
+        now = time.time()
+        excerpt = text[:EXCERPT_CHARS]
+        with self._lock:
+            item_id = self._next_id
+            if self._db is not None:
+                cursor = self._db.execute(
+                    "INSERT INTO near_duplicates"
+                    " (model, variant, signature, prob_real, prob_fake, excerpt, created)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (self.model_id, variant, signature.tobytes(), prob_real, prob_fake, excerpt, now)
+                )
+                self._db.commit()
+                item_id = cursor.lastrowid
+                self._adds_since_prune += 1
+                if self._adds_since_prune >= DISK_PRUNE_INTERVAL:
+                    self._prune_disk(now)
+            self._insert(signature, {
+                "id": item_id,
+                "variant": variant,
+                "prob_real": prob_real,
+                "prob_fake": prob_fake,
+                "excerpt": excerpt,
+                "created": now,
+            })
+        return item_id
+
+    def candidates(self, signature):
+        """Ids of stored texts sharing at least one LSH band."""
+        found = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            found.update(self._buckets[band].get(key, ()))
+        return found
+
+    def query(self, text, variant=""):
+        """
+        Best stored near-duplicate of ``text`` at or above the threshold.
+
+        Returns:
+            Dict with the stored verdict, ``id``, ``excerpt`` and estimated
+            ``similarity``, or None when nothing is close enough
+        """
+        signature = self.hasher.signature(shingles(text))
+        now = time.time()
+        with self._lock:
+            self._lookups += 1
+            best, best_similarity = None, self.threshold
+            for item_id in self.candidates(signature):
+                stored, entry = self._entries[item_id]
+                if self._expired(entry["created"], now):
+                    self._evict(item_id)
+                    continue
+                if entry["variant"] != variant:
+                    continue
+                similarity = float(np.mean(stored == signature))
+                if similarity >= best_similarity:
+                    best, best_similarity = entry, similarity
+            if best is None:
+                return None
+            self._entries.move_to_end(best["id"])
+            self._matches += 1
+            return {**best, "similarity": best_similarity}
+
+    def _prune_disk(self, now):
+        """Drop expired rows and trim this model's rows to the newest ``max_entries``."""
+        if self.ttl_seconds is not None:
+            self._db.execute(
+                "DELETE FROM near_duplicates WHERE created < ?", (now - self.ttl_seconds,)
+            )
+        self._db.execute(
+            "DELETE FROM near_duplicates WHERE model = ? AND id NOT IN ("
+            " SELECT id FROM near_duplicates WHERE model = ? ORDER BY id DESC LIMIT ?)",
+            (self.model_id, self.model_id, self.max_entries)
+        )
+        self._db.commit()
+        self._adds_since_prune = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "evictions": self._evictions,
+                "lookups": self._lookups,
+                "matches": self._matches,
+                "match_rate": self._matches / self._lookups if self._lookups else 0.0,
+                "threshold": self.threshold,
+                "persistent": self._db is not None,
+            }
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+# ==============================================
+# EVALUATION AGAINST EXACT SEARCH
+# ==============================================
+def edit_variant(text, rng, edit_rate=0.05):
+    """Lightly edited copy: a few words dropped, duplicated or swapped."""
+    words = text.split()
+    edited = []
+    for word in words:
+        roll = rng.random()
+        if roll < edit_rate:
+            continue
+        if roll < 2 * edit_rate:
+            edited.append(word)
+        edited.append(word)
+    if len(edited) > 3 and rng.random() < 0.5:
+        i = rng.randrange(len(edited) - 1)
+        edited[i], edited[i + 1] = edited[i + 1], edited[i]
+    return " ".join(edited)
+
+
+def evaluate(texts, threshold=DEFAULT_THRESHOLD, queries=200, seed=0):
+    """
+    Index ``texts`` and compare LSH lookups with brute-force Jaccard search.
+
+    Queries are edited variants of random corpus texts. A query counts as
+    relevant when exact search finds a stored text at or above
+    ``threshold``; recall is the share of those the index also matches.
+
+    Returns:
+        Dict with recall, precision, and mean per-query latency of both
+        methods
+    """
+    rng = random.Random(seed)
+    index = NearDuplicateIndex("evaluation", threshold=threshold,
+                               max_entries=max(len(texts), 1), ttl_seconds=None)
+    corpus = [shingles(text) for text in texts]
+
+    start = time.perf_counter()
+    stored_shingles = {}
+    for text, text_shingles in zip(texts, corpus):
+        stored_shingles[index.add(text, 0.0, 0.0)] = text_shingles
+    build_seconds = time.perf_counter() - start
+
+    samples = [edit_variant(rng.choice(texts), rng) for _ in range(queries)]
+
+    relevant = retrieved = correct = 0
+    lsh_seconds = exact_seconds = 0.0
+    for query in samples:
+        start = time.perf_counter()
+        match = index.query(query)
+        lsh_seconds += time.perf_counter() - start
+
+        start = time.perf_counter()
+        query_shingles = shingles(query)
+        scores = [jaccard(query_shingles, stored) for stored in corpus]
+        best = max(range(len(scores)), key=scores.__getitem__)
+        exact_seconds += time.perf_counter() - start
+
+        is_relevant = scores[best] >= threshold
+        relevant += is_relevant
+        if match is not None:
+            retrieved += 1
+            # Correct when the match really is above threshold
+            correct += jaccard(query_shingles, stored_shingles[match["id"]]) >= threshold
+
+    return {
+        "corpus": len(texts),
+        "queries": queries,
+        "threshold": threshold,
+        "bands": index.bands,
+        "rows": index.rows,
+        "relevant": relevant,
+        "matched": retrieved,
+        "recall": correct / relevant if relevant else 1.0,
+        "precision": correct / retrieved if retrieved else 1.0,
+        "build_seconds": build_seconds,
+        "lsh_ms_per_query": lsh_seconds / queries * 1000.0,
+        "exact_ms_per_query": exact_seconds / queries * 1000.0,
+        "speedup": exact_seconds / lsh_seconds if lsh_seconds else 0.0,
+    }
+
+# ==============================================
+# COMMAND-LINE ENTRY POINT
+# ==============================================
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Near-duplicate index tools.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    evaluate_parser = subparsers.add_parser("evaluate", help="Recall and latency vs exact search")
+    evaluate_parser.add_argument("--data", required=True, help="CSV/JSONL file with a text column")
+    evaluate_parser.add_argument("--text-column", default="text")
+    evaluate_parser.add_argument("--limit", type=int, default=2000)
+    evaluate_parser.add_argument("--queries", type=int, default=200)
+    evaluate_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    evaluate_parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    from bulk import iter_records
+
+    args = parse_args(argv)
+    records = iter_records(args.data, text_column=args.text_column)
+    texts = [text for _, _, text in islice(records, args.limit)]
+    report = evaluate(texts, args.threshold, args.queries, args.seed)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,320 @@
+"""
+ONNX Runtime export and execution backend for the AraBERT classifier.
+
+``export`` converts the model to ONNX with dynamic batch and sequence
+axes. ``OnnxClassifier`` runs that graph with onnxruntime behind the same
+call interface and score structure as the transformers pipeline, so it
+can be dropped into the batching engine, bulk mode or the server.
+
+onnxruntime is an optional dependency (``pip install onnxruntime``) and
+is only imported when this backend is used.
+
+Usage:
+    python onnx_backend.py export --output models/arabert-onnx
+    python onnx_backend.py parity --onnx-path models/arabert-onnx --data labelled.csv
+    python onnx_backend.py benchmark --onnx-path models/arabert-onnx --data articles.jsonl
+    python -m pytest -q test_onnx_backend.py
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from itertools import islice
+from types import SimpleNamespace
+
+import numpy as np
+import torch
+from transformers import AutoConfig, AutoModelForSequenceClassification, AutoTokenizer
+
+from bulk import iter_records
+from inference import MAX_SEQUENCE_LENGTH, MODEL_PATH, build_classifier
+
+# ==============================================
+# CONFIGURATION
+# ==============================================
+ONNX_FILE_NAME = "model.onnx"
+ONNX_OPSET = 17
+PARITY_TOLERANCE = 1e-4
+BENCHMARK_BATCH_SIZES = (1, 8, 32)
+INPUT_NAMES = ("input_ids", "attention_mask", "token_type_ids")
+
+
+def _import_onnxruntime():
+    try:
+        import onnxruntime
+    except ImportError:
+        raise ImportError(
+            "The onnxruntime backend requires the 'onnxruntime' package "
+            "(pip install onnxruntime)"
+        )
+    return onnxruntime
+
+# ==============================================
+# EXPORT
+# ==============================================
+class _LogitsOnly(torch.nn.Module):
+    """Expose only the logits tensor so the exported graph has one output."""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, input_ids, attention_mask, token_type_ids=None):
+        return self.model(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            token_type_ids=token_type_ids,
+        ).logits
+
+
+def export_onnx(model_path, output_dir, opset=ONNX_OPSET):
+    """
+    Export a model to ``<output_dir>/model.onnx`` with dynamic axes.
+
+    The tokenizer and config are saved alongside so the directory is a
+    self-contained artifact for ``OnnxClassifier``.
+    """
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    model = AutoModelForSequenceClassification.from_pretrained(model_path)
+    model.eval()
+
+    # Two samples of different lengths so the tracer sees real padding
+    sample = tokenizer(
+        ["نص تجريبي قصير", "نص تجريبي أطول قليلاً لاختبار الحشو الديناميكي"],
+        padding=True,
+        return_tensors="pt",
+    )
+    input_names = [name for name in INPUT_NAMES if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["logits"] = {0: "batch"}
+
+    os.makedirs(output_dir, exist_ok=True)
+    # TorchScript-based exporter (dynamic_axes); the dynamo exporter would
+    # add onnxscript as a further dependency
+    with torch.no_grad():
+        torch.onnx.export(
+            _LogitsOnly(model),
+            tuple(sample[name] for name in input_names),
+            os.path.join(output_dir, ONNX_FILE_NAME),
+            input_names=input_names,
+            output_names=["logits"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            do_constant_folding=True,
+        )
+    tokenizer.save_pretrained(output_dir)
+    model.config.save_pretrained(output_dir)
+
+# ==============================================
+# EXECUTION BACKEND
+# ==============================================
+class OnnxModel:
+    """
+    Minimal model facade over an onnxruntime session.
+
+    Provides ``config``, ``device`` and a call returning an object with a
+    ``logits`` tensor, which is all the windowed inference path needs.
+    """
+
+    def __init__(self, onnx_dir, num_threads=None):
+        onnxruntime = _import_onnxruntime()
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+
+        self.session = onnxruntime.InferenceSession(
+            os.path.join(onnx_dir, ONNX_FILE_NAME),
+            sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        self.config = AutoConfig.from_pretrained(onnx_dir)
+        self.device = torch.device("cpu")
+
+    def run(self, features):
+        """Run the graph on numpy/tensor inputs and return numpy logits."""
+        input_ids = np.asarray(features["input_ids"], dtype=np.int64)
+        feeds = {}
+        for name in self.input_names:
+            if name in features:
+                feeds[name] = np.asarray(features[name], dtype=np.int64)
+            elif name == "token_type_ids":
+                # Single-segment inputs: padding helpers may omit segment ids
+                feeds[name] = np.zeros_like(input_ids)
+            else:
+                raise KeyError(f"Missing model input '{name}'")
+        return self.session.run(["logits"], feeds)[0]
+
+    def __call__(self, **features):
+        features = {name: value.cpu().numpy() for name, value in features.items()}
+        return SimpleNamespace(logits=torch.from_numpy(self.run(features)))
+
+
+class OnnxClassifier:
+    """
+    Drop-in replacement for the text-classification pipeline.
+
+    Calling it with a list of texts returns, for each text, the same list
+    of ``{"label", "score"}`` dicts (all labels, highest score first) as the
+    pipeline built by ``build_classifier()``.
+    """
+
+    def __init__(self, onnx_dir, num_threads=None):
+        self.tokenizer = AutoTokenizer.from_pretrained(onnx_dir)
+        self.model = OnnxModel(onnx_dir, num_threads=num_threads)
+        self.tokenizer.model_max_length = min(self.tokenizer.model_max_length, MAX_SEQUENCE_LENGTH)
+
+        # Configure label mapping
+        self.model.config.id2label = {0: "Real", 1: "Fake"}
+        self.model.config.label2id = {"Real": 0, "Fake": 1}
+
+    def __call__(self, texts, batch_size=None, truncation=True, **kwargs):
+        if isinstance(texts, str):
+            texts = [texts]
+        batch_size = batch_size or len(texts)
+        id2label = self.model.config.id2label
+
+        results = []
+        for i in range(0, len(texts), batch_size):
+            features = self.tokenizer(
+                texts[i:i + batch_size],
+                padding=True,
+                truncation=truncation,
+                max_length=MAX_SEQUENCE_LENGTH,
+                return_tensors="np",
+            )
+            logits = self.model.run(features)
+            logits = logits - logits.max(axis=-1, keepdims=True)
+            probs = np.exp(logits)
+            probs /= probs.sum(axis=-1, keepdims=True)
+            results.extend(
+                sorted(
+                    ({"label": id2label[j], "score": float(row[j])} for j in range(len(row))),
+                    key=lambda item: item["score"],
+                    reverse=True,
+                )
+                for row in probs
+            )
+        return results
+
+
+def build_onnx_classifier(onnx_dir, num_threads=None):
+    """Load an exported ONNX artifact directory as a classifier."""
+    return OnnxClassifier(onnx_dir, num_threads=num_threads)
+
+# ==============================================
+# PARITY CHECK AND BENCHMARK
+# ==============================================
+def check_parity(torch_classifier, onnx_classifier, texts, tolerance=PARITY_TOLERANCE):
+    """
+    Compare per-label probabilities from both backends on the same texts.
+
+    Returns:
+        Dict with the maximum absolute difference, whether it is within
+        ``tolerance`` and whether the score structures are identical
+    """
+    torch_outputs = torch_classifier(texts, batch_size=len(texts), truncation=True)
+    onnx_outputs = onnx_classifier(texts, batch_size=len(texts), truncation=True)
+
+    torch_scores = [{item["label"]: item["score"] for item in t} for t in torch_outputs]
+    onnx_scores = [{item["label"]: item["score"] for item in o} for o in onnx_outputs]
+    same_structure = len(torch_scores) == len(onnx_scores) and all(
+        t.keys() == o.keys() for t, o in zip(torch_scores, onnx_scores)
+    )
+
+    max_diff = max(
+        abs(t[label] - o.get(label, 0.0))
+        for t, o in zip(torch_scores, onnx_scores)
+        for label in t
+    )
+    return {
+        "samples": len(texts),
+        "same_structure": same_structure,
+        "max_abs_diff": max_diff,
+        "tolerance": tolerance,
+        "passed": same_structure and max_diff <= tolerance,
+    }
+
+
+def benchmark_backends(classifiers, texts, batch_sizes=BENCHMARK_BATCH_SIZES, repeats=3):
+    """
+    Measure texts/second for each backend at each batch size.
+
+    Args:
+        classifiers: Mapping of backend name to classifier
+        texts: Texts to classify (repeated to fill the largest batch)
+    """
+    report = {}
+    for name, classifier in classifiers.items():
+        report[name] = {}
+        for batch_size in batch_sizes:
+            sample = (texts * (batch_size // len(texts) + 1))[:batch_size]
+            classifier(sample, batch_size=batch_size)  # warmup
+            start = time.perf_counter()
+            for _ in range(repeats):
+                classifier(sample, batch_size=batch_size)
+            elapsed = time.perf_counter() - start
+            report[name][str(batch_size)] = {
+                "texts_per_s": batch_size * repeats / elapsed,
+                "ms_per_batch": elapsed / repeats * 1000.0,
+            }
+    return report
+
+# ==============================================
+# COMMAND-LINE ENTRY POINT
+# ==============================================
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="ONNX Runtime export and backend tools.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export = subparsers.add_parser("export", help="Export MODEL_PATH to ONNX")
+    export.add_argument("--model-path", default=MODEL_PATH)
+    export.add_argument("--output", required=True, help="Artifact directory to write")
+    export.add_argument("--opset", type=int, default=ONNX_OPSET)
+
+    for name, help_text in (("parity", "Check probability parity with PyTorch"),
+                            ("benchmark", "Compare throughput of both backends")):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument("--model-path", default=MODEL_PATH)
+        sub.add_argument("--onnx-path", required=True, help="Exported artifact directory")
+        sub.add_argument("--data", required=True, help="CSV/JSONL file with a text column")
+        sub.add_argument("--text-column", default="text")
+        sub.add_argument("--limit", type=int, default=64)
+        sub.add_argument("--threads", type=int, default=None)
+
+    subparsers.choices["parity"].add_argument("--tolerance", type=float, default=PARITY_TOLERANCE)
+    return parser.parse_args(argv)
+
+
+def _sample_texts(args):
+    records = iter_records(args.data, text_column=args.text_column)
+    return [text for _, _, text in islice(records, args.limit)]
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.command == "export":
+        export_onnx(args.model_path, args.output, opset=args.opset)
+        print(f"Exported ONNX model to {args.output}")
+        return
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    texts = _sample_texts(args)
+    torch_classifier = build_classifier(args.model_path)
+    onnx_classifier = build_onnx_classifier(args.onnx_path, num_threads=args.threads)
+
+    if args.command == "parity":
+        report = check_parity(torch_classifier, onnx_classifier, texts, args.tolerance)
+        print(json.dumps(report, indent=2))
+        sys.exit(0 if report["passed"] else 1)
+
+    report = benchmark_backends({"torch": torch_classifier, "onnxruntime": onnx_classifier}, texts)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
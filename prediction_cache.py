@@ -0,0 +1,205 @@
+"""
+Content-addressed prediction cache for repeated articles.
+
+Texts are normalized (diacritics, tatweel and letter variants unified,
+whitespace collapsed) and hashed together with the model identity, so the
+same story pasted with cosmetic differences hits the cache while a model
+swap invalidates every old entry. Entries live in an in-memory LRU with a
+TTL and can optionally be backed by a SQLite file that survives restarts.
+"""
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from preprocessing import TASHKEEL, TATWEEL
+
+# ==============================================
+# CONFIGURATION
+# ==============================================
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+DISK_PRUNE_INTERVAL = 500
+
+# ==============================================
+# ARABIC NORMALIZATION
+# ==============================================
+_NORMALIZE_TABLE = str.maketrans({
+    **{mark: None for mark in TASHKEEL},
+    TATWEEL: None,
+    "\u0623": "\u0627",  # أ -> ا
+    "\u0625": "\u0627",  # إ -> ا
+    "\u0622": "\u0627",  # آ -> ا
+    "\u0671": "\u0627",  # ٱ -> ا
+    "\u0649": "\u064A",  # ى -> ي
+    "\u0629": "\u0647",  # ة -> ه
+})
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_arabic(text):
+    """
+    Normalize Arabic text for cache lookups.
+
+    Strips tashkeel and tatweel, unifies alef/yaa/taa-marbuta forms and
+    collapses runs of whitespace.
+    """
+    return _WHITESPACE_RE.sub(" ", text.translate(_NORMALIZE_TABLE)).strip()
+
+
+def cache_key(text, model_path, model_revision, variant=""):
+    """
+    Hash normalized text together with the model identity.
+
+    Args:
+        text: Raw input text
+        model_path: Hub id or local path of the model
+        model_revision: Commit hash or other version marker of the weights
+        variant: Extra discriminator for settings that change the scores
+            (e.g. the long-document aggregation strategy)
+    """
+    payload = "\x00".join([model_path, str(model_revision), variant, normalize_arabic(text)])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+# ==============================================
+# PREDICTION CACHE
+# ==============================================
+class PredictionCache:
+    """
+    Thread-safe LRU/TTL cache of ``(prob_real, prob_fake)`` by content key.
+
+    Args:
+        max_entries: Maximum number of in-memory (and on-disk) entries
+        ttl_seconds: Age after which an entry is treated as missing
+        db_path: Optional SQLite file for persistence across restarts
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl_seconds=DEFAULT_TTL_SECONDS,
+                 db_path=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._puts_since_prune = 0
+
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS predictions ("
+                " key TEXT PRIMARY KEY,"
+                " prob_real REAL NOT NULL,"
+                " prob_fake REAL NOT NULL,"
+                " created REAL NOT NULL,"
+                " accessed REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS predictions_accessed ON predictions (accessed)"
+            )
+            self._db.commit()
+            self._prune_disk(time.time())
+
+    def _expired(self, created, now):
+        return self.ttl_seconds is not None and now - created > self.ttl_seconds
+
+    def get(self, key):
+        """Return cached ``(prob_real, prob_fake)`` or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                prob_real, prob_fake, created = entry
+                if not self._expired(created, now):
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return prob_real, prob_fake
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT prob_real, prob_fake, created FROM predictions WHERE key = ?",
+                    (key,)
+                ).fetchone()
+                if row is not None and not self._expired(row[2], now):
+                    self._db.execute(
+                        "UPDATE predictions SET accessed = ? WHERE key = ?", (now, key)
+                    )
+                    self._db.commit()
+                    self._remember(key, row[0], row[1], row[2])
+                    self._hits += 1
+                    self._disk_hits += 1
+                    return row[0], row[1]
+
+            self._misses += 1
+            return None
+
+    def put(self, key, prob_real, prob_fake):
+        """Store a prediction, evicting the least recently used entries."""
+        now = time.time()
+        with self._lock:
+            self._remember(key, prob_real, prob_fake, now)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?, ?)",
+                    (key, prob_real, prob_fake, now, now)
+                )
+                self._db.commit()
+                self._puts_since_prune += 1
+                if self._puts_since_prune >= DISK_PRUNE_INTERVAL:
+                    self._prune_disk(now)
+
+    def _remember(self, key, prob_real, prob_fake, created):
+        self._entries[key] = (prob_real, prob_fake, created)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _prune_disk(self, now):
+        """Drop expired rows and trim the table to ``max_entries`` by recency."""
+        if self.ttl_seconds is not None:
+            self._db.execute(
+                "DELETE FROM predictions WHERE created < ?", (now - self.ttl_seconds,)
+            )
+        self._db.execute(
+            "DELETE FROM predictions WHERE key NOT IN ("
+            " SELECT key FROM predictions ORDER BY accessed DESC LIMIT ?)",
+            (self.max_entries,)
+        )
+        self._db.commit()
+        self._puts_since_prune = 0
+
+    def stats(self):
+        """Hit/miss counters, hit rate and current size."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "persistent": self._db is not None,
+            }
+
+    def clear(self):
+        """Remove every entry from memory and disk."""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM predictions")
+                self._db.commit()
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,200 @@
+"""
+Arabic text preprocessing in front of the tokenizer.
+
+Pasted and scraped news carries material that costs tokens without
+carrying signal: URLs, emojis, diacritics, tatweel, letters stretched for
+emphasis and "اقرأ أيضاً"-style related-article lines. ``Preprocessor``
+removes the enabled kinds with one translation table and a handful of
+regexes compiled once, so a large batch is a tight loop of C-level
+string operations.
+
+Every entry point (app, server, bulk, offline tools) runs the same
+stage before cache lookup and tokenization, so the cache, the
+near-duplicate index and the model all see identical text.
+
+Usage:
+    python preprocessing.py --data articles.jsonl --limit 500
+"""
+import argparse
+import json
+import re
+from itertools import islice
+
+from inference import MODEL_PATH
+
+# ==============================================
+# CONFIGURATION
+# ==============================================
+PREPROCESS_STEPS = ("urls", "emoji", "diacritics", "tatweel", "boilerplate", "repeats")
+MAX_REPEAT = 2  # "جداااا" -> "جداا"; only Arabic letters are collapsed
+MAX_BOILERPLATE_CHARS = 120  # longer lines after a boilerplate opener are article text, not a link line
+
+TASHKEEL = (
+    [chr(c) for c in range(0x0610, 0x061B)]    # Quranic annotation signs
+    + [chr(c) for c in range(0x064B, 0x0660)]  # Harakat, tanween, shadda, sukun
+    + ["\u0670"]                              # Superscript alef
+    + [chr(c) for c in range(0x06D6, 0x06EE)]  # Quranic marks
+)
+TATWEEL = "\u0640"
+# Arabic letters (no tatweel, marks or Arabic-Indic digits), for a regex class
+ARABIC_LETTERS = "\u0621-\u063A\u0641-\u064A\u0671-\u06D3"
+
+_URL_RE = re.compile(r"(?:https?://|www\.)\S+|\S+@\S+\.\w+", re.IGNORECASE)
+_EMOJI_RE = re.compile(
+    "["
+    "\U0001F000-\U0001FAFF"  # pictographs, emoticons, transport, symbols & flags
+    "\u2600-\u27BF"          # miscellaneous symbols and dingbats
+    "\u2B00-\u2BFF"          # arrows, stars
+    "\uFE0E\uFE0F\u200D"     # variation selectors and zero-width joiner
+    "]+"
+)
+# Related-article and call-to-action lines, matched after diacritics are gone.
+# Only short lines of their own count: the line must end in a newline or
+# follow one, so a one-line record that opens with these words is kept.
+_BOILERPLATE_LINE = (
+    r"[ \t]*(?:"
+    r"[اأإ]قر[اأ][ \t]+(?:[اأ]يض[اً]*|المزيد)"
+    r"|شاهد[ \t]+(?:[اأ]يض[اً]*|الفيديو)"
+    r"|تابعونا[ \t]+على"
+    r"|للمزيد[ \t]+من"
+    r"|[اإ]ضغط[ \t]+هنا"
+    r"|read[ \t]+more"
+    r")[^\n]{0,%d}" % MAX_BOILERPLATE_CHARS
+)
+_BOILERPLATE_RE = re.compile(
+    r"^%s\n|\n%s\Z" % (_BOILERPLATE_LINE, _BOILERPLATE_LINE),
+    re.MULTILINE | re.IGNORECASE,
+)
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+class Preprocessor:
+    """
+    Configurable cleaning stage applied before cache lookup and tokenization.
+
+    Args:
+        steps: Subset of ``PREPROCESS_STEPS`` to apply (always in that
+            order); an empty tuple only collapses whitespace
+        max_repeat: Longest run of one Arabic letter kept by "repeats";
+            Latin text, digits and punctuation ("...", "!!!", "www") are
+            left alone
+    """
+
+    def __init__(self, steps=PREPROCESS_STEPS, max_repeat=MAX_REPEAT):
+        unknown = set(steps) - set(PREPROCESS_STEPS)
+        if unknown:
+            raise ValueError(f"Unknown preprocessing steps {sorted(unknown)}; expected {PREPROCESS_STEPS}")
+        self.steps = tuple(step for step in PREPROCESS_STEPS if step in steps)
+
+        deletions = []
+        if "diacritics" in self.steps:
+            deletions.extend(TASHKEEL)
+        if "tatweel" in self.steps:
+            deletions.append(TATWEEL)
+        self._table = str.maketrans({char: None for char in deletions}) if deletions else None
+        self._repeat_re = re.compile(r"([%s])\1{%d,}" % (ARABIC_LETTERS, max_repeat))
+        self._repeat_sub = "\\1" * max_repeat
+
+    def __call__(self, text):
+        original = text
+        steps = self.steps
+        if "urls" in steps:
+            text = _URL_RE.sub(" ", text)
+        if "emoji" in steps:
+            text = _EMOJI_RE.sub(" ", text)
+        if self._table is not None:
+            text = text.translate(self._table)
+        if "boilerplate" in steps:
+            text = _BOILERPLATE_RE.sub("", text)
+        if "repeats" in steps:
+            text = self._repeat_re.sub(self._repeat_sub, text)
+        text = _WHITESPACE_RE.sub(" ", text).strip()
+        # Never hand the model an empty text for a non-empty input
+        if not text:
+            return _WHITESPACE_RE.sub(" ", original).strip()
+        return text
+
+    def batch(self, texts):
+        return [self(text) for text in texts]
+
+
+DEFAULT_PREPROCESSOR = Preprocessor()
+
+
+def preprocess(text):
+    """Clean one text with the default steps."""
+    return DEFAULT_PREPROCESSOR(text)
+
+# ==============================================
+# TOKEN REDUCTION REPORT
+# ==============================================
+def token_reduction(tokenizer, texts, preprocessor=DEFAULT_PREPROCESSOR):
+    """
+    Token counts of each text before and after preprocessing.
+
+    Counts are untruncated, so savings beyond the 512-token model limit
+    (which shorten windowed long documents) are included.
+
+    Returns:
+        Dict with per-document counts and the overall reduction
+    """
+    cleaned = preprocessor.batch(texts)
+    before = [len(ids) for ids in tokenizer(list(texts), add_special_tokens=False)["input_ids"]]
+    after = [len(ids) for ids in tokenizer(cleaned, add_special_tokens=False)["input_ids"]]
+    documents = [
+        {"tokens_before": b, "tokens_after": a, "reduction": 1 - a / b if b else 0.0}
+        for b, a in zip(before, after)
+    ]
+    total_before, total_after = sum(before), sum(after)
+    return {
+        "texts": len(texts),
+        "steps": list(preprocessor.steps),
+        "tokens_before": total_before,
+        "tokens_after": total_after,
+        "reduction": 1 - total_after / total_before if total_before else 0.0,
+        "mean_document_reduction": (
+            sum(d["reduction"] for d in documents) / len(documents) if documents else 0.0
+        ),
+        "documents": documents,
+    }
+
+# ==============================================
+# COMMAND-LINE ENTRY POINT
+# ==============================================
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Report token savings of the Arabic preprocessing stage.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--text", help="Single text: print it cleaned")
+    source.add_argument("--data", help="CSV/JSONL file with a text column")
+    parser.add_argument("--text-column", default="text")
+    parser.add_argument("--limit", type=int, default=500)
+    parser.add_argument("--steps", default=",".join(PREPROCESS_STEPS),
+                        help="Comma-separated subset of: " + ", ".join(PREPROCESS_STEPS))
+    parser.add_argument("--model-path", default=MODEL_PATH, help="Tokenizer to count tokens with")
+    parser.add_argument("--per-document", action="store_true", help="Include every document's counts")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    preprocessor = Preprocessor(steps=tuple(step for step in args.steps.split(",") if step))
+
+    if args.text:
+        print(preprocessor(args.text))
+        return
+
+    from transformers import AutoTokenizer
+
+    from bulk import iter_records
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model_path)
+    records = iter_records(args.data, text_column=args.text_column)
+    texts = [text for _, _, text in islice(records, args.limit)]
+    report = token_reduction(tokenizer, texts, preprocessor)
+    if not args.per_document:
+        del report["documents"]
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
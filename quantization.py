@@ -0,0 +1,172 @@
+"""
+Dynamic INT8 quantization of the AraBERT classifier for CPU serving.
+
+Every ``torch.nn.Linear`` layer is replaced by a dynamically quantized
+INT8 equivalent (weights stored in INT8, activations quantized on the
+fly), which is where almost all of BERT's CPU time goes. The quantized
+model can be saved as a self-contained artifact directory and loaded
+again without re-quantizing.
+
+Usage:
+    python quantization.py quantize --output models/arabert-int8
+    python quantization.py compare --data labelled.csv --limit 500
+"""
+import argparse
+import json
+import os
+
+import torch
+from transformers import AutoConfig, AutoModelForSequenceClassification, AutoTokenizer
+
+from evaluation import compare_predictions, load_labelled_sample, predict_probabilities, serialized_size
+from inference import CONFIDENCE_THRESHOLD, MODEL_PATH, build_classifier, make_pipeline
+
+# ==============================================
+# CONFIGURATION
+# ==============================================
+QUANTIZED_WEIGHTS_NAME = "quantized_int8.pt"
+
+
+def quantize_model(model):
+    """Return a copy of ``model`` with INT8 dynamically quantized Linear layers."""
+    model.eval()
+    return torch.ao.quantization.quantize_dynamic(
+        model, {torch.nn.Linear}, dtype=torch.qint8
+    )
+
+
+def is_quantized_artifact(path):
+    """True when ``path`` is a directory written by ``save_quantized()``."""
+    return os.path.isfile(os.path.join(path, QUANTIZED_WEIGHTS_NAME))
+
+# ==============================================
+# SAVE / LOAD
+# ==============================================
+def save_quantized(classifier, output_dir):
+    """
+    Write a quantized classifier as a self-contained artifact.
+
+    The directory holds the tokenizer, the model config and the quantized
+    state dict, so it can be loaded without access to the original model.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    classifier.tokenizer.save_pretrained(output_dir)
+    classifier.model.config.save_pretrained(output_dir)
+    torch.save(
+        classifier.model.state_dict(),
+        os.path.join(output_dir, QUANTIZED_WEIGHTS_NAME)
+    )
+
+
+def load_quantized(artifact_dir):
+    """Load a classifier saved by ``save_quantized()``."""
+    tokenizer = AutoTokenizer.from_pretrained(artifact_dir)
+    config = AutoConfig.from_pretrained(artifact_dir)
+
+    # Rebuild the float architecture, swap in quantized modules, then load
+    # the packed INT8 weights into them
+    model = quantize_model(AutoModelForSequenceClassification.from_config(config))
+    # Packed INT8 params are not plain tensors, so the weights-only loader refuses them
+    state_dict = torch.load(
+        os.path.join(artifact_dir, QUANTIZED_WEIGHTS_NAME), weights_only=False
+    )
+    model.load_state_dict(state_dict)
+    model.eval()
+    return make_pipeline(model, tokenizer)
+
+
+def build_quantized_classifier(model_path=MODEL_PATH):
+    """
+    Build an INT8 classifier from either a saved artifact or the float model.
+
+    Args:
+        model_path: Quantized artifact directory, or any path accepted by
+            ``build_classifier()`` (quantized on the fly)
+    """
+    if os.path.isdir(model_path) and is_quantized_artifact(model_path):
+        return load_quantized(model_path)
+    classifier = build_classifier(model_path)
+    return make_pipeline(quantize_model(classifier.model), classifier.tokenizer)
+
+# ==============================================
+# ACCURACY-DRIFT REPORT
+# ==============================================
+def compare_models(float_classifier, quantized_classifier, texts, labels=None,
+                   threshold=CONFIDENCE_THRESHOLD, batch_size=16):
+    """
+    Run both models over the same texts and report speed, size and drift.
+
+    Returns:
+        Dict with timings, speedup, serialized model sizes, memory saved
+        and the decision-flip summary from ``compare_predictions()``
+    """
+    float_probs, float_time = predict_probabilities(float_classifier, texts, batch_size)
+    quant_probs, quant_time = predict_probabilities(quantized_classifier, texts, batch_size)
+
+    float_bytes = serialized_size(float_classifier.model)
+    quant_bytes = serialized_size(quantized_classifier.model)
+
+    report = {
+        "threshold": threshold,
+        "float_seconds": float_time,
+        "int8_seconds": quant_time,
+        "speedup": float_time / quant_time if quant_time else 0.0,
+        "float_model_mb": float_bytes / 2**20,
+        "int8_model_mb": quant_bytes / 2**20,
+        "memory_saved_mb": (float_bytes - quant_bytes) / 2**20,
+        "memory_saved_ratio": 1 - quant_bytes / float_bytes if float_bytes else 0.0,
+    }
+    report.update(compare_predictions(float_probs, quant_probs, labels, threshold))
+    return report
+
+# ==============================================
+# COMMAND-LINE ENTRY POINT
+# ==============================================
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="INT8 dynamic quantization tools.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    quantize = subparsers.add_parser("quantize", help="Quantize and save an INT8 artifact")
+    quantize.add_argument("--model-path", default=MODEL_PATH)
+    quantize.add_argument("--output", required=True, help="Artifact directory to write")
+
+    compare = subparsers.add_parser("compare", help="Compare float and INT8 models")
+    compare.add_argument("--data", required=True, help="Labelled CSV/JSONL sample")
+    compare.add_argument("--text-column", default="text")
+    compare.add_argument("--label-column", default="label")
+    compare.add_argument("--limit", type=int, default=500)
+    compare.add_argument("--model-path", default=MODEL_PATH)
+    compare.add_argument("--quantized-path", default=None,
+                         help="Saved INT8 artifact (quantized on the fly when omitted)")
+    compare.add_argument("--threshold", type=float, default=CONFIDENCE_THRESHOLD)
+    compare.add_argument("--batch-size", type=int, default=16)
+    compare.add_argument("--threads", type=int, default=None,
+                         help="torch intra-op threads (default: torch's choice)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.command == "quantize":
+        classifier = build_quantized_classifier(args.model_path)
+        save_quantized(classifier, args.output)
+        print(f"Saved INT8 model to {args.output}")
+        return
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    texts, labels = load_labelled_sample(
+        args.data, args.text_column, args.label_column, args.limit
+    )
+    float_classifier = build_classifier(args.model_path)
+    quantized_classifier = build_quantized_classifier(args.quantized_path or args.model_path)
+    report = compare_models(
+        float_classifier, quantized_classifier, texts, labels,
+        threshold=args.threshold, batch_size=args.batch_size
+    )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
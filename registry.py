@@ -0,0 +1,469 @@
+"""
+Versioned local model registry and zero-downtime hot-swap.
+
+A registry is a directory of immutable model versions plus one pointer
+to the version that should be served:
+
+    versions/<version>/            model and tokenizer files
+    versions/<version>/registry.json
+    ACTIVE.json                    active version and promotion history
+
+``promote`` and ``rollback`` only rewrite ``ACTIVE.json`` (atomically).
+Every serving process wraps its classifier in a ``HotSwapClassifier``
+that follows the pointer: the new version is loaded and warmed up on a
+background thread while the old one keeps answering, then new calls go
+to the new version, calls already in flight on the old one are drained,
+and the old weights are released. A version that fails to load is
+logged and skipped; the old one never stops serving.
+
+Every output of a ``HotSwapClassifier`` carries the version that
+produced it (``prediction_version()``), and ``model_revision()`` reports
+the registry version, so caches never mix predictions of two versions.
+
+Usage:
+    python registry.py register --source models/retrained --notes "Oct retrain"
+    python registry.py register --source aubmindlab/bert-base-arabertv02 --revision main
+    python registry.py list
+    python registry.py promote v3
+    python registry.py rollback
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from inference import model_revision
+
+logger = logging.getLogger("registry")
+
+# ==============================================
+# CONFIGURATION
+# ==============================================
+DEFAULT_REGISTRY_DIR = "models/registry"
+VERSIONS_NAME = "versions"
+ACTIVE_NAME = "ACTIVE.json"
+METADATA_NAME = "registry.json"
+POLL_SECONDS = 10.0
+DRAIN_TIMEOUT_SECONDS = 120.0
+SWAP_HISTORY = 20
+_VERSION_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*$")
+
+# ==============================================
+# REGISTRY
+# ==============================================
+def _write_json_atomic(path, payload):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class ModelRegistry:
+    """
+    Versioned model directories and the active-version pointer.
+
+    Args:
+        root: Registry directory (created on first registration)
+    """
+
+    def __init__(self, root=DEFAULT_REGISTRY_DIR):
+        self.root = root
+        self.versions_dir = os.path.join(root, VERSIONS_NAME)
+        self.active_path = os.path.join(root, ACTIVE_NAME)
+
+    def path(self, version):
+        return os.path.join(self.versions_dir, version)
+
+    def exists(self, version):
+        return os.path.isfile(os.path.join(self.path(version), METADATA_NAME))
+
+    def versions(self):
+        """Metadata of every registered version, oldest first."""
+        if not os.path.isdir(self.versions_dir):
+            return []
+        metas = []
+        for name in os.listdir(self.versions_dir):
+            if self.exists(name):
+                with open(os.path.join(self.path(name), METADATA_NAME), "r", encoding="utf-8") as f:
+                    metas.append(json.load(f))
+        return sorted(metas, key=lambda meta: (meta["registered"], meta["version"]))
+
+    def next_version(self):
+        numbers = [
+            int(meta["version"][1:]) for meta in self.versions()
+            if re.fullmatch(r"v\d+", meta["version"])
+        ]
+        return f"v{max(numbers, default=0) + 1}"
+
+    def register(self, source, version=None, notes="", revision=None):
+        """
+        Copy a model into the registry as a new immutable version.
+
+        Args:
+            source: Local model directory or hub id
+            version: Version name (default: the next ``vN``)
+            notes: Free-text description stored with the version
+            revision: Hub branch, tag or commit when ``source`` is a hub id
+
+        Returns:
+            The version's metadata dict
+        """
+        version = version or self.next_version()
+        if not _VERSION_RE.match(version):
+            raise ValueError(f"Invalid version name {version!r}")
+        if os.path.exists(self.path(version)):
+            raise ValueError(f"Version {version} is already registered")
+
+        os.makedirs(self.versions_dir, exist_ok=True)
+        staging = self.path(f".{version}.staging")
+        shutil.rmtree(staging, ignore_errors=True)
+        if os.path.isdir(source):
+            shutil.copytree(source, staging)
+        else:
+            from startup import snapshot_model
+            snapshot_model(source, staging, revision)
+
+        meta = {
+            "version": version,
+            "source": os.path.abspath(source) if os.path.isdir(source) else source,
+            "revision": revision,
+            "notes": notes,
+            "registered": datetime.now().isoformat(timespec="seconds"),
+            "bytes": sum(
+                os.path.getsize(os.path.join(directory, name))
+                for directory, _, names in os.walk(staging) for name in names
+            ),
+        }
+        _write_json_atomic(os.path.join(staging, METADATA_NAME), meta)
+        # Readers only ever see complete versions
+        os.replace(staging, self.path(version))
+        return meta
+
+    def _pointer(self):
+        if not os.path.isfile(self.active_path):
+            return {"version": None, "history": []}
+        with open(self.active_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def active(self):
+        """Active version, or None when the base model should be served."""
+        return self._pointer()["version"]
+
+    def promote(self, version):
+        """Point serving at ``version``; the previous one is kept for rollback."""
+        if version is not None and not self.exists(version):
+            raise ValueError(f"Unknown version {version!r}; registered: {[m['version'] for m in self.versions()]}")
+        pointer = self._pointer()
+        if pointer["version"] == version:
+            return pointer
+        os.makedirs(self.root, exist_ok=True)
+        pointer = {
+            "version": version,
+            "history": pointer["history"] + [pointer["version"]],
+            "updated": datetime.now().isoformat(timespec="seconds"),
+        }
+        _write_json_atomic(self.active_path, pointer)
+        return pointer
+
+    def rollback(self):
+        """Return to the version active before the last promotion."""
+        pointer = self._pointer()
+        if not pointer["history"]:
+            raise ValueError("No earlier version to roll back to")
+        previous = pointer["history"][-1]
+        pointer = {
+            "version": previous,
+            "history": pointer["history"][:-1],
+            "updated": datetime.now().isoformat(timespec="seconds"),
+        }
+        _write_json_atomic(self.active_path, pointer)
+        return pointer
+
+# ==============================================
+# HOT-SWAP
+# ==============================================
+class _Slot:
+    """One loaded version and the calls currently running on it."""
+
+    def __init__(self, version, label, classifier):
+        self.version = version
+        self.label = label
+        self.classifier = classifier
+        self.in_flight = 0
+        self.retire_when_idle = False
+        self.idle = threading.Condition()
+
+
+def prediction_version(output):
+    """Version recorded in one text's output by a ``HotSwapClassifier``, else None."""
+    return output[0].get("model_version") if output else None
+
+
+def served_version(classifier):
+    """Version a (possibly cascaded) classifier currently serves, else None."""
+    return getattr(getattr(classifier, "teacher", classifier), "version", None)
+
+
+@contextmanager
+def pinned(classifier):
+    """
+    Hold one version of ``classifier`` for a block that uses its model or
+    tokenizer directly (e.g. windowing).
+
+    Yields:
+        ``(classifier, version)``: the underlying classifier of the leased
+        version (a cascade's teacher) and its label (``served_version()``
+        when not hot-swapped)
+    """
+    served = getattr(classifier, "teacher", classifier)
+    if isinstance(served, HotSwapClassifier):
+        with served.lease() as slot:
+            yield slot.classifier, slot.label
+    else:
+        yield classifier, served_version(classifier)
+
+
+def _release_memory():
+    gc.collect()
+    torch = sys.modules.get("torch")
+    if torch is not None and torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+class HotSwapClassifier:
+    """
+    Pipeline-compatible classifier whose version can change under load.
+
+    Args:
+        loader: Callable taking a version directory (None for the base
+            model) and returning a loaded, warmed-up classifier
+        registry: ``ModelRegistry`` the version names refer to
+        version: Registry version of ``classifier`` (None for the base model)
+        classifier: Already loaded classifier; loaded with ``loader`` if None
+    """
+
+    def __init__(self, loader, registry, version=None, classifier=None):
+        self.loader = loader
+        self.registry = registry
+        self._slot = self._load(version) if classifier is None else self._make_slot(version, classifier)
+        self._lock = threading.Lock()
+        self._swap_lock = threading.Lock()
+        self._swaps = []
+        self._failed = None
+        self._follower = None
+
+    def _make_slot(self, version, classifier):
+        if version is not None:
+            classifier.model.config.registry_version = version
+        # The base model is labelled by its hub commit or file times
+        return _Slot(version, version or model_revision(classifier), classifier)
+
+    def _load(self, version):
+        path = self.registry.path(version) if version is not None else None
+        return self._make_slot(version, self.loader(path))
+
+    # ----------------------------------------------
+    # Pipeline interface
+    # ----------------------------------------------
+    @property
+    def version(self):
+        """Label of the serving version; the base model's revision when not from the registry."""
+        return self._slot.label
+
+    @property
+    def tokenizer(self):
+        return self._slot.classifier.tokenizer
+
+    @property
+    def model(self):
+        return self._slot.classifier.model
+
+    @contextmanager
+    def lease(self):
+        """Hold the active version for the duration of the block."""
+        with self._lock:
+            slot = self._slot
+            with slot.idle:
+                slot.in_flight += 1
+        try:
+            yield slot
+        finally:
+            retire = False
+            with slot.idle:
+                slot.in_flight -= 1
+                if slot.in_flight == 0:
+                    slot.idle.notify_all()
+                    retire = slot.retire_when_idle
+            # A swap that timed out draining left the last call to retire it
+            if retire:
+                self._retire(slot)
+
+    def __call__(self, texts, batch_size=None, truncation=True, **kwargs):
+        with self.lease() as slot:
+            outputs = slot.classifier(texts, batch_size=batch_size, truncation=truncation, **kwargs)
+        if isinstance(texts, str):
+            return [{**item, "model_version": slot.label} for item in outputs]
+        return [[{**item, "model_version": slot.label} for item in output] for output in outputs]
+
+    # ----------------------------------------------
+    # Swapping
+    # ----------------------------------------------
+    def swap(self, version):
+        """
+        Load ``version``, switch traffic to it and retire the old one.
+
+        Blocks for the whole load/warmup/drain; the old version serves
+        until the switch. Calls still running after DRAIN_TIMEOUT_SECONDS
+        keep the old version alive; the last of them retires it. Returns a report dict (``status`` "swapped",
+        "current", "busy" or "failed").
+        """
+        if not self._swap_lock.acquire(blocking=False):
+            return {"status": "busy", "version": version}
+        try:
+            old = self._slot
+            if version == old.version:
+                return {"status": "current", "version": old.label}
+
+            report = {"from": old.label, "to": version or "base", "started": time.time()}
+            start = time.perf_counter()
+            try:
+                new = self._load(version)
+            except Exception as e:
+                logger.exception("Loading model version %s failed; %s keeps serving", version, old.label)
+                self._failed = version
+                report.update(status="failed", error=str(e))
+                return self._record(report)
+            report["load_seconds"] = time.perf_counter() - start
+
+            with self._lock:
+                self._slot = new
+            logger.info("Serving model version %s (was %s)", new.label, old.label)
+
+            start = time.perf_counter()
+            with old.idle:
+                drained = old.idle.wait_for(lambda: old.in_flight == 0, timeout=DRAIN_TIMEOUT_SECONDS)
+                if not drained:
+                    old.retire_when_idle = True
+                    still_running = old.in_flight
+            report["drain_seconds"] = time.perf_counter() - start
+            if drained:
+                self._retire(old)
+            else:
+                logger.warning("%d calls still running on %s after %.0fs; retiring it when they finish",
+                               still_running, old.label, DRAIN_TIMEOUT_SECONDS)
+                report["retire"] = "deferred"
+            self._failed = None
+            report["status"] = "swapped"
+            return self._record(report)
+        finally:
+            self._swap_lock.release()
+
+    def _retire(self, slot):
+        shutdown = getattr(slot.classifier, "shutdown", None)
+        if shutdown is not None:
+            shutdown()
+        slot.classifier = None
+        _release_memory()
+
+    def _record(self, report):
+        with self._lock:
+            self._swaps.append(report)
+            del self._swaps[:-SWAP_HISTORY]
+        return report
+
+    def follow(self, poll_seconds=POLL_SECONDS):
+        """Swap whenever the registry's active version changes, from a daemon thread."""
+        if self._follower is not None:
+            return
+        self._follower = threading.Thread(
+            target=self._follow, args=(poll_seconds,), name="registry-follower", daemon=True
+        )
+        self._follower.start()
+
+    def _follow(self, poll_seconds):
+        while True:
+            try:
+                wanted = self.registry.active()
+                if wanted == self._slot.version:
+                    self._failed = None
+                elif wanted != self._failed:
+                    self.swap(wanted)
+            except Exception:
+                logger.exception("Checking the model registry failed")
+            time.sleep(poll_seconds)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "version": self._slot.label,
+                "in_flight": self._slot.in_flight,
+                "swapping": self._swap_lock.locked(),
+                "swaps": list(self._swaps),
+            }
+
+# ==============================================
+# COMMAND-LINE ENTRY POINT
+# ==============================================
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the local versioned model registry.")
+    parser.add_argument("--registry", default=DEFAULT_REGISTRY_DIR)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    register = subparsers.add_parser("register", help="Copy a model directory or hub model in as a new version")
+    register.add_argument("--source", required=True, help="Local model directory or hub id")
+    register.add_argument("--version", default=None, help="Version name (default: next vN)")
+    register.add_argument("--revision", default=None, help="Hub branch, tag or commit")
+    register.add_argument("--notes", default="")
+    register.add_argument("--promote", action="store_true", help="Make it the active version")
+
+    subparsers.add_parser("list", help="Show registered versions and the active one")
+
+    promote = subparsers.add_parser("promote", help="Serve a version; running replicas hot-swap to it")
+    promote.add_argument("version", help="Registered version, or 'base' for the configured MODEL_PATH")
+
+    subparsers.add_parser("rollback", help="Serve the version active before the last promotion")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        run(ModelRegistry(args.registry), args)
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+
+def run(registry, args):
+    if args.command == "register":
+        meta = registry.register(args.source, args.version, args.notes, args.revision)
+        if args.promote:
+            registry.promote(meta["version"])
+        print(json.dumps(meta, indent=2))
+    elif args.command == "list":
+        active = registry.active()
+        for meta in registry.versions():
+            marker = "*" if meta["version"] == active else " "
+            print(f"{marker} {meta['version']:<12} {meta['registered']}  {meta['bytes'] / 1e6:8.1f} MB  "
+                  f"{meta['source']}  {meta['notes']}")
+        if active is None:
+            print("* base (MODEL_PATH)")
+    elif args.command == "promote":
+        pointer = registry.promote(None if args.version == "base" else args.version)
+        print(f"Active version: {pointer['version'] or 'base'}")
+    else:
+        pointer = registry.rollback()
+        print(f"Rolled back to {pointer['version'] or 'base'}")
+
+
+if __name__ == "__main__":
+    main()
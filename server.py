@@ -0,0 +1,528 @@
+"""
+Headless JSON inference server for the AraBERT classifier.
+
+Shares model loading and the Real/Fake/Uncertain rule with the Streamlit
+app, batches concurrent requests through the micro-batching engine and
+sheds load with HTTP 429 once too many texts are pending.
+
+Endpoints:
+    POST /v1/classify        {"text": "..."}
+    POST /v1/classify/batch  {"texts": ["...", "..."]}
+    GET  /healthz
+    GET  /metrics            Prometheus text exposition format
+
+Usage:
+    python server.py --port 8080 --max-pending 256
+    python server.py --trace-log traces.jsonl
+    python server.py --workers 4
+    python server.py --student models/student
+    python server.py --calibration models/calibration.json
+    python server.py --registry models/registry
+    python server.py --shadow models/candidate --shadow-log shadow.jsonl
+    python server.py --ensemble models/second-seed
+    python server.py --early-exit models/early-exit
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+
+import tornado.httpserver
+import tornado.ioloop
+import tornado.web
+
+from batching import DEFAULT_MAX_BATCH_SIZE, DEFAULT_MAX_WAIT_MS, BatchingEngine
+from calibration import load_calibration
+from distillation import DEFAULT_MARGIN
+from inference import (
+    CONFIDENCE_THRESHOLD,
+    DECISION_LABELS,
+    MODEL_PATH,
+    apply_temperature,
+    decide,
+    extract_probabilities,
+    model_revision,
+)
+from metrics import (
+    REJECTED,
+    STAGE_LATENCY,
+    RequestTrace,
+    TraceLog,
+    record_cache,
+    record_decision,
+    record_input,
+    render,
+)
+from prediction_cache import PredictionCache, cache_key
+from preprocessing import DEFAULT_PREPROCESSOR
+from registry import POLL_SECONDS, HotSwapClassifier, ModelRegistry, pinned, prediction_version, served_version
+from shadow import DEFAULT_OVERHEAD_BUDGET
+from startup import StartupTimer, load_classifier, resolve_model_path, warmup
+from windowing import classify_windows, encode_document, needs_windows
+
+logger = logging.getLogger("server")
+
+# ==============================================
+# CONFIGURATION
+# ==============================================
+DEFAULT_PORT = 8080
+DEFAULT_MAX_PENDING = 256
+MAX_TEXTS_PER_REQUEST = 256
+MAX_TEXT_CHARS = 200_000
+RETRY_AFTER_SECONDS = 1
+
+# ==============================================
+# INFERENCE SERVICE
+# ==============================================
+class Overloaded(Exception):
+    """Raised when admitting a request would exceed the pending-text limit."""
+
+
+class InferenceService:
+    """
+    Async facade over the batching engine with admission control.
+
+    Args:
+        classifier: Pipeline from ``build_classifier()``
+        max_pending: Maximum texts admitted but not yet answered; requests
+            beyond this are rejected instead of queued
+        threshold: Confidence threshold for Real/Fake vs Uncertain
+        cache: Optional ``PredictionCache``
+        model_path: Model identity used in cache keys and health output
+        trace_log: Optional ``TraceLog`` receiving one line per scored text
+        concurrency: Engine batches in flight at once (one per pool worker)
+        temperature: Calibration temperature applied before the threshold
+        preprocessor: Optional ``Preprocessor`` run before cache lookup and tokenization
+        shadow: Optional ``ShadowEvaluator`` receiving every fresh single-pass score
+    """
+
+    def __init__(self, classifier, max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                 max_wait_ms=DEFAULT_MAX_WAIT_MS, max_pending=DEFAULT_MAX_PENDING,
+                 threshold=CONFIDENCE_THRESHOLD, cache=None, model_path=MODEL_PATH,
+                 trace_log=None, concurrency=1, temperature=1.0, preprocessor=None, shadow=None):
+        self.classifier = classifier
+        self.model_path = model_path
+        self.engine = BatchingEngine(classifier, max_batch_size, max_wait_ms, concurrency)
+        self.max_pending = max_pending
+        self.threshold = threshold
+        self.temperature = temperature
+        self.preprocessor = preprocessor
+        self.shadow = shadow
+        self.cache = cache
+        self.trace_log = trace_log
+        self.revision = model_revision(classifier)
+        self.pending = 0
+        self.rejected = 0
+
+    def admit(self, n_texts):
+        """Reserve capacity for ``n_texts`` or raise ``Overloaded``."""
+        if self.pending + n_texts > self.max_pending:
+            self.rejected += 1
+            REJECTED.inc()
+            raise Overloaded()
+        self.pending += n_texts
+
+    def release(self, n_texts):
+        self.pending -= n_texts
+
+    async def classify_many(self, texts):
+        """Score texts concurrently; short texts share engine batches."""
+        return await asyncio.gather(*(self._classify_one(text) for text in texts))
+
+    async def _classify_one(self, text):
+        trace = RequestTrace(self.trace_log, source="server")
+        try:
+            return await self._score(text, trace)
+        finally:
+            trace.finish()
+
+    def _prepare(self, text, trace):
+        """Preprocess and tokenize one text; CPU-bound, so run off the event loop."""
+        tokenizer = self.classifier.tokenizer
+        if self.preprocessor is not None:
+            with trace.stage("preprocess"):
+                text = self.preprocessor(text)
+        with trace.stage("tokenize"):
+            encoding = encode_document(tokenizer, text)
+            windowed = needs_windows(tokenizer, encoding)
+        return text, encoding, windowed
+
+    def _classify_windows(self, text, encoding):
+        """Windowed scores and the version that produced them; one version for every window."""
+        with pinned(self.classifier) as (classifier, version):
+            result = classify_windows(classifier, text, threshold=self.threshold, encoding=encoding)
+        return result, version
+
+    async def _score(self, text, trace):
+        raw_chars = len(text)
+        loop = asyncio.get_running_loop()
+        # Long texts take a while to clean and tokenize; keep /healthz,
+        # /metrics and 429s responsive meanwhile
+        text, encoding, windowed = await loop.run_in_executor(None, self._prepare, text, trace)
+        record_input(len(text), len(encoding["input_ids"]))
+
+        with trace.stage("inference"):
+            key = None
+            cached = None
+            # A hot-swapped classifier reports the version it serves right now
+            revision = served_version(self.classifier) or self.revision
+            model_version = revision
+            primary_seconds = None
+            if self.cache is not None:
+                key = cache_key(text, self.model_path, revision, variant="mean" if windowed else "")
+                cached = self.cache.get(key)
+                record_cache(cached is not None)
+
+            if cached is not None:
+                prob_real, prob_fake = cached
+            elif windowed:
+                window_result, window_version = await loop.run_in_executor(
+                    None, self._classify_windows, text, encoding
+                )
+                prob_real, prob_fake = window_result["prob_real"], window_result["prob_fake"]
+                model_version = window_version or model_version
+                if key is not None and model_version != revision:
+                    key = cache_key(text, self.model_path, model_version, variant="mean")
+            else:
+                start = time.perf_counter()
+                outputs = await asyncio.wrap_future(self.engine.submit(text))
+                primary_seconds = time.perf_counter() - start
+                prob_real, prob_fake = extract_probabilities(outputs)
+                model_version = prediction_version(outputs) or model_version
+                if key is not None and model_version != revision:
+                    key = cache_key(text, self.model_path, model_version)
+
+            if key is not None and cached is None:
+                self.cache.put(key, prob_real, prob_fake)
+        # The cache keeps raw scores, so recalibrating never invalidates it
+        raw_real, raw_fake = prob_real, prob_fake
+        prob_real, prob_fake = apply_temperature(prob_real, prob_fake, self.temperature)
+
+        decision, confidence = decide(prob_real, prob_fake, self.threshold)
+        record_decision(decision, confidence, self.threshold)
+        if self.shadow is not None and primary_seconds is not None:
+            self.shadow.record_primary(primary_seconds)
+            self.shadow.observe(text, encoding["input_ids"], raw_real, raw_fake, decision)
+        trace.annotate(
+            raw_chars=raw_chars,
+            chars=len(text),
+            tokens=len(encoding["input_ids"]),
+            windowed=windowed,
+            cache_hit=cached is not None,
+            decision=decision,
+            confidence=round(confidence, 4),
+            model_version=model_version,
+        )
+        return {
+            "decision": DECISION_LABELS[decision],
+            "prob_real": prob_real,
+            "prob_fake": prob_fake,
+            "confidence": confidence,
+            "threshold": self.threshold,
+            "temperature": self.temperature,
+            "windowed": windowed,
+            "cached": cached is not None,
+            "model_version": model_version,
+        }
+
+    def stats(self):
+        stats = self.engine.stats()
+        stats.update({
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "rejected": self.rejected,
+            "model_path": self.model_path,
+            "model_revision": served_version(self.classifier) or self.revision,
+        })
+        served = getattr(self.classifier, "teacher", self.classifier)
+        if isinstance(served, HotSwapClassifier):
+            stats["registry"] = served.stats()
+        if self.cache is not None:
+            stats["cache"] = self.cache.stats()
+        if self.shadow is not None:
+            stats["shadow"] = self.shadow.stats()
+        return stats
+
+# ==============================================
+# HTTP HANDLERS
+# ==============================================
+class BaseHandler(tornado.web.RequestHandler):
+    def initialize(self, service):
+        self.service = service
+
+    def set_default_headers(self):
+        self.set_header("Content-Type", "application/json; charset=utf-8")
+
+    def write_error(self, status_code, **kwargs):
+        if status_code == 429:
+            self.set_header("Retry-After", str(RETRY_AFTER_SECONDS))
+        self.finish(json.dumps({"error": self._reason, "status": status_code}))
+
+    def parse_body(self):
+        try:
+            payload = json.loads(self.request.body or b"{}")
+        except ValueError:
+            raise tornado.web.HTTPError(400, reason="Request body must be valid JSON")
+        if not isinstance(payload, dict):
+            raise tornado.web.HTTPError(400, reason="Request body must be a JSON object")
+        return payload
+
+    def validate_text(self, text):
+        if not isinstance(text, str) or not text.strip():
+            raise tornado.web.HTTPError(400, reason="Each text must be a non-empty string")
+        if len(text) > MAX_TEXT_CHARS:
+            raise tornado.web.HTTPError(413, reason=f"Text exceeds {MAX_TEXT_CHARS} characters")
+
+    async def classify(self, texts):
+        try:
+            self.service.admit(len(texts))
+        except Overloaded:
+            raise tornado.web.HTTPError(429, reason="Server is at capacity, retry later")
+        try:
+            return await self.service.classify_many(texts)
+        finally:
+            self.service.release(len(texts))
+
+    def write_json(self, payload):
+        self.finish(json.dumps(payload, ensure_ascii=False))
+
+
+class ClassifyHandler(BaseHandler):
+    async def post(self):
+        text = self.parse_body().get("text")
+        self.validate_text(text)
+        results = await self.classify([text])
+        self.write_json(results[0])
+
+
+class BatchClassifyHandler(BaseHandler):
+    async def post(self):
+        texts = self.parse_body().get("texts")
+        if not isinstance(texts, list) or not texts:
+            raise tornado.web.HTTPError(400, reason="'texts' must be a non-empty list")
+        if len(texts) > MAX_TEXTS_PER_REQUEST:
+            raise tornado.web.HTTPError(
+                413, reason=f"At most {MAX_TEXTS_PER_REQUEST} texts per request"
+            )
+        for text in texts:
+            self.validate_text(text)
+        results = await self.classify(texts)
+        self.write_json({"results": results})
+
+
+class HealthHandler(BaseHandler):
+    def get(self):
+        self.write_json({"status": "ok", **self.service.stats()})
+
+
+class MetricsHandler(BaseHandler):
+    def get(self):
+        self.set_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.finish(render())
+
+
+def make_app(service):
+    routes = [
+        (r"/v1/classify", ClassifyHandler, {"service": service}),
+        (r"/v1/classify/batch", BatchClassifyHandler, {"service": service}),
+        (r"/healthz", HealthHandler, {"service": service}),
+        (r"/metrics", MetricsHandler, {"service": service}),
+    ]
+    return tornado.web.Application(routes)
+
+# ==============================================
+# COMMAND-LINE ENTRY POINT
+# ==============================================
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the AraBERT classifier over HTTP/JSON.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--model-path", default=MODEL_PATH)
+    parser.add_argument("--backend", choices=("torch", "onnxruntime"), default="torch",
+                        help="Execution backend (onnxruntime expects an exported artifact as model path)")
+    parser.add_argument("--snapshot-dir", default=None,
+                        help="Pinned local model snapshot; loaded with no hub lookup when present")
+    parser.add_argument("--no-warmup", action="store_true",
+                        help="Skip the warmup pass before accepting traffic")
+    parser.add_argument("--int8", action="store_true",
+                        help="Serve a dynamically quantized INT8 model (model path may be a saved artifact)")
+    parser.add_argument("--bf16", action="store_true",
+                        help="Serve bfloat16 weights (model path may be a saved bf16 artifact)")
+    parser.add_argument("--mmap", action="store_true",
+                        help="Memory-map safetensors weights instead of reading them into process memory")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Inference processes sharing one copy of the weights (torch backend)")
+    parser.add_argument("--student", default=None,
+                        help="Distilled student directory; confident student answers skip the model")
+    parser.add_argument("--cascade-margin", type=float, default=DEFAULT_MARGIN,
+                        help="Student answers only when its confidence is at least threshold + margin")
+    parser.add_argument("--registry", default=None,
+                        help="Model registry directory; serve its active version and hot-swap when it changes")
+    parser.add_argument("--registry-poll", type=float, default=POLL_SECONDS,
+                        help="Seconds between checks of the registry's active version")
+    parser.add_argument("--ensemble", action="append", default=[],
+                        help="Extra model whose logits are averaged with the primary's (repeatable, torch fp32/bf16)")
+    parser.add_argument("--early-exit", default=None,
+                        help="Exit heads written by `python early_exit.py train`; confident texts stop at an "
+                             "intermediate layer (torch fp32/bf16, base model only)")
+    parser.add_argument("--shadow", action="append", default=[],
+                        help="Candidate model scored in the background against live traffic (repeatable)")
+    parser.add_argument("--shadow-log", default=None,
+                        help="Append one JSON line per shadow-scored text to this file")
+    parser.add_argument("--shadow-overhead-budget", type=float, default=DEFAULT_OVERHEAD_BUDGET,
+                        help="Shadow sampling backs off when mean primary latency rises more than this")
+    parser.add_argument("--no-preprocess", action="store_true",
+                        help="Feed raw text to the model, skipping URL/emoji/diacritic/boilerplate cleaning")
+    parser.add_argument("--threshold", type=float, default=None,
+                        help=f"Confidence threshold (default: the calibration's, else {CONFIDENCE_THRESHOLD})")
+    parser.add_argument("--calibration", default=None,
+                        help="Calibration JSON written by `python calibration.py fit`")
+    parser.add_argument("--max-batch-size", type=int, default=DEFAULT_MAX_BATCH_SIZE,
+                        help="Texts per forward pass")
+    parser.add_argument("--max-wait-ms", type=float, default=DEFAULT_MAX_WAIT_MS,
+                        help="Maximum time to wait for a batch to fill")
+    parser.add_argument("--max-pending", type=int, default=DEFAULT_MAX_PENDING,
+                        help="Pending texts before requests are rejected with 429")
+    parser.add_argument("--cache-db", default=None,
+                        help="Optional SQLite file backing the prediction cache")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the prediction cache")
+    parser.add_argument("--trace-log", default=None,
+                        help="Append one JSON line of stage timings per scored text to this file")
+    return parser.parse_args(argv)
+
+
+def load_backend(args, timer, version_dir=None):
+    """
+    Load the classifier selected on the command line, timing each phase.
+
+    ``version_dir`` (a model registry version) replaces ``--model-path``
+    and ``--snapshot-dir``.
+    """
+    if args.backend == "onnxruntime":
+        with timer.phase("imports"):
+            from onnx_backend import build_onnx_classifier
+        with timer.phase("model"):
+            return build_onnx_classifier(version_dir or args.model_path)
+    if args.int8:
+        with timer.phase("imports"):
+            from quantization import build_quantized_classifier
+        with timer.phase("model"):
+            model_path, _ = resolve_model_path(args.model_path, args.snapshot_dir)
+            return build_quantized_classifier(version_dir or model_path)
+    return load_classifier(
+        version_dir or args.model_path,
+        snapshot_dir=None if version_dir else args.snapshot_dir,
+        timer=timer,
+        mmap=args.mmap,
+        dtype="bf16" if args.bf16 else None,
+    )
+
+
+def build_backend(args, version_dir=None, timer=None):
+    """Load, warm up and (with --workers) pool one model version."""
+    timer = timer or StartupTimer()
+    classifier = load_backend(args, timer, version_dir)
+    if args.ensemble:
+        from shadow import EnsembleClassifier
+        with timer.phase("ensemble"):
+            members = [classifier] + [
+                load_classifier(path, timer=timer, mmap=args.mmap, dtype="bf16" if args.bf16 else None)
+                for path in args.ensemble
+            ]
+            classifier = EnsembleClassifier(members)
+    elif args.early_exit and version_dir is None:
+        # Exit heads are distilled from one model; registry versions run every layer
+        from early_exit import EarlyExitClassifier
+        with timer.phase("exit heads"):
+            classifier = EarlyExitClassifier.load(classifier, args.early_exit)
+    if not args.no_warmup:
+        warmup(classifier, batch_sizes=(1, args.max_batch_size), timer=timer)
+    if args.workers > 1:
+        from workerpool import WorkerPool
+        with timer.phase("workers"):
+            classifier = WorkerPool(classifier, workers=args.workers)
+    return classifier
+
+
+def precision(args):
+    return "int8" if args.int8 else "bf16" if args.bf16 else "fp32"
+
+
+def main(argv=None):
+    timer = StartupTimer()
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if args.int8 and args.bf16:
+        raise SystemExit("--int8 and --bf16 are mutually exclusive")
+    if args.workers > 1 and (args.backend != "torch" or args.int8):
+        raise SystemExit("--workers requires the fp32/bf16 torch backend")
+    if args.ensemble and (args.backend != "torch" or args.int8 or args.workers > 1):
+        raise SystemExit("--ensemble requires the fp32/bf16 torch backend with one worker")
+    if args.early_exit and (args.backend != "torch" or args.int8 or args.workers > 1 or args.ensemble):
+        raise SystemExit("--early-exit requires the fp32/bf16 torch backend with one worker and no --ensemble")
+
+    calibration = load_calibration(args.calibration)
+    threshold = args.threshold if args.threshold is not None else calibration["threshold"]
+    if args.registry:
+        registry = ModelRegistry(args.registry)
+        version = registry.active()
+        classifier = HotSwapClassifier(
+            lambda version_dir: build_backend(args, version_dir),
+            registry,
+            version=version,
+            classifier=build_backend(args, registry.path(version) if version else None, timer),
+        )
+        classifier.follow(args.registry_poll)
+    else:
+        classifier = build_backend(args, timer=timer)
+    if args.student:
+        from distillation import build_cascade
+        classifier = build_cascade(
+            classifier, args.student, threshold=threshold, margin=args.cascade_margin,
+            temperature=calibration["temperature"]
+        )
+    shadow = None
+    if args.shadow:
+        from inference import build_classifier
+        from shadow import ShadowEvaluator
+        with timer.phase("shadow"):
+            shadow = ShadowEvaluator(
+                classifier.tokenizer,
+                {path: build_classifier(path) for path in args.shadow},
+                threshold=threshold,
+                temperature=calibration["temperature"],
+                overhead_budget=args.shadow_overhead_budget,
+                log=TraceLog(args.shadow_log) if args.shadow_log else None,
+            )
+    cache = None if args.no_cache else PredictionCache(db_path=args.cache_db)
+    service = InferenceService(
+        classifier,
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+        max_pending=args.max_pending,
+        threshold=threshold,
+        cache=cache,
+        model_path=(
+            f"{args.model_path}@{args.backend}-{precision(args)}"
+            + ("+ensemble" if args.ensemble else "")
+            + ("+early-exit" if args.early_exit else "")
+            + ("+cascade" if args.student else "")
+        ),
+        trace_log=TraceLog(args.trace_log) if args.trace_log else None,
+        concurrency=args.workers,
+        temperature=calibration["temperature"],
+        preprocessor=None if args.no_preprocess else DEFAULT_PREPROCESSOR,
+        shadow=shadow,
+    )
+
+    server = tornado.httpserver.HTTPServer(make_app(service))
+    server.listen(args.port, address=args.host)
+    summary = timer.log_summary()
+    STAGE_LATENCY.observe(summary["total"] / 1000.0, stage="load_model")
+    logger.info("Serving %s on http://%s:%d", args.model_path, args.host, args.port)
+    tornado.ioloop.IOLoop.current().start()
+
+
+if __name__ == "__main__":
+    main()
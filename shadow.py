@@ -0,0 +1,485 @@
+"""
+Shadow evaluation of candidate models and logit-averaging ensembles.
+
+Shadow mode compares candidate models with the production model on live
+traffic without touching the answer users get. Serving code hands each
+freshly scored text to ``ShadowEvaluator.observe()``, which only enqueues
+it together with the token ids already computed for the primary model.
+A background thread, running at lowered OS priority, scores queued texts
+with every candidate in batches and tallies agreement and score deltas
+per primary Real/Fake/Uncertain bucket. Candidates that share the
+primary tokenizer reuse its token ids; others tokenize the text.
+
+The cost to primary latency is measured, not assumed: serving code
+reports each primary inference time and the evaluator compares latency
+while a shadow batch is running with latency while it is idle. When the
+overall overhead exceeds the budget the share of traffic sampled into
+the shadow is halved, and it grows back while there is headroom; when
+the queue is full texts are dropped, never waited for.
+
+Ensemble mode (``EnsembleClassifier``) averages the logits of several
+models run on one shared tokenized batch.
+
+Usage:
+    python shadow.py --data sample.csv --candidate models/candidate --limit 300
+    python shadow.py --data sample.csv --candidate models/a --candidate models/b --log shadow.jsonl
+"""
+import argparse
+import json
+import logging
+import os
+import queue
+import random
+import statistics
+import threading
+import time
+from collections import Counter, deque
+from itertools import islice
+
+from inference import CONFIDENCE_THRESHOLD, MAX_SEQUENCE_LENGTH, MODEL_PATH, apply_temperature, decide, extract_probabilities
+from windowing import frame_window, window_capacity
+
+logger = logging.getLogger("shadow")
+
+# ==============================================
+# CONFIGURATION
+# ==============================================
+DEFAULT_MAX_BATCH_SIZE = 16
+DEFAULT_MAX_WAIT_MS = 200
+DEFAULT_MAX_PENDING = 256
+DEFAULT_OVERHEAD_BUDGET = 0.05   # tolerated relative increase of mean primary latency
+MIN_SAMPLE_RATE = 0.01
+LATENCY_WINDOW = 500             # recent primary latencies kept per state
+MIN_LATENCY_SAMPLES = 20         # per state, before the overhead is trusted
+SHADOW_NICENESS = 10             # added to the shadow thread's nice value (Linux)
+DECISION_BUCKETS = ("real", "fake", "uncertain")
+
+# ==============================================
+# ENSEMBLE
+# ==============================================
+def shares_tokenizer(a, b):
+    """True when token ids from tokenizer ``a`` mean the same to tokenizer ``b``."""
+    return len(a) == len(b) and a.pad_token_id == b.pad_token_id and a.cls_token_id == b.cls_token_id
+
+
+class _ModelOutput:
+    def __init__(self, logits):
+        self.logits = logits
+
+
+class _EnsembleModel:
+    """Model-like callable averaging member logits for one feature batch."""
+
+    def __init__(self, models, weights):
+        self.models = models
+        self.weights = weights
+        self.config = models[0].config
+        self.device = models[0].device
+
+    def __call__(self, **features):
+        total = None
+        for model, weight in zip(self.models, self.weights):
+            inputs = {key: value.to(model.device) for key, value in features.items()}
+            logits = model(**inputs).logits.float().to(self.device) * weight
+            total = logits if total is None else total + logits
+        return _ModelOutput(total)
+
+
+class EnsembleClassifier:
+    """
+    Pipeline-compatible classifier averaging the logits of several models.
+
+    The batch is tokenized once with the first member's tokenizer and fed
+    to every member; all members must share that vocabulary and the
+    Real/Fake label order. ``model`` is itself the averaged model, so
+    windowing and the offline tools score the ensemble too.
+
+    Args:
+        classifiers: Pipelines from ``build_classifier()`` (or compatible)
+        weights: Per-member weights (default: equal), normalised to sum to 1
+    """
+
+    def __init__(self, classifiers, weights=None):
+        if not classifiers:
+            raise ValueError("An ensemble needs at least one model")
+        self.classifiers = classifiers
+        self.tokenizer = classifiers[0].tokenizer
+        for member in classifiers[1:]:
+            if not shares_tokenizer(self.tokenizer, member.tokenizer):
+                raise ValueError("Ensemble members must share one tokenizer vocabulary")
+            if member.model.config.label2id != classifiers[0].model.config.label2id:
+                raise ValueError("Ensemble members must share one label order")
+        weights = weights or [1.0] * len(classifiers)
+        self.weights = [weight / sum(weights) for weight in weights]
+        self.model = _EnsembleModel([member.model for member in classifiers], self.weights)
+
+    def __call__(self, texts, batch_size=None, truncation=True, **kwargs):
+        import torch
+
+        if isinstance(texts, str):
+            texts = [texts]
+        batch_size = batch_size or len(texts) or 1
+        id2label = self.model.config.id2label
+        results = []
+        for start in range(0, len(texts), batch_size):
+            batch = self.tokenizer(
+                list(texts[start:start + batch_size]),
+                padding=True,
+                truncation=truncation,
+                max_length=MAX_SEQUENCE_LENGTH,
+                return_tensors="pt",
+            )
+            with torch.inference_mode():
+                probs = torch.softmax(self.model(**batch).logits, dim=-1).cpu().tolist()
+            results.extend(
+                sorted(
+                    ({"label": id2label[j], "score": score} for j, score in enumerate(row)),
+                    key=lambda item: item["score"],
+                    reverse=True,
+                )
+                for row in probs
+            )
+        return results
+
+    def shutdown(self):
+        for member in self.classifiers:
+            if hasattr(member, "shutdown"):
+                member.shutdown()
+
+# ==============================================
+# SHADOW EVALUATION
+# ==============================================
+class _Tally:
+    """Agreement and prob_fake deltas of one candidate in one bucket."""
+
+    def __init__(self):
+        self.count = 0
+        self.agree = 0
+        self.delta_sum = 0.0
+        self.abs_delta_sum = 0.0
+
+    def add(self, agree, delta):
+        self.count += 1
+        self.agree += agree
+        self.delta_sum += delta
+        self.abs_delta_sum += abs(delta)
+
+    def summary(self):
+        n = self.count
+        return {
+            "count": n,
+            "agreement": self.agree / n if n else None,
+            "mean_delta": self.delta_sum / n if n else None,
+            "mean_abs_delta": self.abs_delta_sum / n if n else None,
+        }
+
+
+class ShadowEvaluator:
+    """
+    Score candidate models against the primary's decisions in the background.
+
+    Args:
+        primary_tokenizer: Tokenizer that produced the ids passed to ``observe()``
+        candidates: Dict of name to pipeline (or compatible) classifier
+        threshold: Confidence threshold used for the candidates' decisions
+        temperature: Calibration temperature the primary's decision was made
+            with; candidate and primary scores are scaled by it before
+            decisions and deltas are compared (and logged)
+        max_batch_size: Texts per candidate forward pass
+        max_wait_ms: Longest the first queued text waits for a batch to fill
+        max_pending: Queued texts beyond which new ones are dropped
+        overhead_budget: Tolerated relative increase of mean primary latency
+        log: Optional ``TraceLog`` receiving one line per shadow-scored text
+    """
+
+    def __init__(self, primary_tokenizer, candidates, threshold=CONFIDENCE_THRESHOLD,
+                 max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait_ms=DEFAULT_MAX_WAIT_MS,
+                 max_pending=DEFAULT_MAX_PENDING, overhead_budget=DEFAULT_OVERHEAD_BUDGET, log=None,
+                 temperature=1.0):
+        if not candidates:
+            raise ValueError("Shadow mode needs at least one candidate model")
+        self.candidates = candidates
+        self.threshold = threshold
+        self.temperature = temperature
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.overhead_budget = overhead_budget
+        self.log = log
+        self.sample_rate = 1.0
+        # Candidates reading the primary's ids skip tokenization entirely
+        self._shared_ids = {
+            name: shares_tokenizer(primary_tokenizer, candidate.tokenizer)
+            for name, candidate in candidates.items()
+        }
+
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._counts = Counter()
+        self._tallies = {name: {bucket: _Tally() for bucket in DECISION_BUCKETS} for name in candidates}
+        self._busy = False
+        self._latency_idle = deque(maxlen=LATENCY_WINDOW)
+        self._latency_all = deque(maxlen=LATENCY_WINDOW)
+        self._since_adjust = 0
+        self._observe_seconds = 0.0
+        self._worker = threading.Thread(target=self._run, name="shadow-evaluator", daemon=True)
+        self._worker.start()
+
+    # ----------------------------------------------
+    # Serving-path hooks (cheap, never block)
+    # ----------------------------------------------
+    def observe(self, text, input_ids, prob_real, prob_fake, decision):
+        """
+        Queue a primary result for shadow scoring.
+
+        Args:
+            text: Text the primary scored
+            input_ids: Its token ids without special tokens, from
+                ``encode_document()``; only the first window is shadowed
+            prob_real, prob_fake: Raw (uncalibrated) primary probabilities
+            decision: Primary decision ('real', 'fake' or 'uncertain') on
+                the scores calibrated with ``temperature``
+        """
+        start = time.perf_counter()
+        if random.random() >= self.sample_rate:
+            result = "unsampled"
+        else:
+            try:
+                self._queue.put_nowait((text, input_ids, prob_real, prob_fake, decision))
+                result = "queued"
+            except queue.Full:
+                result = "dropped"
+        with self._lock:
+            self._counts[result] += 1
+            self._observe_seconds += time.perf_counter() - start
+
+    def record_primary(self, seconds):
+        """Report one primary inference latency for the overhead estimate."""
+        with self._lock:
+            self._latency_all.append(seconds)
+            self._since_adjust += 1
+            if not self._busy:
+                self._latency_idle.append(seconds)
+
+    def overhead(self):
+        """Relative increase of mean primary latency over its idle mean, or None."""
+        with self._lock:
+            if len(self._latency_idle) < MIN_LATENCY_SAMPLES or len(self._latency_all) < MIN_LATENCY_SAMPLES:
+                return None
+            return statistics.fmean(self._latency_all) / statistics.fmean(self._latency_idle) - 1
+
+    # ----------------------------------------------
+    # Background scoring
+    # ----------------------------------------------
+    def _lower_priority(self):
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), SHADOW_NICENESS)
+        except (AttributeError, OSError) as e:
+            logger.debug("Shadow thread priority unchanged: %s", e)
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        self._lower_priority()
+        while True:
+            batch = self._collect_batch()
+            with self._lock:
+                self._busy = True
+            try:
+                scores = {name: self._score(name, batch) for name in self.candidates}
+            except Exception:
+                logger.exception("Shadow scoring of %d texts failed", len(batch))
+                with self._lock:
+                    self._counts["failed"] += len(batch)
+                continue
+            finally:
+                with self._lock:
+                    self._busy = False
+            self._tally(batch, scores)
+            self._adjust_sample_rate()
+
+    def _score(self, name, batch):
+        """``(prob_real, prob_fake)`` per text from one candidate."""
+        candidate = self.candidates[name]
+        if not self._shared_ids[name]:
+            outputs = candidate([text for text, *_ in batch], batch_size=len(batch), truncation=True)
+            return [extract_probabilities(output) for output in outputs]
+
+        import torch
+
+        tokenizer, model = candidate.tokenizer, candidate.model
+        capacity = window_capacity(tokenizer, MAX_SEQUENCE_LENGTH)
+        features = [
+            {"input_ids": frame_window(tokenizer, input_ids[:capacity])}
+            for _, input_ids, *_ in batch
+        ]
+        inputs = tokenizer.pad(features, padding=True, return_tensors="pt")
+        inputs = {key: value.to(model.device) for key, value in inputs.items()}
+        with torch.inference_mode():
+            probs = torch.softmax(model(**inputs).logits.float(), dim=-1).cpu()
+        real, fake = model.config.label2id["Real"], model.config.label2id["Fake"]
+        return [(row[real].item(), row[fake].item()) for row in probs]
+
+    def _tally(self, batch, scores):
+        with self._lock:
+            self._counts["scored"] += len(batch)
+            for i, (_, _, prob_real, prob_fake, decision) in enumerate(batch):
+                # Compare on the calibrated scale the primary decision was made on
+                _, prob_fake = apply_temperature(prob_real, prob_fake, self.temperature)
+                record = {
+                    "time": time.time(),
+                    "temperature": self.temperature,
+                    "primary": {"decision": decision, "prob_fake": round(prob_fake, 6)},
+                    "candidates": {},
+                }
+                for name, candidate_scores in scores.items():
+                    cand_real, cand_fake = apply_temperature(*candidate_scores[i], self.temperature)
+                    cand_decision, _ = decide(cand_real, cand_fake, self.threshold)
+                    self._tallies[name][decision].add(cand_decision == decision, cand_fake - prob_fake)
+                    record["candidates"][name] = {"decision": cand_decision, "prob_fake": round(cand_fake, 6)}
+                if self.log is not None:
+                    self.log.write(record)
+
+    def _adjust_sample_rate(self):
+        # Wait for fresh latencies so one slow spell is not acted on twice
+        with self._lock:
+            if self._since_adjust < MIN_LATENCY_SAMPLES:
+                return
+            self._since_adjust = 0
+        overhead = self.overhead()
+        if overhead is None:
+            return
+        if overhead > self.overhead_budget:
+            self.sample_rate = max(MIN_SAMPLE_RATE, self.sample_rate / 2)
+        elif overhead < self.overhead_budget / 2:
+            self.sample_rate = min(1.0, self.sample_rate * 1.25)
+
+    # ----------------------------------------------
+    # Reporting
+    # ----------------------------------------------
+    def stats(self):
+        overhead = self.overhead()
+        with self._lock:
+            observed = sum(self._counts[key] for key in ("queued", "dropped", "unsampled"))
+            candidates = {}
+            for name, tallies in self._tallies.items():
+                total = _Tally()
+                for tally in tallies.values():
+                    total.count += tally.count
+                    total.agree += tally.agree
+                    total.delta_sum += tally.delta_sum
+                    total.abs_delta_sum += tally.abs_delta_sum
+                candidates[name] = {
+                    "shared_tokenization": self._shared_ids[name],
+                    **total.summary(),
+                    "buckets": {bucket: tally.summary() for bucket, tally in tallies.items()},
+                }
+            return {
+                **{key: self._counts[key] for key in ("queued", "scored", "dropped", "unsampled", "failed")},
+                "pending": self._queue.qsize(),
+                "busy": self._busy,
+                "sample_rate": self.sample_rate,
+                "overhead": overhead,
+                "overhead_budget": self.overhead_budget,
+                "observe_us": 1e6 * self._observe_seconds / observed if observed else 0.0,
+                "candidates": candidates,
+            }
+
+# ==============================================
+# OVERHEAD MEASUREMENT
+# ==============================================
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def measure_overhead(primary, texts, evaluator=None, threshold=CONFIDENCE_THRESHOLD):
+    """
+    Primary latency over ``texts`` one at a time, optionally with a shadow.
+
+    Returns:
+        Dict with mean/p50/p95 primary latency in milliseconds
+    """
+    from windowing import encode_document
+
+    latencies = []
+    for text in texts:
+        start = time.perf_counter()
+        encoding = encode_document(primary.tokenizer, text)
+        output = primary([text], batch_size=1, truncation=True)[0]
+        elapsed = time.perf_counter() - start
+        latencies.append(elapsed)
+        if evaluator is not None:
+            prob_real, prob_fake = extract_probabilities(output)
+            evaluator.record_primary(elapsed)
+            evaluator.observe(text, encoding["input_ids"], prob_real, prob_fake,
+                              decide(prob_real, prob_fake, threshold)[0])
+    return {
+        "mean_ms": 1000.0 * statistics.fmean(latencies) if latencies else 0.0,
+        "p50_ms": 1000.0 * _percentile(latencies, 0.50),
+        "p95_ms": 1000.0 * _percentile(latencies, 0.95),
+    }
+
+# ==============================================
+# COMMAND-LINE ENTRY POINT
+# ==============================================
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Replay texts through the primary model with candidates in shadow mode."
+    )
+    parser.add_argument("--data", required=True, help="CSV/JSONL file with a text column")
+    parser.add_argument("--text-column", default="text")
+    parser.add_argument("--limit", type=int, default=300)
+    parser.add_argument("--model-path", default=MODEL_PATH, help="Primary model")
+    parser.add_argument("--candidate", action="append", required=True,
+                        help="Candidate model path (repeatable)")
+    parser.add_argument("--threshold", type=float, default=CONFIDENCE_THRESHOLD)
+    parser.add_argument("--overhead-budget", type=float, default=DEFAULT_OVERHEAD_BUDGET)
+    parser.add_argument("--log", default=None, help="Append one JSON line per shadow-scored text")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    from bulk import iter_records
+    from inference import build_classifier
+    from metrics import TraceLog
+    from preprocessing import DEFAULT_PREPROCESSOR
+
+    texts = [
+        DEFAULT_PREPROCESSOR(text)
+        for _, _, text in islice(iter_records(args.data, text_column=args.text_column), args.limit)
+    ]
+    primary = build_classifier(args.model_path)
+    candidates = {path: build_classifier(path) for path in args.candidate}
+    primary(texts[:2], batch_size=2, truncation=True)  # warm up before timing
+
+    baseline = measure_overhead(primary, texts, threshold=args.threshold)
+    evaluator = ShadowEvaluator(
+        primary.tokenizer, candidates, threshold=args.threshold,
+        overhead_budget=args.overhead_budget, log=TraceLog(args.log) if args.log else None,
+    )
+    shadowed = measure_overhead(primary, texts, evaluator, threshold=args.threshold)
+    while evaluator.stats()["pending"] or evaluator.stats()["busy"]:
+        time.sleep(0.1)
+    print(json.dumps({
+        "texts": len(texts),
+        "primary_without_shadow": baseline,
+        "primary_with_shadow": shadowed,
+        "measured_overhead": shadowed["mean_ms"] / baseline["mean_ms"] - 1 if baseline["mean_ms"] else None,
+        "shadow": evaluator.stats(),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+Cold-start helpers: pinned local model snapshots, warmup and phase timing.
+
+Serving replicas load the model from a snapshot directory on local disk
+with every hub lookup disabled, run a warmup pass over representative
+batch shapes before reporting ready, and log how long each startup phase
+took.
+
+Usage:
+    python startup.py snapshot --output models/arabert-snapshot
+    python startup.py profile --snapshot-dir models/arabert-snapshot
+"""
+import argparse
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+from inference import MODEL_PATH
+
+logger = logging.getLogger("startup")
+
+# ==============================================
+# CONFIGURATION
+# ==============================================
+WARMUP_BATCH_SIZES = (1, 16)
+WARMUP_SEQUENCE_LENGTHS = (64, 256, 512)
+WARMUP_WORD = "خبر"
+SNAPSHOT_PATTERNS = ["*.json", "*.txt", "*.model", "*.safetensors", "*.bin"]
+
+# ==============================================
+# PHASE TIMING
+# ==============================================
+class StartupTimer:
+    """Record wall-clock durations of named startup phases."""
+
+    def __init__(self):
+        self.phases = []
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.phases.append((name, elapsed))
+            logger.info("startup phase %-12s %8.1f ms", name, elapsed * 1000.0)
+
+    def summary(self):
+        """Per-phase milliseconds plus the total since the timer was created."""
+        report = {name: elapsed * 1000.0 for name, elapsed in self.phases}
+        report["total"] = (time.perf_counter() - self._start) * 1000.0
+        return report
+
+    def log_summary(self):
+        summary = self.summary()
+        logger.info(
+            "startup complete in %.1f ms (%s)",
+            summary["total"],
+            ", ".join(f"{name} {ms:.0f} ms" for name, ms in summary.items() if name != "total")
+        )
+        return summary
+
+# ==============================================
+# MODEL SOURCE
+# ==============================================
+def snapshot_available(snapshot_dir):
+    """True when ``snapshot_dir`` holds a downloaded model config."""
+    return bool(snapshot_dir) and os.path.isfile(os.path.join(snapshot_dir, "config.json"))
+
+
+def enable_offline_mode():
+    """
+    Stop transformers and huggingface_hub from contacting the hub.
+    Must run before either library is imported to take full effect.
+    """
+    os.environ["HF_HUB_OFFLINE"] = "1"
+    os.environ["TRANSFORMERS_OFFLINE"] = "1"
+
+
+def snapshot_model(model_path, output_dir, revision=None):
+    """
+    Download a pinned copy of the model into ``output_dir``.
+
+    Args:
+        model_path: Hub id of the model
+        output_dir: Local directory to populate
+        revision: Branch, tag or commit to pin (default: main)
+    """
+    from huggingface_hub import snapshot_download
+
+    return snapshot_download(
+        repo_id=model_path,
+        revision=revision,
+        local_dir=output_dir,
+        allow_patterns=SNAPSHOT_PATTERNS,
+    )
+
+
+def resolve_model_path(model_path=MODEL_PATH, snapshot_dir=None):
+    """
+    Prefer a local snapshot over the hub id.
+
+    Returns:
+        Tuple of (path to load, whether it is a local snapshot); offline
+        mode is switched on when the snapshot is used
+    """
+    if snapshot_available(snapshot_dir):
+        enable_offline_mode()
+        return snapshot_dir, True
+    return model_path, False
+
+
+def load_classifier(model_path=MODEL_PATH, snapshot_dir=None, timer=None,
+                    mmap=False, dtype=None):
+    """
+    Build the classification pipeline, timing each loading phase.
+
+    Loads from ``snapshot_dir`` without any hub lookup when it holds a
+    snapshot, otherwise resolves ``model_path`` normally. ``mmap`` maps
+    safetensors weights instead of reading them and ``dtype`` ("bf16")
+    selects reduced-precision weights (see ``footprint.py``).
+    """
+    timer = timer or StartupTimer()
+    model_path, local = resolve_model_path(model_path, snapshot_dir)
+
+    with timer.phase("imports"):
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+        from inference import make_pipeline
+
+    with timer.phase("tokenizer"):
+        tokenizer = AutoTokenizer.from_pretrained(model_path, local_files_only=local)
+    with timer.phase("model"):
+        if mmap or dtype:
+            from footprint import load_mmap_model
+            model = load_mmap_model(model_path, dtype=dtype, local_files_only=local)
+        else:
+            model = AutoModelForSequenceClassification.from_pretrained(
+                model_path, local_files_only=local
+            )
+            model.eval()
+    with timer.phase("pipeline"):
+        classifier = make_pipeline(model, tokenizer)
+    return classifier
+
+# ==============================================
+# WARMUP
+# ==============================================
+def warmup(classifier, batch_sizes=WARMUP_BATCH_SIZES,
+           sequence_lengths=WARMUP_SEQUENCE_LENGTHS, timer=None):
+    """
+    Run forward passes over representative shapes before serving traffic.
+
+    The first calls at each shape pay one-off costs (allocator growth,
+    kernel selection, lazy initialisation) that would otherwise land on
+    the first real requests.
+    """
+    timer = timer or StartupTimer()
+    with timer.phase("warmup"):
+        for length in sequence_lengths:
+            text = " ".join([WARMUP_WORD] * length)
+            for batch_size in batch_sizes:
+                classifier([text] * batch_size, batch_size=batch_size, truncation=True)
+
+# ==============================================
+# COMMAND-LINE ENTRY POINT
+# ==============================================
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Model snapshot and cold-start tools.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    snapshot = subparsers.add_parser("snapshot", help="Download a pinned local model snapshot")
+    snapshot.add_argument("--model-path", default=MODEL_PATH)
+    snapshot.add_argument("--output", required=True)
+    snapshot.add_argument("--revision", default=None, help="Branch, tag or commit to pin")
+
+    profile = subparsers.add_parser("profile", help="Measure a cold start phase by phase")
+    profile.add_argument("--model-path", default=MODEL_PATH)
+    profile.add_argument("--snapshot-dir", default=None)
+    profile.add_argument("--no-warmup", action="store_true")
+    profile.add_argument("--mmap", action="store_true", help="Memory-map safetensors weights")
+    profile.add_argument("--bf16", action="store_true", help="Load bfloat16 weights")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    timer = StartupTimer()
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    if args.command == "snapshot":
+        path = snapshot_model(args.model_path, args.output, args.revision)
+        print(f"Snapshot of {args.model_path} written to {path}")
+        return
+
+    classifier = load_classifier(
+        args.model_path, args.snapshot_dir, timer,
+        mmap=args.mmap, dtype="bf16" if args.bf16 else None
+    )
+    if not args.no_warmup:
+        warmup(classifier, timer=timer)
+    print(json.dumps(timer.log_summary(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Parity of the onnxruntime backend with the PyTorch pipeline.
+
+Exports a tiny randomly initialised BERT classifier (no download needed)
+and checks that both backends return the same score structure and
+probabilities within ``PARITY_TOLERANCE``. Skipped when torch,
+transformers or onnxruntime is not installed
+(``pip install -r requirements-dev.txt`` installs them).
+"""
+import os
+
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("transformers")
+pytest.importorskip("onnxruntime")
+
+from onnx_backend import PARITY_TOLERANCE, build_onnx_classifier, check_parity, export_onnx  # noqa: E402
+from inference import MAX_SEQUENCE_LENGTH, build_classifier  # noqa: E402
+
+# ==============================================
+# CONFIGURATION
+# ==============================================
+TEXTS = [
+    "نص تجريبي قصير",
+    "نص تجريبي أطول قليلاً لاختبار الحشو الديناميكي في الدفعة",
+    "خبر عاجل",
+    "أعلنت الوزارة اليوم عن نتائج جديدة " * 120,  # ~720 tokens, past the model limit
+]
+
+
+@pytest.fixture(scope="module")
+def tiny_model_dir(tmp_path_factory):
+    from transformers import BertConfig, BertForSequenceClassification, BertTokenizerFast
+
+    model_dir = str(tmp_path_factory.mktemp("tiny-bert"))
+    words = sorted({word for text in TEXTS for word in text.split()})
+    vocab_path = os.path.join(model_dir, "vocab.txt")
+    with open(vocab_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + words) + "\n")
+
+    tokenizer = BertTokenizerFast(vocab_file=vocab_path, model_max_length=512)
+    config = BertConfig(
+        vocab_size=tokenizer.vocab_size, hidden_size=32, num_hidden_layers=2,
+        num_attention_heads=2, intermediate_size=64, max_position_embeddings=512, num_labels=2,
+    )
+    BertForSequenceClassification(config).save_pretrained(model_dir)
+    tokenizer.save_pretrained(model_dir)
+    return model_dir
+
+
+def test_long_text_exercises_truncation(tiny_model_dir):
+    from transformers import AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(tiny_model_dir)
+    assert len(tokenizer(TEXTS[-1], verbose=False)["input_ids"]) > MAX_SEQUENCE_LENGTH
+
+
+def test_onnx_matches_torch(tiny_model_dir, tmp_path):
+    onnx_dir = str(tmp_path / "onnx")
+    export_onnx(tiny_model_dir, onnx_dir)
+
+    report = check_parity(
+        build_classifier(tiny_model_dir), build_onnx_classifier(onnx_dir), TEXTS
+    )
+
+    assert report["same_structure"]
+    assert report["max_abs_diff"] <= PARITY_TOLERANCE
+    assert report["passed"]
+
+
+def test_onnx_batch_size_does_not_change_scores(tiny_model_dir, tmp_path):
+    onnx_dir = str(tmp_path / "onnx")
+    export_onnx(tiny_model_dir, onnx_dir)
+    classifier = build_onnx_classifier(onnx_dir)
+
+    batched = classifier(TEXTS, batch_size=len(TEXTS))
+    single = classifier(TEXTS, batch_size=1)
+
+    # Padding to the longest text in the batch must not move any score
+    for a, b in zip(batched, single):
+        scores_a = {item["label"]: item["score"] for item in a}
+        scores_b = {item["label"]: item["score"] for item in b}
+        for label, score in scores_a.items():
+            assert abs(score - scores_b[label]) <= PARITY_TOLERANCE
@@ -0,0 +1,227 @@
+"""
+Sliding-window classification for articles longer than the model limit.
+
+The document is tokenized once, split into overlapping token windows that
+each fit AraBERT's 512-token input, and every window is classified in a
+single batched forward pass. Per-window Real/Fake scores are then combined
+with one of the aggregation strategies below before the confidence
+threshold is applied.
+"""
+from inference import CONFIDENCE_THRESHOLD, MAX_SEQUENCE_LENGTH, decide
+
+# ==============================================
+# CONFIGURATION
+# ==============================================
+DEFAULT_STRIDE = 128
+DEFAULT_WINDOW_BATCH_SIZE = 16
+AGGREGATION_STRATEGIES = ("mean", "max-fake", "length-weighted")
+TOP_DRIVERS = 3
+
+
+def encode_document(tokenizer, text):
+    """
+    Tokenize a document once, without special tokens or truncation.
+
+    Returns:
+        Dict with ``input_ids`` and, for fast tokenizers, ``offsets``
+        (character spans used to show which text each window covers)
+    """
+    encoding = tokenizer(
+        text,
+        add_special_tokens=False,
+        truncation=False,
+        return_offsets_mapping=tokenizer.is_fast,
+        verbose=False,
+    )
+    return {
+        "input_ids": encoding["input_ids"],
+        "offsets": encoding.get("offset_mapping"),
+    }
+
+
+def window_capacity(tokenizer, max_length=MAX_SEQUENCE_LENGTH):
+    """Number of content tokens that fit in one window after [CLS]/[SEP]."""
+    return max_length - tokenizer.num_special_tokens_to_add(pair=False)
+
+
+def frame_window(tokenizer, ids):
+    """
+    Model input ids for one window of content ids: [CLS] ids [SEP].
+
+    Built from the token ids directly because not every tokenizer offers
+    ``build_inputs_with_special_tokens``.
+    """
+    return [tokenizer.cls_token_id] + list(ids) + [tokenizer.sep_token_id]
+
+
+def needs_windows(tokenizer, encoding, max_length=MAX_SEQUENCE_LENGTH):
+    """True when the document does not fit into a single model input."""
+    return len(encoding["input_ids"]) > window_capacity(tokenizer, max_length)
+
+
+def split_windows(n_tokens, capacity, stride=DEFAULT_STRIDE):
+    """
+    Compute overlapping ``(start, end)`` token spans covering a document.
+
+    Args:
+        n_tokens: Document length in tokens
+        capacity: Maximum content tokens per window
+        stride: Number of tokens shared between consecutive windows
+    """
+    if n_tokens <= capacity:
+        return [(0, n_tokens)]
+    if not 0 <= stride < capacity:
+        raise ValueError("stride must be between 0 and the window capacity")
+
+    step = capacity - stride
+    spans = []
+    start = 0
+    while True:
+        end = min(start + capacity, n_tokens)
+        spans.append((start, end))
+        if end == n_tokens:
+            break
+        start += step
+    return spans
+
+# ==============================================
+# BATCHED WINDOW SCORING
+# ==============================================
+def score_windows(model, tokenizer, input_ids, spans, batch_size=DEFAULT_WINDOW_BATCH_SIZE):
+    """
+    Classify every window, padding each batch only to its longest window.
+
+    Returns:
+        List of ``(prob_real, prob_fake)`` per span
+    """
+    import torch
+
+    label2id = model.config.label2id
+    real_idx, fake_idx = label2id["Real"], label2id["Fake"]
+    device = model.device
+
+    results = []
+    for i in range(0, len(spans), batch_size):
+        features = [
+            {"input_ids": frame_window(tokenizer, input_ids[start:end])}
+            for start, end in spans[i:i + batch_size]
+        ]
+        batch = tokenizer.pad(features, padding=True, return_tensors="pt")
+        batch = {key: value.to(device) for key, value in batch.items()}
+
+        with torch.inference_mode():
+            logits = model(**batch).logits
+        probs = torch.softmax(logits.float(), dim=-1).cpu()
+
+        results.extend(
+            (row[real_idx].item(), row[fake_idx].item()) for row in probs
+        )
+    return results
+
+
+def aggregate_scores(window_scores, lengths, strategy="mean"):
+    """
+    Combine per-window probabilities into one ``(prob_real, prob_fake)``.
+
+    Args:
+        window_scores: List of ``(prob_real, prob_fake)`` per window
+        lengths: Content token count of each window
+        strategy: 'mean', 'max-fake', or 'length-weighted'
+
+    Returns:
+        Tuple of (prob_real, prob_fake, weights) where weights gives each
+        window's share of the final score
+    """
+    n = len(window_scores)
+    if strategy == "mean":
+        weights = [1.0 / n] * n
+    elif strategy == "length-weighted":
+        total = float(sum(lengths))
+        weights = [length / total for length in lengths]
+    elif strategy == "max-fake":
+        top = max(range(n), key=lambda i: window_scores[i][1])
+        weights = [1.0 if i == top else 0.0 for i in range(n)]
+    else:
+        raise ValueError(
+            f"Unknown aggregation strategy '{strategy}' "
+            f"(expected one of {', '.join(AGGREGATION_STRATEGIES)})"
+        )
+
+    prob_real = sum(w * real for w, (real, _) in zip(weights, window_scores))
+    prob_fake = sum(w * fake for w, (_, fake) in zip(weights, window_scores))
+    return prob_real, prob_fake, weights
+
+# ==============================================
+# PUBLIC ENTRY POINT
+# ==============================================
+def classify_windows(classifier, text, strategy="mean", stride=DEFAULT_STRIDE,
+                     max_length=MAX_SEQUENCE_LENGTH, threshold=CONFIDENCE_THRESHOLD,
+                     encoding=None, batch_size=DEFAULT_WINDOW_BATCH_SIZE):
+    """
+    Classify a document of any length with overlapping token windows.
+
+    Args:
+        classifier: Pipeline from ``build_classifier()``
+        text: Document text
+        strategy: Aggregation strategy, one of ``AGGREGATION_STRATEGIES``
+        stride: Tokens shared between consecutive windows
+        max_length: Model input limit including special tokens
+        threshold: Confidence threshold for Real/Fake vs Uncertain
+        encoding: Result of ``encode_document()`` to avoid re-tokenizing
+        batch_size: Windows per forward pass
+
+    Returns:
+        Dict with the aggregated probabilities, decision, confidence,
+        per-window details and the indices of the windows that drove
+        the decision (highest contribution to the winning label first)
+    """
+    tokenizer, model = classifier.tokenizer, classifier.model
+    if encoding is None:
+        encoding = encode_document(tokenizer, text)
+
+    input_ids = encoding["input_ids"]
+    spans = split_windows(len(input_ids), window_capacity(tokenizer, max_length), stride)
+    window_scores = score_windows(model, tokenizer, input_ids, spans, batch_size)
+    lengths = [end - start for start, end in spans]
+
+    prob_real, prob_fake, weights = aggregate_scores(window_scores, lengths, strategy)
+    decision, confidence = decide(prob_real, prob_fake, threshold)
+
+    offsets = encoding.get("offsets")
+    windows = []
+    for index, ((start, end), (real, fake), weight) in enumerate(zip(spans, window_scores, weights)):
+        window = {
+            "index": index,
+            "token_start": start,
+            "token_end": end,
+            "prob_real": real,
+            "prob_fake": fake,
+            "weight": weight,
+        }
+        if offsets and end > start:
+            window["char_start"] = offsets[start][0]
+            window["char_end"] = offsets[end - 1][1]
+        windows.append(window)
+
+    # A window drives the decision by how much it contributes to the
+    # label that won (Fake for fake, Real for real, the leaning side otherwise)
+    lean_fake = decision == "fake" or (decision == "uncertain" and prob_fake > prob_real)
+    contribution = [
+        w["weight"] * (w["prob_fake"] if lean_fake else w["prob_real"]) for w in windows
+    ]
+    drivers = sorted(
+        (i for i in range(len(windows)) if weights[i] > 0),
+        key=lambda i: contribution[i],
+        reverse=True,
+    )[:TOP_DRIVERS]
+
+    return {
+        "prob_real": prob_real,
+        "prob_fake": prob_fake,
+        "decision": decision,
+        "confidence": confidence,
+        "strategy": strategy,
+        "n_tokens": len(input_ids),
+        "windows": windows,
+        "drivers": drivers,
+    }
@@ -0,0 +1,511 @@
+"""
+Multi-process inference worker pool sharing one copy of the model weights.
+
+The parent process loads the model once and moves its parameters into
+shared memory (``Module.share_memory()``). Worker processes are spawned
+with a handle to that storage instead of a copy, so N workers map the
+same physical pages. Weights that are already memory-mapped from a
+safetensors file (``MMAP_WEIGHTS``) are not copied into shared memory:
+each worker maps the same file and the page cache shares it.
+
+Each worker pins its torch intra-op threads to its own disjoint slice of
+CPU cores, which avoids GIL and thread-pool contention between sessions.
+The parent hands one batch at a time to each idle worker through that
+worker's own queue, so it always knows which batch every worker holds.
+Worker liveness is checked on a timer, busy or not; a worker that dies
+fails only the batch it was given and is respawned (up to
+``MAX_RESPAWNS`` times per slot, then dropped from the pool).
+
+The pool is pipeline-compatible: calling it with a list of texts returns
+the same ``{"label", "score"}`` lists, with batches spread across workers.
+
+Usage:
+    python workerpool.py benchmark --data articles.jsonl --workers 1,2,4
+    python workerpool.py memory --workers 4
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from itertools import islice
+
+from bulk import iter_records
+from inference import MODEL_PATH
+
+logger = logging.getLogger("workerpool")
+
+# ==============================================
+# CONFIGURATION
+# ==============================================
+DEFAULT_WORKERS = 2
+READY_TIMEOUT_SECONDS = 300
+POLL_SECONDS = 1.0
+MAX_RESPAWNS = 3    # per worker slot; a slot that keeps dying is dropped from the pool
+
+# ==============================================
+# THREAD SCHEDULING
+# ==============================================
+def available_cpus():
+    """CPU ids this process may run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def plan_cpus(workers, cpus=None):
+    """
+    Split CPUs into one disjoint slice per worker.
+
+    Each worker gets ``len(cpus) // workers`` cores (at least one); with
+    more workers than cores the slices wrap around and share cores.
+    """
+    cpus = list(cpus or available_cpus())
+    per_worker = max(1, len(cpus) // workers)
+    plan = []
+    for index in range(workers):
+        start = (index * per_worker) % len(cpus)
+        plan.append(cpus[start:start + per_worker] or cpus[:per_worker])
+    return plan
+
+
+def pin_current_process(cpus):
+    """Restrict this process and its torch thread pool to ``cpus``."""
+    import torch
+
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+    torch.set_num_threads(len(cpus))
+
+# ==============================================
+# MEMORY ACCOUNTING
+# ==============================================
+def process_memory(pid=None):
+    """
+    Resident memory of a process in MiB from ``/proc/<pid>/smaps_rollup``.
+
+    Returns:
+        Dict with ``rss`` (all mapped resident pages), ``pss`` (shared
+        pages divided among the processes mapping them), ``uss`` (pages
+        private to the process) and ``anon`` (resident memory not backed
+        by a file), or None where /proc is unavailable
+    """
+    path = f"/proc/{pid or os.getpid()}/smaps_rollup"
+    try:
+        with open(path, "r", encoding="ascii") as f:
+            fields = {}
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[0].endswith(":") and parts[1].isdigit():
+                    fields[parts[0][:-1]] = int(parts[1])
+    except OSError:
+        return None
+    return {
+        "rss": fields.get("Rss", 0) / 1024.0,
+        "pss": fields.get("Pss", 0) / 1024.0,
+        "uss": (fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)) / 1024.0,
+        "anon": fields.get("Anonymous", 0) / 1024.0,
+    }
+
+# ==============================================
+# WORKER PROCESS
+# ==============================================
+def _worker_main(index, model, tokenizer, cpus, tasks, results):
+    """
+    Entry point of one worker: pin threads, wrap the shared model, serve tasks.
+
+    ``model`` is either the shared module or, for file-backed weights, the
+    ``load_mmap_model()`` arguments to map the same file here.
+    """
+    import torch
+
+    from inference import make_pipeline
+
+    pin_current_process(cpus)
+    torch.set_grad_enabled(False)
+    if isinstance(model, dict):
+        from footprint import load_mmap_model
+        model = load_mmap_model(**model)
+    classifier = make_pipeline(model, tokenizer)
+    results.put(("ready", index, os.getpid()))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        task_id, texts, batch_size = task
+        try:
+            outputs = classifier(texts, batch_size=batch_size, truncation=True)
+        except Exception as e:
+            results.put((task_id, index, RuntimeError(f"Worker {index} failed: {e!r}")))
+        else:
+            results.put((task_id, index, outputs))
+
+# ==============================================
+# POOL
+# ==============================================
+class WorkerPool:
+    """
+    Pipeline-compatible classifier backed by N worker processes.
+
+    Args:
+        classifier: Loaded PyTorch pipeline; its model is moved to shared
+            memory (unless memory-mapped from a file) and stays usable in
+            the parent (e.g. for windowing)
+        workers: Number of inference processes
+        cpus: CPU ids to divide among workers (default: all available)
+    """
+
+    def __init__(self, classifier, workers=DEFAULT_WORKERS, cpus=None):
+        import torch.multiprocessing as mp
+
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+
+        self.classifier = classifier
+        self.tokenizer = classifier.tokenizer
+        self.model = classifier.model
+        self.workers = workers
+        self.cpu_plan = plan_cpus(workers, cpus)
+
+        # File-backed weights: workers map the same file (share_memory()
+        # would copy every mapped page into anonymous shared memory).
+        # Otherwise parameters move to shared memory once and workers
+        # receive handles.
+        self._weights = getattr(self.model, "mmap_source", None)
+        if self._weights is None:
+            self.model.share_memory()
+            self._weights = self.model
+
+        # spawn, not fork: forking after torch has started its OpenMP pool
+        # can deadlock the children
+        context = mp.get_context("spawn")
+        self._results = context.Queue()
+        self._context = context
+        self._queues = [None] * workers
+        self._processes = [self._spawn(index) for index in range(workers)]
+
+        self._ids = itertools.count()
+        self._pending = {}
+        self._backlog = deque()      # (task_id, texts, batch_size) not yet given to a worker
+        self._assigned = {}          # worker index -> task id it was given
+        self._respawns = [0] * workers
+        self._dropped = set()
+        self._stopping = False
+        self._lock = threading.Lock()
+        self._batches_per_worker = [0] * workers
+        self._running = True
+        self._wait_ready()
+
+        self._collector = threading.Thread(
+            target=self._collect, name="worker-pool-collector", daemon=True
+        )
+        self._collector.start()
+
+    # ----------------------------------------------
+    # Public API
+    # ----------------------------------------------
+    def submit(self, texts, batch_size=None):
+        """
+        Queue one batch for the next free worker.
+
+        Returns:
+            Future resolving to the pipeline outputs for ``texts``
+        """
+        if not self._running:
+            raise RuntimeError("Worker pool has been shut down")
+        future = Future()
+        task_id = next(self._ids)
+        with self._lock:
+            self._pending[task_id] = future
+            self._backlog.append((task_id, list(texts), batch_size or len(texts)))
+            self._dispatch()
+        return future
+
+    def __call__(self, texts, batch_size=None, truncation=True, **kwargs):
+        if isinstance(texts, str):
+            texts = [texts]
+        batch_size = batch_size or len(texts)
+        futures = [
+            self.submit(texts[i:i + batch_size], batch_size)
+            for i in range(0, len(texts), batch_size)
+        ]
+        return [output for future in futures for output in future.result()]
+
+    def memory(self):
+        """Per-process memory of the parent and every worker, plus totals."""
+        report = {"parent": process_memory()}
+        for index, process in enumerate(self._processes):
+            report[f"worker-{index}"] = process_memory(process.pid)
+        measured = [m for m in report.values() if m]
+        report["total_pss"] = sum(m["pss"] for m in measured)
+        report["total_rss"] = sum(m["rss"] for m in measured)
+        return report
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "pids": [process.pid for process in self._processes],
+                "alive": sum(process.is_alive() for process in self._processes),
+                "respawns": list(self._respawns),
+                "dropped": sorted(self._dropped),
+                "cpu_plan": self.cpu_plan,
+                "pending_batches": len(self._pending),
+                "queued_batches": len(self._backlog),
+                "batches_per_worker": list(self._batches_per_worker),
+            }
+
+    def shutdown(self, timeout=10):
+        """Stop workers after they finish already-submitted batches (up to ``timeout``)."""
+        if not self._running:
+            return
+        self._running = False
+        deadline = time.monotonic() + timeout
+        while self._pending and time.monotonic() < deadline:
+            time.sleep(0.05)
+        with self._lock:
+            self._stopping = True
+            for index, tasks in enumerate(self._queues):
+                if index not in self._dropped:
+                    tasks.put(None)
+        for process in self._processes:
+            process.join(timeout=timeout)
+            if process.is_alive():
+                process.terminate()
+        self._results.put(None)
+        self._collector.join(timeout=timeout)
+
+    # ----------------------------------------------
+    # Worker lifecycle
+    # ----------------------------------------------
+    def _spawn(self, index):
+        # A fresh queue, so nothing given to a dead predecessor is replayed
+        self._queues[index] = self._context.Queue()
+        process = self._context.Process(
+            target=_worker_main,
+            args=(index, self._weights, self.tokenizer, self.cpu_plan[index],
+                  self._queues[index], self._results),
+            name=f"inference-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        return process
+
+    def _dispatch(self):
+        """Give queued batches to idle workers; call with the lock held."""
+        if self._stopping:
+            return
+        for index, tasks in enumerate(self._queues):
+            if not self._backlog:
+                return
+            if index in self._dropped or index in self._assigned:
+                continue
+            task = self._backlog.popleft()
+            self._assigned[index] = task[0]
+            tasks.put(task)
+
+    def _replace_dead_workers(self):
+        """
+        Fail the batch each dead worker held, then respawn it or, after
+        MAX_RESPAWNS, drop it. Other workers' batches are left alone.
+        """
+        failed = []
+        with self._lock:
+            if self._stopping:
+                return
+            for index, process in enumerate(self._processes):
+                if index in self._dropped or process.is_alive():
+                    continue
+                task_id = self._assigned.pop(index, None)
+                future = self._pending.pop(task_id, None) if task_id is not None else None
+                if future is not None:
+                    failed.append(future)
+                if self._respawns[index] < MAX_RESPAWNS:
+                    self._respawns[index] += 1
+                    logger.warning("Inference worker %d exited (code %s); respawning", index, process.exitcode)
+                    self._processes[index] = self._spawn(index)
+                else:
+                    logger.error("Inference worker %d keeps exiting; dropping it from the pool", index)
+                    self._dropped.add(index)
+            exhausted = len(self._dropped) == len(self._processes)
+            if not exhausted:
+                self._dispatch()
+        for future in failed:
+            future.set_exception(RuntimeError("An inference worker exited unexpectedly"))
+        if exhausted:
+            self._running = False
+            self._fail_pending(RuntimeError("Every inference worker has exited"))
+
+    # ----------------------------------------------
+    # Result handling
+    # ----------------------------------------------
+    def _wait_ready(self):
+        deadline = time.monotonic() + READY_TIMEOUT_SECONDS
+        ready = 0
+        while ready < self.workers:
+            try:
+                message = self._results.get(timeout=POLL_SECONDS)
+            except queue.Empty:
+                if any(not p.is_alive() for p in self._processes):
+                    self._terminate()
+                    raise RuntimeError("An inference worker exited during startup")
+                if time.monotonic() > deadline:
+                    self._terminate()
+                    raise RuntimeError("Inference workers did not become ready in time")
+                continue
+            if message[0] == "ready":
+                ready += 1
+
+    def _terminate(self):
+        self._running = False
+        for process in self._processes:
+            process.terminate()
+
+    def _fail_pending(self, error):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._backlog.clear()
+        for future in pending.values():
+            future.set_exception(error)
+
+    def _collect(self):
+        next_check = time.monotonic() + POLL_SECONDS
+        while True:
+            # Liveness is checked on a timer, so a busy pool notices too
+            if time.monotonic() >= next_check:
+                self._replace_dead_workers()
+                next_check = time.monotonic() + POLL_SECONDS
+            try:
+                message = self._results.get(timeout=POLL_SECONDS)
+            except queue.Empty:
+                continue
+            if message is None:
+                break
+            task_id, index, payload = message
+            if task_id == "ready":
+                continue
+            with self._lock:
+                if self._assigned.get(index) == task_id:
+                    del self._assigned[index]
+                future = self._pending.pop(task_id, None)
+                self._batches_per_worker[index] += 1
+                self._dispatch()
+            if future is None:
+                continue
+            if isinstance(payload, Exception):
+                future.set_exception(payload)
+            else:
+                future.set_result(payload)
+        self._fail_pending(RuntimeError("Worker pool has been shut down"))
+
+# ==============================================
+# MEASUREMENT
+# ==============================================
+def measure_scaling(classifier, texts, worker_counts, batch_size=16):
+    """
+    Throughput and memory of the pool at each worker count.
+
+    The single-process baseline runs the same batches in the parent with
+    torch using every available core.
+
+    Returns:
+        Dict with the baseline and one entry per worker count giving
+        texts/second, speedup over the baseline and total PSS/RSS in MiB
+    """
+    import torch
+
+    torch.set_num_threads(len(available_cpus()))
+    classifier(texts[:batch_size], batch_size=batch_size, truncation=True)  # warmup
+    start = time.perf_counter()
+    classifier(texts, batch_size=batch_size, truncation=True)
+    baseline_seconds = time.perf_counter() - start
+    baseline_memory = process_memory()
+
+    report = {
+        "texts": len(texts),
+        "batch_size": batch_size,
+        "cpus": len(available_cpus()),
+        "single_process": {
+            "texts_per_s": len(texts) / baseline_seconds,
+            "memory_mb": baseline_memory,
+        },
+        "pools": [],
+    }
+    for workers in worker_counts:
+        pool = WorkerPool(classifier, workers=workers)
+        try:
+            pool(texts[:batch_size * workers], batch_size=batch_size)  # warmup every worker
+            start = time.perf_counter()
+            pool(texts, batch_size=batch_size)
+            elapsed = time.perf_counter() - start
+            memory = pool.memory()
+        finally:
+            pool.shutdown()
+
+        report["pools"].append({
+            "workers": workers,
+            "texts_per_s": len(texts) / elapsed,
+            "speedup": baseline_seconds / elapsed,
+            "total_pss_mb": memory["total_pss"],
+            "total_rss_mb": memory["total_rss"],
+            "processes": {name: m for name, m in memory.items() if isinstance(m, dict)},
+        })
+    return report
+
+# ==============================================
+# COMMAND-LINE ENTRY POINT
+# ==============================================
+def _int_list(value):
+    return tuple(int(item) for item in value.split(","))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Multi-process inference worker pool tools.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    benchmark = subparsers.add_parser("benchmark", help="Measure throughput and memory per worker count")
+    benchmark.add_argument("--data", required=True, help="CSV/JSONL file with a text column")
+    benchmark.add_argument("--text-column", default="text")
+    benchmark.add_argument("--limit", type=int, default=512)
+    benchmark.add_argument("--batch-size", type=int, default=16)
+    benchmark.add_argument("--workers", type=_int_list, default=(1, 2, 4))
+
+    memory = subparsers.add_parser("memory", help="Report per-process memory of an idle pool")
+    memory.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+
+    for sub in (benchmark, memory):
+        sub.add_argument("--model-path", default=MODEL_PATH)
+        sub.add_argument("--snapshot-dir", default=None)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    from startup import load_classifier
+
+    args = parse_args(argv)
+    classifier = load_classifier(args.model_path, snapshot_dir=args.snapshot_dir)
+
+    if args.command == "memory":
+        single = process_memory()
+        pool = WorkerPool(classifier, workers=args.workers)
+        try:
+            report = {"single_process_mb": single, "pool_mb": pool.memory(), **pool.stats()}
+        finally:
+            pool.shutdown()
+        print(json.dumps(report, indent=2))
+        return
+
+    records = iter_records(args.data, text_column=args.text_column)
+    texts = [text for _, _, text in islice(records, args.limit)]
+    report = measure_scaling(classifier, texts, args.workers, args.batch_size)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()